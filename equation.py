@@ -0,0 +1,281 @@
+"""
+化学方程式的解析、配平检查和自动配平。
+
+AI 返回的 YES 结果第二段是反应方程式，提示词要求"必须正确和平衡"，但模型并不总能做到。
+本模块把方程式解析为各物质的原子组成（支持 Unicode 上下标、结晶水、状态标记、↑/↓、
+写在箭头上的反应条件以及离子方程式的电荷），用精确的有理数消元求原子守恒矩阵的零空间：
+零空间为一维且各分量同号时即为唯一的最简整数系数。
+系数写错时可以直接改正；物质本身写错（无法配平）的回答则被判为格式错误，不写入缓存或知识库。
+"""
+import re
+from fractions import Fraction
+from functools import lru_cache
+from math import gcd, lcm
+
+from formula import parse_formula
+
+# 反应箭头，可带写在中间的反应条件，例如 "=点燃="、"=MnO₂,△="、"——点燃→"、"→(高温)"
+_ARROW = re.compile(
+    r"\s*(?:={1,2}[^=+\s]+={1,2}|[-─━—]+[^-─━—=+→>\s]+[-─━—]*(?:→|>)|—*→|⟶|⇌|⇋|⟷|->|={1,}|[-─━—]{2,}>?)"
+    r"(?:\s*[(（][^)）]*[)）])?\s*"
+)
+# 没有箭头、只用空白隔开的反应条件，例如 "CaCO₃ 高温 CaO + CO₂↑"
+_CONDITION = r"(?:高温|高压|点燃|加热|通电|光照|催化剂|△)"
+_CONDITION_ARROW = re.compile(rf"\s+{_CONDITION}(?:[、,，]?{_CONDITION})*\s+")
+# 物质后面的状态或浓度标注
+_ANNOTATION = re.compile(r"[(（](?:aq|s|l|g|浓|稀|熔融|固|液|气|过量|少量|足量|胶体)[)）]|[↑↓]")
+_COEFFICIENT = re.compile(r"(\d+(?:/\d+)?)(\s*)(?=[A-Z(\[])")
+_ASCII_CHARGE = re.compile(r"\^(\d*)([+-])")
+# 紧跟在离子后面、之后是 "+" 或结尾的一价正电荷，例如 "Na+ + Cl- → NaCl"
+_TRAILING_PLUS = re.compile(r"(?<=[A-Za-z)\]])\+(?=\s*(?:\+|$))")
+_SUPERSCRIPT_DIGITS = str.maketrans("0123456789", "⁰¹²³⁴⁵⁶⁷⁸⁹")
+_TERM_SEPARATOR = re.compile(r"\s*\+\s*")
+# 开头的标签，例如 "化学方程式："、"离子方程式:"、"反应1："
+_EQUATION_LABEL = re.compile(r"^\s*[^:：=→+\s][^:：=→+]{0,15}[:：]\s*")
+# 结尾的说明，例如 "（置换反应）"、"(中和反应)"；状态标注 "(aq)"、"(浓)" 等不算
+_TRAILING_NOTE = re.compile(r"\s*[(（]([^()（）]*[\u4e00-\u9fff][^()（）]*)[)）]\s*$")
+_SEGMENT_SEPARATOR = re.compile(r"[；;\n]")
+
+# 检查结果
+BALANCED = "balanced"  # 已配平
+FIXED = "fixed"  # 系数有误，已给出正确系数
+UNBALANCED = "unbalanced"  # 原子不守恒且无法唯一配平（物质写错）
+UNCHECKED = "unchecked"  # 含有无法确定组成的物质（如"蛋白质"），无法检查
+MALFORMED = "malformed"  # 不是方程式
+
+
+class EquationError(ValueError):
+    pass
+
+
+class Species:
+    """方程式中的一项：系数 + 物质"""
+
+    def __init__(self, coefficient, text, formula, gap=""):
+        self.coefficient = coefficient  # Fraction
+        self.text = text  # 去掉系数后的原文（保留状态标记）
+        self.formula = formula  # formula.Formula
+        self.gap = gap  # 原文中系数和物质之间的空白
+
+    def format(self, coefficient):
+        if coefficient == 1:
+            return self.text
+        return f"{coefficient}{self.gap}{self.text}"
+
+
+class Equation:
+    def __init__(self, reactants, products, arrow):
+        self.reactants = reactants
+        self.products = products
+        self.arrow = arrow  # 原文中的箭头（含反应条件和两侧空白）
+
+    @property
+    def species(self):
+        return self.reactants + self.products
+
+    @property
+    def checkable(self):
+        return all(s.formula.is_formula for s in self.species)
+
+    def _matrix(self):
+        """原子守恒矩阵：每行一种元素（最后一行是电荷），反应物为正、生成物为负"""
+        elements = sorted({e for s in self.species for e in s.formula.composition})
+        signs = [1] * len(self.reactants) + [-1] * len(self.products)
+        rows = [[sign * s.formula.composition.get(e, 0) for s, sign in zip(self.species, signs)]
+                for e in elements]
+        charges = [sign * s.formula.charge for s, sign in zip(self.species, signs)]
+        if any(charges):
+            rows.append(charges)
+        return rows
+
+    def is_balanced(self):
+        coefficients = [s.coefficient for s in self.species]
+        return all(sum(c * v for c, v in zip(coefficients, row)) == 0 for row in self._matrix())
+
+    def balanced_coefficients(self):
+        """
+        返回最简整数系数列表；原子无法守恒（物质写错）或配平方式不唯一时返回 None。
+        """
+        basis = nullspace(self._matrix(), len(self.species))
+        if len(basis) != 1:
+            return None
+        vector = basis[0]
+        if all(v < 0 for v in vector):
+            vector = [-v for v in vector]
+        if not all(v > 0 for v in vector):
+            return None
+        return integer_vector(vector)
+
+    def format(self, coefficients=None):
+        if coefficients is None:
+            coefficients = [s.coefficient for s in self.species]
+        left = [s.format(c) for s, c in zip(self.reactants, coefficients)]
+        right = [s.format(c) for s, c in zip(self.products, coefficients[len(self.reactants):])]
+        return " + ".join(left) + self.arrow + " + ".join(right)
+
+
+def nullspace(matrix, columns):
+    """用精确的有理数高斯-约当消元求矩阵的零空间基"""
+    rows = [[Fraction(v) for v in row] for row in matrix]
+    pivots = []
+    rank = 0
+    for col in range(columns):
+        pivot = next((i for i in range(rank, len(rows)) if rows[i][col] != 0), None)
+        if pivot is None:
+            continue
+        rows[rank], rows[pivot] = rows[pivot], rows[rank]
+        pivot_value = rows[rank][col]
+        rows[rank] = [v / pivot_value for v in rows[rank]]
+        for i in range(len(rows)):
+            if i != rank and rows[i][col] != 0:
+                factor = rows[i][col]
+                rows[i] = [a - factor * b for a, b in zip(rows[i], rows[rank])]
+        pivots.append(col)
+        rank += 1
+
+    basis = []
+    for free in (c for c in range(columns) if c not in pivots):
+        vector = [Fraction(0)] * columns
+        vector[free] = Fraction(1)
+        for row, pivot_col in zip(rows, pivots):
+            vector[pivot_col] = -row[free]
+        basis.append(vector)
+    return basis
+
+
+def integer_vector(vector):
+    """把有理数向量化为互质的整数向量"""
+    denominator = lcm(*(v.denominator for v in vector))
+    integers = [int(v * denominator) for v in vector]
+    divisor = gcd(*integers)
+    return [v // divisor for v in integers]
+
+
+def _parse_species(term):
+    term = term.strip()
+    if not term:
+        raise EquationError("方程式中有空的物质项")
+
+    coefficient, gap = Fraction(1), ""
+    match = _COEFFICIENT.match(term)
+    if match:
+        coefficient, gap = Fraction(match.group(1)), match.group(2)
+        term = term[match.end():]
+        if coefficient <= 0:
+            raise EquationError(f"系数必须为正: {match.group(1)}")
+
+    body = _ANNOTATION.sub("", term).strip()
+    if not body:
+        raise EquationError(f"无法识别的物质: {term}")
+    return Species(coefficient, term, parse_formula(body), gap)
+
+
+def _superscript_charge(match):
+    return match.group(1).translate(_SUPERSCRIPT_DIGITS) + ("⁺" if match.group(2) == "+" else "⁻")
+
+
+def _strip_decorations(text):
+    """去掉开头的标签、结尾的说明和句号"""
+    text = _EQUATION_LABEL.sub("", text).strip().rstrip("。.")
+    while True:
+        match = _TRAILING_NOTE.search(text)
+        if not match or _ANNOTATION.fullmatch(match.group(0).strip()):
+            return text
+        text = text[:match.start()].rstrip().rstrip("。.")
+
+
+def _find_arrows(text):
+    arrows = list(_ARROW.finditer(text))
+    return arrows or list(_CONDITION_ARROW.finditer(text))
+
+
+def _split_terms(side):
+    # 先把 ASCII 电荷 "^2+"、"Na+" 换成上标，避免其中的 "+" 被当作分隔符
+    side = _ASCII_CHARGE.sub(_superscript_charge, side)
+    side = _TRAILING_PLUS.sub("⁺", side.rstrip())
+    return _TERM_SEPARATOR.split(side.strip())
+
+
+@lru_cache(maxsize=4096)
+def parse_equation(text):
+    """解析方程式文本，返回 Equation；不是方程式时抛出 EquationError"""
+    text = _strip_decorations(text)
+    arrows = _find_arrows(text)
+    if len(arrows) != 1:
+        raise EquationError("方程式中应当恰好有一个反应箭头" if arrows else "没有找到反应箭头")
+
+    arrow = arrows[0]
+    left, right = text[:arrow.start()], text[arrow.end():]
+    if not left.strip() or not right.strip():
+        raise EquationError("箭头两侧都必须有物质")
+
+    reactants = [_parse_species(t) for t in _split_terms(left)]
+    products = [_parse_species(t) for t in _split_terms(right)]
+    return Equation(reactants, products, arrow.group(0))
+
+
+class EquationCheck:
+    def __init__(self, status, text, corrected=None, message=""):
+        self.status = status
+        self.text = text  # 原方程式
+        self.corrected = corrected  # status 为 FIXED 时是改正系数后的方程式
+        self.message = message
+
+    @property
+    def acceptable(self):
+        return self.status in (BALANCED, FIXED, UNCHECKED)
+
+    def __repr__(self):
+        return f"EquationCheck({self.status!r}, {self.text!r})"
+
+
+@lru_cache(maxsize=4096)
+def check_equation(text):
+    """检查一个方程式是否配平，系数有误时给出改正后的方程式"""
+    try:
+        equation = parse_equation(text)
+    except EquationError as e:
+        return EquationCheck(MALFORMED, text, message=str(e))
+
+    if not equation.checkable:
+        return EquationCheck(UNCHECKED, text, message="含有无法确定组成的物质")
+    if equation.is_balanced():
+        return EquationCheck(BALANCED, text)
+
+    coefficients = equation.balanced_coefficients()
+    if coefficients is None:
+        return EquationCheck(UNBALANCED, text, message="原子不守恒，且无法通过调整系数配平")
+    return EquationCheck(FIXED, text, corrected=equation.format(coefficients), message="已改正配平系数")
+
+
+def check_equation_field(field):
+    """
+    检查反应结果中"反应方程式"一栏。
+    一栏中可以有多个方程式（用分号或换行分隔），每个都会被检查；开头的标签（"化学方程式："）
+    和结尾的说明（"（置换反应）"）不参与检查，不含箭头的说明文字被忽略。
+    只用反应条件代替箭头（"CaCO₃ 高温 CaO + CO₂↑"）的段落，两侧不全是化学式时也按说明文字处理。
+    :return: (改正后的文本或 None, 各方程式的 EquationCheck 列表)。
+             系数有误时返回改正后的文本；方程式缺失或无法配平时返回 None。
+    """
+    checks = []
+    for segment in _SEGMENT_SEPARATOR.split(field):
+        segment = _strip_decorations(segment)
+        if not segment:
+            continue
+        if not _ARROW.search(segment):
+            if not _CONDITION_ARROW.search(segment):
+                continue
+            check = check_equation(segment)
+            if check.status in (MALFORMED, UNCHECKED):
+                continue
+        else:
+            check = check_equation(segment)
+        checks.append(check)
+        if check.status == FIXED:
+            field = field.replace(segment, check.corrected, 1)
+
+    if not checks:
+        return None, [EquationCheck(MALFORMED, field, message="缺少反应方程式")]
+    if not all(check.acceptable for check in checks):
+        return None, checks
+    return field, checks
@@ -0,0 +1,186 @@
+"""
+化学式规范化。
+
+同一种物质会以多种写法出现：物质列表里用 Unicode 下标（H₂SO₄），AI 返回 ASCII（H2SO4），
+用户输入还可能带全角字符、空格或状态标记。本模块把它们统一解析为规范形式：
+下标数字转为普通数字，结晶水统一用 "·" 连接，电荷写成 "^2-" 形式，
+并且规范字符串经过 intern，可以直接用作缓存键和图片文件名。
+"""
+import re
+import sys
+import unicodedata
+from functools import lru_cache
+
+ELEMENTS = frozenset("""
+H He Li Be B C N O F Ne Na Mg Al Si P S Cl Ar K Ca Sc Ti V Cr Mn Fe Co Ni Cu Zn
+Ga Ge As Se Br Kr Rb Sr Y Zr Nb Mo Tc Ru Rh Pd Ag Cd In Sn Sb Te I Xe Cs Ba La Ce
+Pr Nd Pm Sm Eu Gd Tb Dy Ho Er Tm Yb Lu Hf Ta W Re Os Ir Pt Au Hg Tl Pb Bi Po At Rn
+Fr Ra Ac Th Pa U Np Pu Am Cm Bk Cf Es Fm Md No Lr Rf Db Sg Bh Hs Mt Ds Rg Cn Nh Fl
+Mc Lv Ts Og
+""".split())
+
+_SUBSCRIPTS = str.maketrans("₀₁₂₃₄₅₆₇₈₉ₙ", "0123456789n")
+_SUPERSCRIPTS = str.maketrans("⁰¹²³⁴⁵⁶⁷⁸⁹⁺⁻", "0123456789+-")
+_HYDRATE_DOTS = re.compile(r"\s*[·•∙⋅.*]\s*")
+_STATE_SUFFIX = re.compile(r"(\((?:aq|s|l|g)\)|[↑↓])+$")
+_SUPERSCRIPT_CHARGE = re.compile(r"([⁰¹²³⁴⁵⁶⁷⁸⁹]*[⁺⁻])$")
+_ASCII_CHARGE = re.compile(r"\^(\d*[+-])$")
+# 直接写在化学式后面的一价电荷，例如 "OH-"、"Na+"；"Fe3+" 之类前面是数字的写法有歧义，不当作电荷
+_TRAILING_CHARGE = re.compile(r"(?<=[A-Za-z)\]])([+-])$")
+_TOKEN = re.compile(r"[A-Z][a-z]?|\d+|n|[()\[\]]")
+_REACTANT_SEPARATORS = re.compile(r"[+,，、]")
+# 表示电荷而不是分隔符的 "+"："^3+"，或紧跟在物质后面、之后是分隔符或结尾（如 "Na+ + Cl-"）
+_CHARGE_PLUS = re.compile(r"\^\d*\+|(?<=[^\s+,，、])\+(?=\s*(?:[+,，、]|$))")
+
+
+class FormulaError(ValueError):
+    pass
+
+
+class Formula:
+    """解析后的化学式"""
+
+    def __init__(self, canonical, composition=None, charge=0):
+        self.canonical = canonical  # 规范字符串（已 intern）
+        self.composition = composition  # {元素: 原子数}；无法确定时为 None（如高分子、俗名）
+        self.charge = charge
+
+    @property
+    def is_formula(self):
+        return self.composition is not None
+
+    def __repr__(self):
+        return f"Formula({self.canonical!r})"
+
+
+def _parse_groups(tokens, pos, closing=None):
+    """解析一串原子团，返回 (组成, 新位置)；组成为 None 表示含有不定的聚合度 n"""
+    composition = {}
+    while pos < len(tokens):
+        token = tokens[pos]
+        if token in (")", "]"):
+            if token != closing:
+                raise FormulaError(f"括号不匹配: {token}")
+            return composition, pos + 1
+
+        if token in ("(", "["):
+            inner, pos = _parse_groups(tokens, pos + 1, ")" if token == "(" else "]")
+        elif token in ELEMENTS:
+            inner, pos = {token: 1}, pos + 1
+        else:
+            raise FormulaError(f"无法识别的符号: {token}")
+
+        count = 1
+        if pos < len(tokens) and tokens[pos].isdigit():
+            count = int(tokens[pos])
+            pos += 1
+        elif pos < len(tokens) and tokens[pos] == "n":
+            count = None
+            pos += 1
+
+        if inner is None or count is None or composition is None:
+            composition = None
+        else:
+            for element, n in inner.items():
+                composition[element] = composition.get(element, 0) + n * count
+
+    if closing is not None:
+        raise FormulaError("括号未闭合")
+    return composition, pos
+
+
+def _parse_part(part):
+    """解析结晶水记号分隔的一段，例如 "5H2O"，返回 (规范字符串, 组成)"""
+    match = re.match(r"(\d*)(.+)$", part)
+    multiplier_text, body = match.groups()
+    tokens = _TOKEN.findall(body)
+    if "".join(tokens) != body:
+        raise FormulaError(f"化学式中有无法识别的字符: {part}")
+
+    composition, _ = _parse_groups(tokens, 0)
+    multiplier = int(multiplier_text) if multiplier_text else 1
+    if composition is not None:
+        composition = {element: n * multiplier for element, n in composition.items()}
+    return part, composition
+
+
+@lru_cache(maxsize=4096)
+def parse_formula(text):
+    """
+    解析化学式（支持括号、结晶水、电荷、Unicode 上下标和状态标记）。
+    无法按化学式解析的文本（如"蛋白质"）按普通名称处理，composition 为 None。
+    """
+    text = text.strip()
+    # 先取出上标电荷，再做 NFKC，避免上标数字被当成普通数字
+    charge_text = ""
+    stripped = _STATE_SUFFIX.sub("", text)
+    match = _SUPERSCRIPT_CHARGE.search(stripped)
+    if match:
+        charge_text = match.group(1).translate(_SUPERSCRIPTS)
+        stripped = stripped[:match.start()]
+
+    normalized = unicodedata.normalize("NFKC", stripped.translate(_SUBSCRIPTS))
+    normalized = _STATE_SUFFIX.sub("", normalized.strip())
+    if not charge_text:
+        match = _ASCII_CHARGE.search(normalized) or _TRAILING_CHARGE.search(normalized)
+        if match:
+            charge_text = match.group(1)
+            normalized = normalized[:match.start()]
+
+    compact = re.sub(r"\s+", "", normalized)
+    try:
+        parts = _HYDRATE_DOTS.split(compact)
+        if not compact or not all(parts):
+            raise FormulaError(f"空的化学式: {text}")
+        parsed = [_parse_part(p) for p in parts]
+    except FormulaError:
+        # 俗名或无法解析的文本：只做空白和全角字符的规范化
+        return Formula(sys.intern(re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text))))
+
+    composition = {}
+    for _, part_composition in parsed:
+        if part_composition is None:
+            composition = None
+            break
+        for element, n in part_composition.items():
+            composition[element] = composition.get(element, 0) + n
+
+    charge = 0
+    canonical = "·".join(p for p, _ in parsed)
+    if charge_text:
+        magnitude = int(charge_text[:-1]) if len(charge_text) > 1 else 1
+        charge = magnitude if charge_text[-1] == "+" else -magnitude
+        canonical += "^" + charge_text
+
+    return Formula(sys.intern(canonical), composition, charge)
+
+
+def canonical_formula(text):
+    """返回物质的规范写法，例如 "H₂SO₄" -> "H2SO4"，"CuSO₄·5H₂O" -> "CuSO4·5H2O" """
+    return parse_formula(text).canonical
+
+
+def split_reactants(text):
+    """
+    把用户输入的反应物字符串拆分为物质列表（按 +、逗号、顿号分隔），去掉等号。
+    离子的电荷符号不会被当作分隔符："Fe^3+ + OH-" -> ["Fe^3+", "OH-"]。
+    """
+    text = text.replace("=", "")
+    # 先把电荷中的 "+" 换成占位符，拆分后再换回来
+    text = _CHARGE_PLUS.sub(lambda m: m.group(0).replace("+", "\0"), text)
+    return [s.strip().replace("\0", "+") for s in _REACTANT_SEPARATORS.split(text) if s.strip()]
+
+
+def canonical_reactants(substances):
+    """
+    返回与顺序无关的规范反应物元组。重复的物质会保留（"Na + Na" 是两个反应物，不是单物质查询）。
+    :param substances: 反应物字符串（如 "HCl, Na"）或物质列表
+    """
+    if isinstance(substances, str):
+        substances = split_reactants(substances)
+    return tuple(sorted(canonical_formula(s) for s in substances))
+
+
+def reactants_key(substances):
+    """反应物集合的规范键，"Na + HCl" 与 "HCl, Na" 得到相同结果"""
+    return sys.intern(" + ".join(canonical_reactants(substances)))
@@ -0,0 +1,301 @@
+"""
+手势管线的画面来源，以及会话录制。
+
+CameraCapture 从 FrameSource 读取画面，来源由 GESTURE_SOURCE 指定：
+- camera:0            摄像头（默认）
+- video:clip.mp4      视频文件
+- frames:some_dir     目录中按文件名排序的图片
+- landmarks:s.jsonl   录制的手部关键点流，回放时完全跳过推理
+
+文件来源默认按录制时的帧率回放；realtime=False 时尽快读取，可以在没有摄像头的机器上
+测试手势管线的吞吐量（python gestures.py bench frames:some_dir）。
+
+设置 GESTURE_RECORD=sessions/demo 时录制会话：原始画面写入 sessions/demo.mp4，
+每帧的手部关键点写入 sessions/demo.landmarks.jsonl。
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+GESTURE_SOURCE = os.getenv("GESTURE_SOURCE", "camera:0")
+GESTURE_RECORD = os.getenv("GESTURE_RECORD", "")
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+class RecordedFrame(np.ndarray):
+    """
+    关键点流回放时的画面：一张空白图像，附带录制的手部关键点（recorded_hands），
+    GestureAnalyzer 看到它时直接使用这些关键点，不做推理。
+    """
+
+    recorded_hands = None
+
+
+class FrameSource:
+    """
+    画面来源接口，与 cv2.VideoCapture 一致：read() 返回 (ret, frame)，release() 释放资源。
+    fps 为来源的帧率（未知时为 None）。
+    """
+
+    fps = None
+
+    def read(self):
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+
+class CameraSource(FrameSource):
+    def __init__(self, index=0):
+        self._cap = cv2.VideoCapture(index)
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS) or None
+
+    def read(self):
+        return self._cap.read()
+
+    def release(self):
+        self._cap.release()
+
+
+class _PacedSource(FrameSource):
+    """
+    文件来源的公共部分：realtime 为 True 时按帧率节流，模拟摄像头；
+    loop 为 True 时读完后从头开始，否则之后 read() 一直返回 (False, None)。
+    """
+
+    def __init__(self, fps=30.0, realtime=True, loop=False):
+        self.fps = fps or 30.0
+        self.realtime = realtime
+        self.loop = loop
+        self._next_time = None
+
+    def _pace(self):
+        if not self.realtime:
+            return
+        now = time.monotonic()
+        if self._next_time is None:
+            self._next_time = now
+        elif now < self._next_time:
+            time.sleep(self._next_time - now)
+        self._next_time = max(self._next_time, now) + 1.0 / self.fps
+
+    def read(self):
+        frame = self._next_frame()
+        if frame is None and self.loop:
+            self._rewind()
+            frame = self._next_frame()
+        if frame is None:
+            return False, None
+        self._pace()
+        return True, frame
+
+    def _next_frame(self):
+        raise NotImplementedError
+
+    def _rewind(self):
+        raise NotImplementedError
+
+
+class VideoFileSource(_PacedSource):
+    def __init__(self, path, realtime=True, loop=False):
+        self.path = path
+        self._cap = cv2.VideoCapture(path)
+        if not self._cap.isOpened():
+            raise OSError(f"无法打开视频: {path}")
+        super().__init__(self._cap.get(cv2.CAP_PROP_FPS), realtime, loop)
+
+    def _next_frame(self):
+        ret, frame = self._cap.read()
+        return frame if ret else None
+
+    def _rewind(self):
+        self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def release(self):
+        self._cap.release()
+
+
+class FrameDirectorySource(_PacedSource):
+    def __init__(self, directory, fps=30.0, realtime=True, loop=False):
+        super().__init__(fps, realtime, loop)
+        self.paths = sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        if not self.paths:
+            raise OSError(f"目录中没有图片: {directory}")
+        self._index = 0
+
+    def _next_frame(self):
+        while self._index < len(self.paths):
+            path = self.paths[self._index]
+            self._index += 1
+            frame = cv2.imread(path)
+            if frame is not None:
+                return frame
+            logging.warning(f"无法读取图片: {path}")
+        return None
+
+    def _rewind(self):
+        self._index = 0
+
+
+class LandmarkStreamSource(_PacedSource):
+    """
+    回放 SessionRecorder 录制的关键点流：每帧是一张附带关键点的空白 RecordedFrame。
+    realtime 时按每条记录的时间戳 "t"（毫秒）回放，重现录制时推理的实际节奏；
+    没有时间戳的旧录制按文件头中的帧率回放。
+    """
+
+    def __init__(self, path, realtime=True, loop=False):
+        with open(path, "r", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            self._records = [json.loads(line) for line in f if line.strip()]
+        super().__init__(header.get("fps"), realtime, loop)
+        self.size = (header["width"], header["height"])
+        # 所有帧共用一张空白图像（只用于预览和翻转，不会被写入）
+        self._blank = np.zeros((self.size[1], self.size[0], 3), dtype=np.uint8)
+        self._index = 0
+        self._origin = None  # 时间戳 0 对应的 time.monotonic()
+
+    def _pace(self):
+        t = self._records[self._index - 1].get("t")
+        if not self.realtime or t is None:
+            super()._pace()
+            return
+        now = time.monotonic()
+        if self._origin is None or self._index == 1:
+            self._origin = now - t / 1000
+        delay = self._origin + t / 1000 - now
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            # 读取方跟不上时不补发积压的帧
+            self._origin -= delay
+
+    def _next_frame(self):
+        if self._index >= len(self._records):
+            return None
+        record = self._records[self._index]
+        self._index += 1
+        frame = self._blank.view(RecordedFrame)
+        frame.recorded_hands = record["hands"]
+        return frame
+
+    def _rewind(self):
+        self._index = 0
+
+
+def open_source(spec, realtime=True, loop=False):
+    """
+    按 "类型:参数" 打开画面来源；整数或纯数字视为摄像头编号，
+    没有类型前缀的路径按后缀判断（目录、.jsonl 或视频文件）。
+    """
+    if isinstance(spec, FrameSource):
+        return spec
+    spec = str(spec)
+    kind, sep, arg = spec.partition(":")
+    if not sep or len(kind) == 1:
+        # "0"、"clip.mp4"、"C:\\clip.mp4" 等没有类型前缀的写法
+        kind, arg = "", spec
+
+    if kind == "camera" or (not kind and arg.isdigit()):
+        return CameraSource(int(arg or 0))
+    if kind == "video":
+        return VideoFileSource(arg, realtime, loop)
+    if kind == "frames" or (not kind and os.path.isdir(arg)):
+        return FrameDirectorySource(arg, realtime=realtime, loop=loop)
+    if kind == "landmarks" or (not kind and arg.endswith(".jsonl")):
+        return LandmarkStreamSource(arg, realtime, loop)
+    if not kind:
+        return VideoFileSource(arg, realtime, loop)
+    raise ValueError(f"未知的画面来源: {spec}")
+
+
+class SessionRecorder:
+    """
+    录制会话：推理线程每处理一帧调用一次 write()。
+    原始画面（未翻转）写入 <prefix>.mp4，手部关键点（翻转后画面中的归一化坐标）写入 <prefix>.landmarks.jsonl，
+    两者都可以用 open_source 回放。
+    只有被推理的帧才会调用 write()，视频按 fps 的时间轴写入：两次调用之间缺的帧用上一帧补齐，
+    因此视频的时长与实际录制时长一致。回放关键点流（输入为 RecordedFrame）时没有画面，不生成视频。
+    """
+
+    def __init__(self, prefix, fps=30.0):
+        self.prefix = prefix
+        self.fps = fps or 30.0
+        directory = os.path.dirname(prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._video = None
+        self._video_frames = 0
+        self._last_frame = None
+        self._landmarks = None
+        self._start = None
+        self.frames = 0
+
+    @property
+    def video_path(self):
+        return f"{self.prefix}.mp4"
+
+    @property
+    def landmarks_path(self):
+        return f"{self.prefix}.landmarks.jsonl"
+
+    def write(self, frame, multi_hand_landmarks, timestamp=None):
+        """
+        :param frame: 原始画面
+        :param multi_hand_landmarks: 该帧的手部关键点（NormalizedLandmarkList 列表）
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        height, width = frame.shape[:2]
+        hands = [[[round(p.x, 5), round(p.y, 5), round(p.z, 5)] for p in hand.landmark]
+                 for hand in multi_hand_landmarks]
+
+        with self._lock:
+            if self._start is None:
+                self._start = timestamp
+                self._landmarks = open(self.landmarks_path, "w", encoding="utf-8")
+                self._landmarks.write(json.dumps({"width": width, "height": height, "fps": self.fps}) + "\n")
+                if not isinstance(frame, RecordedFrame):
+                    self._video = cv2.VideoWriter(self.video_path, cv2.VideoWriter_fourcc(*"mp4v"),
+                                                  self.fps, (width, height))
+            if self._video is not None:
+                self._write_video(frame, timestamp)
+            record = {"t": round((timestamp - self._start) * 1000, 1), "hands": hands}
+            self._landmarks.write(json.dumps(record) + "\n")
+            self.frames += 1
+
+    def _write_video(self, frame, timestamp):
+        # 该帧在视频时间轴上的位置；推理跟不上时中间缺的帧用上一帧补齐
+        due = int((timestamp - self._start) * self.fps) + 1
+        while self._last_frame is not None and self._video_frames < due - 1:
+            self._video.write(self._last_frame)
+            self._video_frames += 1
+        if self._video_frames < due:
+            self._video.write(frame)
+            self._video_frames += 1
+        self._last_frame = frame
+
+    def close(self):
+        with self._lock:
+            if self._landmarks is not None:
+                if self._video is not None:
+                    self._video.release()
+                    self._video = None
+                self._landmarks.close()
+                self._landmarks = None
+                self._last_frame = None
+                logging.info(f"会话已录制: {self.frames} 帧 -> {self.prefix}.*")
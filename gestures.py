@@ -0,0 +1,535 @@
+"""
+手势识别：可替换的推理后端，以及对单帧画面的手势分析。
+
+后端（GESTURE_BACKEND）：
+- legacy：mp.solutions.hands（默认）
+- lite：mp.solutions.hands，model_complexity=0，精度稍低但快得多
+- tasks-video：MediaPipe Tasks HandLandmarker，VIDEO 模式，需要模型文件（GESTURE_TASK_MODEL）
+- tasks-live：HandLandmarker 的 LIVE_STREAM 模式，异步回调返回结果，比画面晚约一帧
+- mouse：不做推理，只用鼠标操作
+
+mediapipe 只在创建推理后端时导入：HandFrame、手势判断和 mouse 后端不依赖 mediapipe，
+脚本驱动（ui_driver.py）可以在没有安装 mediapipe 的机器上运行。
+
+在录制好的画面上（任意 frame_sources 来源，不按帧率节流）比较各后端的推理延迟、吞吐量和手势准确率，
+为每台机器挑选最快的可用后端：
+
+    python gestures.py bench clip.mp4 --labels clip.labels.json
+    python gestures.py bench frames:some_dir --backends legacy lite --inference-size 320x240
+    python gestures.py bench landmarks:session.landmarks.jsonl --backends mouse
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+
+from frame_sources import open_source
+
+load_dotenv()
+
+
+def parse_size(text):
+    """把 "480x360" 解析为 (480, 360)"""
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+GESTURE_BACKEND = os.getenv("GESTURE_BACKEND", "legacy")
+# HandLandmarker 模型文件，tasks-* 后端使用
+GESTURE_TASK_MODEL = os.getenv(
+    "GESTURE_TASK_MODEL",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "hand_landmarker.task")
+)
+# 手势推理分辨率（与摄像头预览分辨率无关）：画面先等比缩小到不超过该尺寸再交给 MediaPipe
+GESTURE_INFERENCE_SIZE = parse_size(os.getenv("GESTURE_INFERENCE_SIZE", "480x360"))
+# 检测到一只手后，只在上一帧手部关键点外接框放大 GESTURE_ROI_SCALE 倍的区域内推理；
+# 每隔 GESTURE_FULL_FRAME_INTERVAL 帧仍做一次整帧推理，以发现新出现的第二只手
+GESTURE_ROI_SCALE = float(os.getenv("GESTURE_ROI_SCALE", 2.0))
+GESTURE_FULL_FRAME_INTERVAL = int(os.getenv("GESTURE_FULL_FRAME_INTERVAL", 15))
+
+MIN_DETECTION_CONFIDENCE = 0.7
+MIN_TRACKING_CONFIDENCE = 0.5
+
+
+class HandFrame:
+    """一帧手势识别的结果，由 GestureAnalyzer.analyze 一次推理得到"""
+
+    def __init__(self, frame, hand_pos=None, is_fist=False, is_palm_open=False, two_hands=False, seq=0):
+        self.frame = frame  # 已水平翻转并绘制地标的画面
+        self.seq = seq  # 对应 CameraCapture 的帧序号
+        self.timestamp = 0.0  # 推理完成的时间
+        self.is_new = True  # 复用上一帧结果时为 False，手势计数只统计新帧
+        self.hand_pos = hand_pos
+        self.is_fist = is_fist
+        self.is_palm_open = is_palm_open
+        self.two_hands = two_hands
+        self.landmarks = []  # 各只手的关键点（翻转后画面中的归一化坐标），录制会话时使用
+
+    @property
+    def label(self):
+        """手势类别，用于基准测试的准确率统计：none / hand / fist / palm / two_hands"""
+        if self.two_hands:
+            return "two_hands"
+        if self.hand_pos is None:
+            return "none"
+        if self.is_fist:
+            return "fist"
+        if self.is_palm_open:
+            return "palm"
+        return "hand"
+
+
+# ---------- 推理后端 ----------
+
+class GestureBackend:
+    """
+    推理后端接口：detect 接收 RGB 图像，返回各只手的关键点（NormalizedLandmarkList，相对于传入的图像归一化）。
+    supports_roi 为 False 的后端只做整帧推理（异步后端的结果与传入的图像不一一对应）。
+    """
+
+    name = ""
+    supports_roi = True
+
+    def detect(self, rgb_image, timestamp_ms):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SolutionHandsBackend(GestureBackend):
+    """mp.solutions.hands；model_complexity=0 即 lite 模型"""
+
+    def __init__(self, max_num_hands=2, model_complexity=1):
+        import mediapipe as mp
+
+        self.name = "lite" if model_complexity == 0 else "legacy"
+        self._hands = mp.solutions.hands.Hands(
+            max_num_hands=max_num_hands,
+            model_complexity=model_complexity,
+            min_detection_confidence=MIN_DETECTION_CONFIDENCE,
+            min_tracking_confidence=MIN_TRACKING_CONFIDENCE
+        )
+
+    def detect(self, rgb_image, timestamp_ms):
+        results = self._hands.process(rgb_image)
+        return list(results.multi_hand_landmarks or [])
+
+    def close(self):
+        self._hands.close()
+
+
+class HandLandmarkerBackend(GestureBackend):
+    """
+    MediaPipe Tasks HandLandmarker。
+    VIDEO 模式同步返回当帧结果；LIVE_STREAM 模式只提交画面，结果由回调写入，detect 返回最近一次的结果。
+    """
+
+    def __init__(self, max_num_hands=2, live_stream=False, model_path=GESTURE_TASK_MODEL):
+        import mediapipe as mp
+        from mediapipe.tasks.python import BaseOptions
+        from mediapipe.tasks.python import vision
+
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"找不到 HandLandmarker 模型文件: {model_path}")
+
+        self.name = "tasks-live" if live_stream else "tasks-video"
+        self._mp = mp
+        self.supports_roi = not live_stream
+        self._live_stream = live_stream
+        self._lock = threading.Lock()
+        self._latest = []
+        self._last_timestamp_ms = -1
+
+        options = vision.HandLandmarkerOptions(
+            base_options=BaseOptions(model_asset_path=model_path),
+            running_mode=vision.RunningMode.LIVE_STREAM if live_stream else vision.RunningMode.VIDEO,
+            num_hands=max_num_hands,
+            min_hand_detection_confidence=MIN_DETECTION_CONFIDENCE,
+            min_tracking_confidence=MIN_TRACKING_CONFIDENCE,
+            result_callback=self._on_result if live_stream else None,
+        )
+        self._landmarker = vision.HandLandmarker.create_from_options(options)
+
+    @staticmethod
+    def _to_landmark_lists(result):
+        """转换为与 mp.solutions 相同的 NormalizedLandmarkList，手势判断和绘制代码可以共用"""
+        return landmark_lists([[(point.x, point.y, point.z) for point in hand] for hand in result.hand_landmarks])
+
+    def _on_result(self, result, output_image, timestamp_ms):
+        hands = self._to_landmark_lists(result)
+        with self._lock:
+            self._latest = hands
+
+    def detect(self, rgb_image, timestamp_ms):
+        # 两个模式都要求时间戳严格递增
+        timestamp_ms = max(int(timestamp_ms), self._last_timestamp_ms + 1)
+        self._last_timestamp_ms = timestamp_ms
+        image = self._mp.Image(image_format=self._mp.ImageFormat.SRGB, data=np.ascontiguousarray(rgb_image))
+
+        if self._live_stream:
+            self._landmarker.detect_async(image, timestamp_ms)
+            with self._lock:
+                return list(self._latest)
+        return self._to_landmark_lists(self._landmarker.detect_for_video(image, timestamp_ms))
+
+    def close(self):
+        self._landmarker.close()
+
+
+class MouseOnlyBackend(GestureBackend):
+    """不做推理：没有可用的摄像头或机器太慢时，只用鼠标和键盘操作"""
+
+    name = "mouse"
+
+    def detect(self, rgb_image, timestamp_ms):
+        return []
+
+
+BACKENDS = {
+    "legacy": lambda max_num_hands: SolutionHandsBackend(max_num_hands, model_complexity=1),
+    "lite": lambda max_num_hands: SolutionHandsBackend(max_num_hands, model_complexity=0),
+    "tasks-video": lambda max_num_hands: HandLandmarkerBackend(max_num_hands, live_stream=False),
+    "tasks-live": lambda max_num_hands: HandLandmarkerBackend(max_num_hands, live_stream=True),
+    "mouse": lambda max_num_hands: MouseOnlyBackend(),
+}
+
+
+def create_backend(name, max_num_hands=2):
+    try:
+        factory = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"未知的手势后端: {name}（可选: {', '.join(BACKENDS)}）") from None
+    return factory(max_num_hands)
+
+
+# ---------- 单帧分析 ----------
+
+class GestureAnalyzer:
+    """
+    对单帧画面做手势分析：缩小到推理分辨率，跟踪到一只手时只在 ROI 内推理，
+    把关键点换算为光标位置、握拳、张开手掌和双手标志。不涉及摄像头和界面，可以离线回放。
+    """
+
+    def __init__(self, backend=GESTURE_BACKEND, screen_size=(1400, 800), inference_size=GESTURE_INFERENCE_SIZE,
+                 roi_scale=GESTURE_ROI_SCALE, full_frame_interval=GESTURE_FULL_FRAME_INTERVAL, draw_landmarks=True):
+        self.backend = create_backend(backend, max_num_hands=2)
+        # ROI 推理：裁剪区域内只有跟踪中的那只手，单独一个实例，跟踪状态不会被整帧推理打乱
+        self.roi_backend = create_backend(backend, max_num_hands=1) if self.backend.supports_roi else None
+        self.screen_size = screen_size
+        self.inference_size = inference_size
+        self.roi_scale = roi_scale
+        self.full_frame_interval = full_frame_interval
+        self.draw_landmarks = draw_landmarks
+        if draw_landmarks:
+            try:
+                import mediapipe as mp
+            except ImportError:
+                # 没有安装 mediapipe 时（mouse 后端）只是不绘制地标
+                self.draw_landmarks = False
+            else:
+                self.mp_hands = mp.solutions.hands
+                self.mp_drawing = mp.solutions.drawing_utils
+        # 下一帧的推理区域 (x, y, w, h)，像素坐标；None 表示整帧推理
+        self._roi = None
+        self._roi_frames = 0
+
+    @property
+    def name(self):
+        return self.backend.name
+
+    def analyze(self, frame, timestamp_ms=None):
+        """
+        对一帧画面只做一次推理，同时得到光标位置、握拳、张开手掌和双手标志。
+        跟踪到一只手时只在其周围的 ROI 内推理，丢失时当帧回退到整帧推理。
+        :param timestamp_ms: 画面的时间戳（毫秒），回放录像时传入；默认取当前时间
+        """
+        if timestamp_ms is None:
+            timestamp_ms = time.monotonic() * 1000
+        # 关键点流回放的画面自带关键点，跳过推理
+        recorded_hands = getattr(frame, "recorded_hands", None)
+        frame = cv2.flip(frame, 1)  # 水平翻转以校正摄像头镜像（视觉镜像）
+        frame_height, frame_width = frame.shape[:2]
+
+        multi_hand_landmarks = []
+        if recorded_hands is not None:
+            multi_hand_landmarks = landmark_lists(recorded_hands)
+        elif self._roi is not None and self._roi_frames < self.full_frame_interval:
+            multi_hand_landmarks = self._detect(self.roi_backend, frame, self._roi, timestamp_ms)
+            self._roi_frames += 1
+        if not multi_hand_landmarks and recorded_hands is None:
+            multi_hand_landmarks = self._detect(self.backend, frame, (0, 0, frame_width, frame_height), timestamp_ms)
+            self._roi_frames = 0
+
+        # 只有一只手时才切换到 ROI 推理，双手手势需要看到整帧
+        if len(multi_hand_landmarks) == 1 and self.roi_backend is not None:
+            self._roi = self._landmarks_roi(multi_hand_landmarks[0], frame_width, frame_height)
+        else:
+            self._roi = None
+
+        hand_frame = HandFrame(frame)
+        hand_frame.landmarks = multi_hand_landmarks
+        if not multi_hand_landmarks:
+            return hand_frame
+
+        first_hand = multi_hand_landmarks[0]
+        hand_frame.is_fist = is_fist(first_hand)
+        hand_frame.is_palm_open = is_palm_open(first_hand)
+        hand_frame.two_hands = len(multi_hand_landmarks) >= 2
+
+        for hand_landmarks in multi_hand_landmarks:
+            hand_frame.hand_pos = hand_center(hand_landmarks, self.screen_size)
+
+            # 绘制手部地标
+            if self.draw_landmarks:
+                self.mp_drawing.draw_landmarks(frame, hand_landmarks, self.mp_hands.HAND_CONNECTIONS)
+
+        return hand_frame
+
+    def _fit_inference_size(self, image):
+        """等比缩小到不超过推理分辨率，不放大"""
+        height, width = image.shape[:2]
+        max_width, max_height = self.inference_size
+        scale = min(max_width / width, max_height / height)
+        if scale >= 1:
+            return image
+        size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+    def _detect(self, backend, frame, roi, timestamp_ms):
+        """
+        在 frame 的 roi 区域内推理，返回手部关键点列表。
+        关键点被换算回整帧的归一化坐标，后续的手势判断、光标映射和绘制都不需要关心 ROI。
+        """
+        x, y, w, h = roi
+        frame_height, frame_width = frame.shape[:2]
+        # 先缩小再转换颜色，cvtColor 只处理小图
+        small = self._fit_inference_size(frame[y:y + h, x:x + w])
+        multi_hand_landmarks = backend.detect(cv2.cvtColor(small, cv2.COLOR_BGR2RGB), timestamp_ms)
+
+        for hand_landmarks in multi_hand_landmarks:
+            for landmark in hand_landmarks.landmark:
+                landmark.x = (x + landmark.x * w) / frame_width
+                landmark.y = (y + landmark.y * h) / frame_height
+        return multi_hand_landmarks
+
+    def _landmarks_roi(self, hand_landmarks, frame_width, frame_height):
+        """
+        以关键点外接框为中心、放大 roi_scale 倍的正方形区域（像素坐标），限制在画面内。
+        区域接近整帧时返回 None。
+        """
+        xs = [landmark.x * frame_width for landmark in hand_landmarks.landmark]
+        ys = [landmark.y * frame_height for landmark in hand_landmarks.landmark]
+        center_x = (min(xs) + max(xs)) / 2
+        center_y = (min(ys) + max(ys)) / 2
+        side = max(max(xs) - min(xs), max(ys) - min(ys)) * self.roi_scale
+        # 手离摄像头较远时外接框很小，保证 ROI 不小于画面短边的 1/4
+        side = int(min(max(side, min(frame_width, frame_height) / 4), frame_width, frame_height))
+
+        x = int(min(max(center_x - side / 2, 0), frame_width - side))
+        y = int(min(max(center_y - side / 2, 0), frame_height - side))
+        if side * side > 0.6 * frame_width * frame_height:
+            return None
+        return x, y, side, side
+
+    def close(self):
+        self.backend.close()
+        if self.roi_backend is not None:
+            self.roi_backend.close()
+
+
+def landmark_lists(hands):
+    """把 [[x, y, z], ...] 形式的关键点（录制文件中的格式）转换为 NormalizedLandmarkList 列表"""
+    from mediapipe.framework.formats import landmark_pb2
+
+    lists = []
+    for hand in hands:
+        landmark_list = landmark_pb2.NormalizedLandmarkList()
+        landmark_list.landmark.extend(landmark_pb2.NormalizedLandmark(x=x, y=y, z=z) for x, y, z in hand)
+        lists.append(landmark_list)
+    return lists
+
+
+def hand_center(hand_landmarks, screen_size):
+    """获取手的中心位置并校准到 Pygame 屏幕坐标"""
+    wrist = hand_landmarks.landmark[0]
+    middle_finger = hand_landmarks.landmark[9]
+
+    # 计算手部中心的归一化坐标
+    avg_x_norm = (wrist.x + middle_finger.x) / 2
+    avg_y_norm = (wrist.y + middle_finger.y) / 2
+
+    # 使用直接映射到屏幕坐标
+    return int(avg_x_norm * screen_size[0]), int(avg_y_norm * screen_size[1])
+
+
+def is_palm_open(hand_landmarks):
+    """检测手掌是否张开（用于清除操作）"""
+    fingers = 0
+    if hand_landmarks.landmark[4].x < hand_landmarks.landmark[3].x:
+        fingers += 1
+    for tip, root in [(8, 7), (12, 11), (16, 15), (20, 19)]:
+        if hand_landmarks.landmark[tip].y < hand_landmarks.landmark[root].y:
+            fingers += 1
+
+    return fingers >= 4
+
+
+def is_fist(hand_landmarks):
+    """检测是否握拳（用于确认选择）"""
+    fingers = 0
+    # 检查拇指和其他四个手指是否弯曲
+    is_thumb_curled = hand_landmarks.landmark[4].x < hand_landmarks.landmark[3].x if \
+    hand_landmarks.landmark[4].x < hand_landmarks.landmark[0].x else hand_landmarks.landmark[4].x > \
+                                                                     hand_landmarks.landmark[
+                                                                         0].x  # 简化判断，确保不伸直
+    if is_thumb_curled: fingers += 1
+    for tip, root in [(8, 7), (12, 11), (16, 15), (20, 19)]:
+        if hand_landmarks.landmark[tip].y < hand_landmarks.landmark[root].y:
+            fingers += 1
+
+    return fingers <= 1  # 如果伸直的手指少于等于1，认为是握拳
+
+
+# ---------- 基准测试 ----------
+
+def read_clip(spec, max_frames=None):
+    """逐帧读取一个画面来源（不按帧率节流），返回 (时间戳毫秒, 帧)；max_frames 限制最多读取的帧数"""
+    source = open_source(spec, realtime=False)
+    fps = source.fps or 30.0
+    try:
+        index = 0
+        while max_frames is None or index < max_frames:
+            ret, frame = source.read()
+            if not ret:
+                return
+            yield index * 1000.0 / fps, frame
+            index += 1
+    finally:
+        source.release()
+
+
+def load_labels(path):
+    """标注文件：JSON 列表，每帧一个手势类别（none / hand / fist / palm / two_hands）"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def benchmark_backend(backend, frames, labels=None, inference_size=GESTURE_INFERENCE_SIZE, roi=True):
+    """
+    把同一组画面依次交给一个后端分析，返回延迟统计和各帧的手势类别。
+    :param frames: (时间戳毫秒, 帧) 的可迭代对象，可以边解码边分析，解码时间不计入延迟和吞吐量
+    :param labels: 每帧的标注；为 None 时不统计准确率
+    """
+    analyzer = GestureAnalyzer(backend, inference_size=inference_size, draw_landmarks=False,
+                               full_frame_interval=GESTURE_FULL_FRAME_INTERVAL if roi else 0)
+    latencies = []
+    predicted = []
+    try:
+        for timestamp_ms, frame in frames:
+            start = time.perf_counter()
+            hand_frame = analyzer.analyze(frame, timestamp_ms)
+            latencies.append((time.perf_counter() - start) * 1000)
+            predicted.append(hand_frame.label)
+    finally:
+        analyzer.close()
+    elapsed = sum(latencies) / 1000
+
+    latencies.sort()
+    report = {
+        "backend": backend,
+        "frames": len(latencies),
+        "p50_ms": percentile(latencies, 50),
+        "p90_ms": percentile(latencies, 90),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": latencies[-1] if latencies else 0.0,
+        # 吞吐量（帧/秒），高于录制帧率即说明管线跟得上实时画面
+        "fps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "accuracy": None,
+    }
+    if labels is not None:
+        compared = list(zip(predicted, labels))
+        if compared:
+            report["accuracy"] = sum(p == l for p, l in compared) / len(compared)
+    return report, predicted
+
+
+def benchmark(clip, backends, labels=None, inference_size=GESTURE_INFERENCE_SIZE, roi=True, max_frames=None):
+    """
+    用同一段录像（画面来源，见 frame_sources.open_source）测试多个后端。
+    每个后端重新打开一次来源、边解码边分析，不把整段录像读进内存；解码时间不计入延迟。
+    没有标注时以第一个后端的结果为参照，准确率即与它的一致率。
+    :param max_frames: 每个后端最多分析的帧数
+    """
+    reports = []
+    reference = labels
+    for name in backends:
+        try:
+            report, predicted = benchmark_backend(name, read_clip(clip, max_frames), reference, inference_size, roi)
+        except (FileNotFoundError, ImportError, ValueError) as e:
+            logging.warning(f"跳过后端 {name}: {e}")
+            continue
+        if reference is None:
+            reference = predicted
+            report["accuracy"] = 1.0
+        reports.append(report)
+    return reports
+
+
+def format_report(reports, labelled):
+    accuracy_title = "accuracy" if labelled else "agreement"
+    lines = [f"{'backend':<12} {'frames':>6} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+             f"{'fps':>8} {accuracy_title:>10}"]
+    for r in reports:
+        accuracy = f"{r['accuracy'] * 100:.1f}%" if r["accuracy"] is not None else "-"
+        lines.append(f"{r['backend']:<12} {r['frames']:>6} {r['p50_ms']:>8.2f} {r['p90_ms']:>8.2f} "
+                     f"{r['p99_ms']:>8.2f} {r['max_ms']:>8.2f} {r['fps']:>8.1f} {accuracy:>10}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="手势识别后端")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    bench_parser = subparsers.add_parser("bench", help="在录像上比较各后端的推理延迟和手势准确率")
+    bench_parser.add_argument("clip", help="画面来源：视频文件、frames:目录 或 landmarks:关键点流")
+    bench_parser.add_argument("--labels", default=None, help="逐帧手势标注（JSON 列表）；缺省时与第一个后端比较")
+    bench_parser.add_argument("--backends", nargs="+", default=[name for name in BACKENDS if name != "mouse"],
+                              choices=list(BACKENDS), help="要测试的后端")
+    bench_parser.add_argument("--inference-size", type=parse_size, default=GESTURE_INFERENCE_SIZE,
+                              help="推理分辨率，例如 320x240")
+    bench_parser.add_argument("--no-roi", action="store_true", help="总是整帧推理")
+    bench_parser.add_argument("--max-frames", type=int, default=None, help="每个后端最多分析的帧数")
+
+    subparsers.add_parser("list", help="列出可用的后端")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == "list":
+        print("\n".join(BACKENDS))
+        return 0
+
+    labels = load_labels(args.labels) if args.labels else None
+    reports = benchmark(args.clip, args.backends, labels, args.inference_size, roi=not args.no_roi,
+                        max_frames=args.max_frames)
+    print(format_report(reports, labels is not None))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,575 @@
+"""
+Kimi（Moonshot）AI 查询。
+
+所有请求都通过模块级的 KimiClientManager 发出：共用一个带 keep-alive 连接池的客户端，
+用信号量限制同时在途的请求数，并在 429/5xx/连接错误时按带抖动的指数退避重试。
+查询结果写入本地缓存（query_cache.py）。
+界面和预取通过 request_general_info / request_substance_list 发起查询，相同的在途查询会被合并（query_service.py）。
+"""
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import openai
+from dotenv import load_dotenv
+from openai import OpenAI
+
+from formula import canonical_formula, canonical_reactants, reactants_key
+from knowledge_base import KNOWLEDGE_BASE_PATH, KnowledgeBase
+from query_cache import QueryCache
+from query_result import QueryError, ResultFormatError, load_result, parse_response, to_json
+from query_service import QueryService
+
+load_dotenv()
+
+KIMI_API_KEY = os.getenv("KIMI_API_KEY")
+# 可以指向兼容 OpenAI 接口的替身服务器（stub_ai_server.py），用于离线压测
+KIMI_BASE_URL = os.getenv("KIMI_BASE_URL", "https://api.moonshot.cn/v1")
+KIMI_MODEL = "kimi-k2-turbo-preview" # 这是一个模型名称，可以保留在代码中，或者也放到 .env 中
+
+# 提示词有改动时递增版本号，使旧的缓存结果自动失效
+PROMPT_VERSION = 1
+GENERAL_INFO_TEMPERATURE = 0.6
+SUBSTANCE_LIST_TEMPERATURE = 0.7
+
+# Kimi 查询结果的本地缓存，KIMI_CACHE_REFRESH=1 时忽略缓存强制重新查询
+KIMI_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "kimi_cache.sqlite3")
+KIMI_CACHE_TTL = int(os.getenv("KIMI_CACHE_TTL", 30 * 24 * 3600))
+KIMI_CACHE_MAX_ENTRIES = int(os.getenv("KIMI_CACHE_MAX_ENTRIES", 5000))
+KIMI_CACHE_REFRESH = os.getenv("KIMI_CACHE_REFRESH", "0") == "1"
+
+# 中心物质和反应物列表默认由本地反应性索引（reactivity.py）即时生成；
+# KIMI_SUBSTANCE_LISTS=1 时改为由 AI 挑选，查询失败时仍回退到本地索引
+KIMI_SUBSTANCE_LISTS = os.getenv("KIMI_SUBSTANCE_LISTS", "0") == "1"
+
+# 流式输出时两个数据块之间允许的最长间隔（秒），超过即视为超时
+KIMI_STREAM_IDLE_TIMEOUT = float(os.getenv("KIMI_STREAM_IDLE_TIMEOUT", 15))
+# 流式输出时部分结果没有变化的情况下，至多每隔这么多秒回调一次 on_partial，告诉界面数据仍在到达
+KIMI_PARTIAL_HEARTBEAT = float(os.getenv("KIMI_PARTIAL_HEARTBEAT", 0.5))
+
+# HTTP 连接池配置：所有查询共用一个客户端，复用 keep-alive 连接
+KIMI_CONNECT_TIMEOUT = float(os.getenv("KIMI_CONNECT_TIMEOUT", 5))
+KIMI_READ_TIMEOUT = float(os.getenv("KIMI_READ_TIMEOUT", 30))
+KIMI_MAX_CONCURRENCY = int(os.getenv("KIMI_MAX_CONCURRENCY", 4))
+KIMI_MAX_RETRIES = int(os.getenv("KIMI_MAX_RETRIES", 3))
+
+# 预取预算：后台预取最多占用的并发请求数，以及每批最多预取的查询数
+KIMI_PREFETCH_CONCURRENCY = int(os.getenv("KIMI_PREFETCH_CONCURRENCY", 2))
+KIMI_PREFETCH_LIMIT = int(os.getenv("KIMI_PREFETCH_LIMIT", 6))
+
+# 化学物质列表
+ALLOWED_SUBSTANCES_LIST = (
+    "H₂, O₂, N₂, Cl₂, C, S, P, Fe, Cu, Zn, Al, Mg, Ag, Au, Hg, "
+    "H₂O, CO, CO₂, CaO, Fe₂O₃, CuO, MgO, Al₂O₃, MnO₂, SO₂, SO₃, "
+    "HCl, H₂SO₄, HNO₃, H₂CO₃, H₃PO₄, CH₃COOH, "
+    "NaOH, Ca(OH)₂, KOH, Ba(OH)₂, Cu(OH)₂, Fe(OH)₃, Al(OH)₃, NH₃·H₂O, "
+    "NaCl, CaCl₂, BaCl₂, FeCl₃, CuCl₂, AgCl, NH₄Cl, "
+    "Na₂SO₄, CuSO₄·5H₂O, BaSO₄, CaSO₄·2H₂O, FeSO₄, ZnSO₄, "
+    "Na₂CO₃, NaHCO₃, CaCO₃, BaCO₃, K₂CO₃, "
+    "AgNO₃, KNO₃, NaNO₃, Cu(NO₃)₂, Ba(NO₃)₂, "
+    "Na₃PO₄, Ca₃(PO₄)₂, NH₄H₂PO₄, "
+    "FeS, CuS, ZnS, "
+    "KMnO₄, K₂MnO₄, KClO₃, NaClO, "
+    "H₂O₂, CH₄, C₂H₅OH, C₆H₁₂O₆, C₁₂H₂₂O₁₁, (C₆H₁₀O₅)ₙ, 蛋白质, 油脂, 石蜡, "
+    "KAl(SO₄)₂·12H₂O, SiO₂, NH₃"
+)
+ALLOWED_SUBSTANCES = tuple(s.strip() for s in ALLOWED_SUBSTANCES_LIST.split(',') if s.strip())
+
+class _DrainingResponseStream(httpx.SyncByteStream):
+    """
+    SDK 读到流式响应的 "data: [DONE]" 就关闭响应，此时分块编码的结束标记还没读，
+    httpx 只能断开这个连接。这里在关闭前先读完剩下的结束标记，连接就能回到连接池；
+    没读到 [DONE]（如取消）时照常直接关闭。
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._finished = False
+
+    def __iter__(self):
+        for chunk in self._stream:
+            self._finished = chunk.rstrip().endswith(b"[DONE]")
+            yield chunk
+
+    def close(self):
+        try:
+            if self._finished:
+                for _ in self._stream:
+                    pass
+        except httpx.HTTPError:
+            pass
+        finally:
+            self._stream.close()
+
+
+class _KeepAliveTransport(httpx.HTTPTransport):
+    def handle_request(self, request):
+        response = super().handle_request(request)
+        response.stream = _DrainingResponseStream(response.stream)
+        return response
+
+
+class KimiClientManager:
+    """
+    共享的 OpenAI 兼容客户端。
+    客户端在第一次使用时创建，之后所有线程复用同一个连接池，避免每次查询都重新握手 TLS。
+    """
+
+    # 可以重试的错误：限流、服务端错误、连接失败/超时
+    RETRYABLE_ERRORS = (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)
+
+    def __init__(self, api_key, base_url, connect_timeout=5.0, read_timeout=30.0,
+                 max_concurrency=4, max_retries=3, backoff_base=0.5, backoff_max=8.0):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._client = None
+        self._max_concurrency = max_concurrency
+
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                http_client = httpx.Client(
+                    timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                    transport=_KeepAliveTransport(limits=httpx.Limits(
+                        max_connections=self._max_concurrency,
+                        max_keepalive_connections=self._max_concurrency,
+                        keepalive_expiry=60,
+                    )),
+                )
+                # 重试由 chat_completion 统一处理，关闭 SDK 自带的重试
+                self._client = OpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    http_client=http_client,
+                    max_retries=0,
+                )
+            return self._client
+
+    def _backoff_delay(self, attempt, error):
+        """带完全抖动的指数退避；429 响应带 Retry-After 时优先使用"""
+        response = getattr(error, "response", None)
+        if response is not None:
+            retry_after = response.headers.get("retry-after")
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except (TypeError, ValueError):
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _create_with_retry(self, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                return self.client().chat.completions.create(**kwargs)
+            except self.RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff_delay(attempt, e)
+                logging.warning(f"Kimi 请求失败（{type(e).__name__}），{delay:.2f} 秒后第 {attempt + 1} 次重试")
+                time.sleep(delay)
+                attempt += 1
+
+    def chat_completion(self, **kwargs):
+        """
+        发起一次对话补全请求，参数与 client.chat.completions.create 相同。
+        请求占用一个并发名额；流式请求的名额在数据读完（或迭代器被关闭）后才释放。
+        """
+        self._semaphore.acquire()
+        try:
+            completion = self._create_with_retry(**kwargs)
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+        if not kwargs.get("stream"):
+            self._semaphore.release()
+            return completion
+        return self._release_after_stream(completion)
+
+    def _release_after_stream(self, stream):
+        try:
+            yield from stream
+        finally:
+            # 提前结束（如取消）时关闭响应，连接可以尽快回到连接池
+            stream.close()
+            self._semaphore.release()
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+
+kimi_clients = KimiClientManager(
+    KIMI_API_KEY,
+    KIMI_BASE_URL,
+    connect_timeout=KIMI_CONNECT_TIMEOUT,
+    read_timeout=KIMI_READ_TIMEOUT,
+    max_concurrency=KIMI_MAX_CONCURRENCY,
+    max_retries=KIMI_MAX_RETRIES,
+)
+
+query_cache = QueryCache(KIMI_CACHE_PATH, ttl=KIMI_CACHE_TTL, max_entries=KIMI_CACHE_MAX_ENTRIES)
+# 预先构建的离线知识库（python knowledge_base.py build），文件不存在时不启用
+knowledge_base = KnowledgeBase(KNOWLEDGE_BASE_PATH)
+
+
+def query_ai_general_info(substances_str, force_refresh=False, on_partial=None, cancel_event=None, use_cache=True):
+    """
+    通过Kimi查询物质信息（单物质）或反应情况（多物质）。
+    结果以流式方式接收，已完整收到的段落有变化时回调 on_partial；没有变化时至多每 KIMI_PARTIAL_HEARTBEAT 秒回调一次。
+    :param substances_str: 物质列表，用逗号或加号分隔，例如 "H2O", "Na, HCl"
+    :param force_refresh: 为 True 时跳过离线知识库和本地缓存，重新查询并覆盖缓存
+    :param on_partial: 可选回调 on_partial(partial_result)，收到新的完整段落时调用，另有节流的心跳调用（结果不变）；
+                       partial_result 是由目前已完整收到的各段解析出的结果（partial=True），尚无完整段落时为 None
+    :param cancel_event: 可选 threading.Event，被设置后停止接收并放弃结果（不写入缓存）
+    :param use_cache: 为 False 时既不读也不写本地查询缓存（构建知识库时使用，不挤掉课堂上缓存的结果）
+    :return: SubstanceInfo / ReactionResult，失败时为 QueryError
+    """
+    # 规范化后的反应物与书写顺序、上下标写法无关，"Na + HCl" 与 "HCl, Na" 是同一个查询
+    substances_list = list(canonical_reactants(substances_str))
+
+    if not substances_list:
+        return QueryError("请输入有效的物质名称")
+
+    normalized_query = reactants_key(substances_list)
+    cache_key = QueryCache.make_key(normalized_query, PROMPT_VERSION, KIMI_MODEL, GENERAL_INFO_TEMPERATURE)
+    if not (force_refresh or KIMI_CACHE_REFRESH):
+        kb_result = _load_stored_result(knowledge_base.get(normalized_query, PROMPT_VERSION, KIMI_MODEL),
+                                        "离线知识库", normalized_query)
+        if kb_result is not None:
+            return kb_result
+
+        if use_cache:
+            cached = _load_stored_result(query_cache.get(cache_key), "查询缓存", normalized_query)
+            if cached is not None:
+                return cached
+
+    substance1 = substances_list[0]
+    substance2_list = substances_list[1:]
+    substance2 = ', '.join(substance2_list) if substance2_list else ""
+
+    try:
+        if len(substances_list) == 1:
+            # 单物质查询
+            prompt = f"""请提供物质 {substance1} 的详细信息。
+
+**分析要求：**
+1. 详细介绍该物质的基本性质、结构特点和主要用途（不少于150字）。
+2. 提供相关的学习资源和参考链接。
+
+**回答格式必须严格按照以下三段式格式输出，并且每段内容之间必须使用三个星号（***）作为唯一分隔符：**
+
+INFO***物质的详细介绍（不少于150字，需包含基本性质和结构特点）***参考链接：https://www.ranktracker.com/zh/seo/glossary/link-text/
+
+**请确保：**
+* 第一段必须是 **INFO**。
+* 第二段是详细的介绍文本，不能包含 `***` 字符。
+* 第三段必须以 **`参考链接：`** 开头，后面紧跟一个完整的、可访问的 URL 链接（例如：`https://zh.wikipedia.org/wiki/水`）。
+"""
+
+            system_content = "你是一个资深的化学专家和化学教育工作者，擅长用通俗易懂的语言解释复杂的化学概念，并提供准确的学习资源。请始终按照指定的格式回答，不要添加额外的解释。"
+
+        else:
+            # 多物质反应查询 (格式保持不变)
+            reactants_formula = substance1 + ' + ' + '+'.join(substance2_list)
+            prompt = f"""请详细分析化学反应 {reactants_formula} 的情况。
+
+
+分析要求：
+1. 判断这两种物质是否能发生化学反应
+2. 分析反应的条件（温度、压力、催化剂等）
+3. 分析反应的类型（置换反应、化合反应、分解反应、复分解反应等）
+4. 说明反应的现象（颜色变化、气体产生、沉淀生成、放热等）
+5. 提供相关的学习资源和参考链接（百度百科直接询问化学品（比如水））
+
+回答格式必须严格按照以下格式：（中间记得要加上***）
+如果能发生反应：YES***反应方程式***反应条件和现象***参考链接：https://zh.wikipedia.org/wiki/(反应后生成物质)***详细的反应机理和应用说明（500字以内）
+如果不能发生反应：NO***不能反应的具体原因和化学原理（500字以内，需要说明为什么不能反应）
+（实例：YES
+*** 2 HCl(aq) + 2 Na(s) → 2 NaCl(aq) + H₂(g)↑
+*** 常温常压即可，无需催化剂；钠熔成银白色小球并快速游动，发出“嘶嘶”声，溶液放热，伴随无色气泡（H₂）逸出，点燃可听到轻微爆鸣。
+*** 参考链接：https://zh.wikipedia.org/wiki/氯化钠
+*** 机理：Na失电子被氧化成Na⁺，H⁺得电子还原为H₂；实验室可用此法制少量纯净H₂，工业上因成本高已淘汰。）
+请确保：
+- 反应方程式必须正确和平衡
+- 链接必须是真实的化学学习网站
+- 现象描述要具体和专业
+- 原因解释要基于化学原理"""
+
+            system_content = "你是一个资深的化学专家和化学教育工作者，擅长用通俗易懂的语言解释复杂的化学概念。你需要：\n1. 准确判断化学反应的可能性\n2. 提供正确的化学方程式\n3. 解释反应条件和现象\n4. 提供有用的学习资源\n5. 帮助学生理解化学反应的原理\n请始终按照指定的格式回答，不要添加额外的解释。"
+
+        completion = kimi_clients.chat_completion(
+            model=KIMI_MODEL,
+            messages=[
+                {
+                    "role": "system",
+                    "content": system_content
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            temperature=GENERAL_INFO_TEMPERATURE,
+            stream=True,
+            # 流式读取时 read 超时作用于相邻两个数据块之间，而不是整个回答；连接超时仍沿用连接池的设置
+            timeout=httpx.Timeout(KIMI_STREAM_IDLE_TIMEOUT, connect=KIMI_CONNECT_TIMEOUT),
+        )
+
+        result = ""
+        completed_text = ""
+        partial_result = None
+        last_partial_time = 0.0
+        for chunk in completion:
+            if cancel_event is not None and cancel_event.is_set():
+                completion.close()
+                logging.debug(f"查询已取消: {normalized_query}")
+                return QueryError("查询已取消")
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            result += delta
+
+            # 出现新的 '***' 时说明前一段已经完整，解析后先交给界面显示
+            changed = False
+            if '*' in delta:
+                completed_sections = [line.strip() for line in result.split('***')[:-1]]
+                if completed_sections and '***'.join(completed_sections) != completed_text:
+                    completed_text = '***'.join(completed_sections)
+                    changed = True
+                    try:
+                        partial_result = parse_response(completed_text, len(substances_list), partial=True)
+                    except ResultFormatError:
+                        partial_result = None
+            # 每个数据块都回调会让界面为每个 token 处理一次事件；段落没变时只发节流的心跳，供界面的超时计时
+            now = time.monotonic()
+            if on_partial is not None and (changed or now - last_partial_time >= KIMI_PARTIAL_HEARTBEAT):
+                last_partial_time = now
+                on_partial(partial_result)
+
+        logging.debug(f"Kimi AI Response: {result}")
+
+        # 只解析一次：缺少字段、类型不符或方程式无法配平的回答不写入缓存（方程式系数写错时已改正）
+        try:
+            parsed = parse_response(result, len(substances_list))
+        except ResultFormatError as e:
+            logging.warning(f"AI返回格式错误: {normalized_query}: {e}")
+            return QueryError("AI返回格式错误，请尝试重新查询")
+
+        if use_cache:
+            query_cache.set(cache_key, normalized_query, to_json(parsed))
+        return parsed
+
+    except Exception as e:
+        logging.error(f"Kimi查询错误: {e}", exc_info=True)
+        return QueryError("Kimi查询发生异常")
+
+
+def _load_stored_result(stored, source, normalized_query):
+    """读取知识库或缓存中的结果，格式有误的条目视为未命中（离线检查，不需要联网）"""
+    if stored is None:
+        return None
+    try:
+        result = load_result(stored)
+    except ResultFormatError as e:
+        logging.warning(f"{source}中的条目格式有误，已忽略: {normalized_query}: {e}")
+        return None
+    logging.debug(f"命中{source}: {normalized_query}")
+    return result
+
+
+# 合并相同的在途查询：前台查询、预取和重复触发的同一查询共用一个请求
+query_service = QueryService(KIMI_MAX_CONCURRENCY)
+
+
+def request_general_info(substances_str, force_refresh=False, on_partial=None):
+    """
+    在后台发起 query_ai_general_info，同一反应（与书写顺序无关）已在查询中时直接挂到该查询上。
+    :return: QueryHandle，不再需要结果时调用 release()
+    """
+    key = ("general_info", reactants_key(substances_str), bool(force_refresh or KIMI_CACHE_REFRESH))
+    return query_service.request(
+        key,
+        lambda partial, cancel_event: query_ai_general_info(
+            substances_str, force_refresh=force_refresh, on_partial=partial, cancel_event=cancel_event),
+        on_partial=on_partial,
+    )
+
+
+class PrefetchScheduler:
+    """
+    在后台低优先级地预取反应分析结果并写入缓存。
+    预取只占用 max_concurrency 个工作线程（共享客户端的其余并发名额留给用户的前台查询），
+    每批最多 max_queued 个查询；开始新一批或调用 cancel() 时，上一批尚未开始的任务被取消，
+    正在进行的请求会在收到下一个数据块时停止（用户此时恰好也在查询同一反应时继续进行）。
+    """
+
+    def __init__(self, max_concurrency=2, max_queued=6):
+        self.max_queued = max_queued
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency),
+                                            thread_name_prefix="kimi-prefetch")
+        self._lock = threading.Lock()
+        self._cancel_event = threading.Event()
+        self._futures = []
+        self._handles = []
+
+    def prefetch(self, queries):
+        """开始新一批预取，已在知识库或缓存中的查询会被跳过"""
+        self.cancel()
+        with self._lock:
+            cancel_event = self._cancel_event = threading.Event()
+            self._futures = [
+                self._executor.submit(self._run, query, cancel_event)
+                for query in queries[:self.max_queued]
+            ]
+
+    def _run(self, query, cancel_event):
+        if cancel_event.is_set():
+            return
+        normalized_query = reactants_key(query)
+        cache_key = QueryCache.make_key(normalized_query, PROMPT_VERSION, KIMI_MODEL, GENERAL_INFO_TEMPERATURE)
+        stored = knowledge_base.get(normalized_query, PROMPT_VERSION, KIMI_MODEL)
+        if stored is not None or query_cache.get(cache_key) is not None:
+            return
+        logging.debug(f"预取反应分析: {normalized_query}")
+        handle = request_general_info(query)
+        with self._lock:
+            if cancel_event.is_set():
+                handle.release()
+                return
+            self._handles.append(handle)
+        # 占住本工作线程直到查询结束或被取消，使预取的并发数不超过 max_concurrency
+        handle.wait()
+
+    def cancel(self):
+        """取消当前这一批预取"""
+        with self._lock:
+            self._cancel_event.set()
+            for future in self._futures:
+                future.cancel()
+            for handle in self._handles:
+                handle.release()
+            self._futures = []
+            self._handles = []
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+reaction_prefetcher = PrefetchScheduler(KIMI_PREFETCH_CONCURRENCY, KIMI_PREFETCH_LIMIT)
+
+
+# --- 【核心修改点】AI 动态生成物质列表的函数，已加入用户列表约束和不可反应物质约束 ---
+def query_ai_substance_list(context_substance=None):
+    """
+    调用 Kimi AI 生成物质列表。
+    物质列表需要每次都有变化，所以总是优先联网查询；缓存只在查询失败（如离线）时兜底。
+    :param context_substance: 如果提供，生成与该物质反应的物质列表；否则生成中心物质列表。
+    :return: 物质列表 (list of str)，或 None（如果失败）
+    """
+    cache_query = f"substance_list:{canonical_formula(context_substance) if context_substance else ''}"
+    cache_key = QueryCache.make_key(cache_query, PROMPT_VERSION, KIMI_MODEL, SUBSTANCE_LIST_TEMPERATURE)
+
+    try:
+        system_content = "你是一个资深的化学专家，专门为初中/高一学生设计化学实验和教学内容。请仅输出物质的化学式，不要包含任何额外的文字、解释或编号。"
+
+        if context_substance:
+            # 生成反应物列表 - 包含能反应和不能反应的物质（4能反应 + 2不能反应）
+            prompt = f"""请针对初中/高一化学阶段，提供6个物质的化学式，用于与中心物质 {context_substance} 进行反应模拟。
+
+**要求：**
+1. 在这6个物质中，必须包含4个能与 {context_substance} 发生化学反应的物质。
+2. 在这6个物质中，必须包含2个**不能**与 {context_substance} 发生化学反应的物质（惰性气体除外，应选择常见的酸、碱、盐、氧化物等）。
+3. 物质必须是常见的、且反应原理符合初中/高一教学大纲。
+4. 每个物质的化学式之间使用英文逗号 `,` 分隔。
+5. 严格输出6个化学式。
+6. **所有物质必须从以下列表中选取。尽量选择与上次不同的组合：**
+{ALLOWED_SUBSTANCES_LIST}
+
+**格式示例：**
+Na,H2O,FeCl3,AgNO3,SiO2,C
+"""
+        else:
+            # 生成中心物质列表 (保持原样)
+            prompt = f"""请针对初中/高一化学阶段，提供6个常见的、具有代表性的物质的化学式，作为实验的中心物质。
+
+**要求：**
+1. 物质必须是常见的，如酸、碱、盐、氧化物、单质。
+2. 每个物质的化学式之间使用英文逗号 `,` 分隔。
+3. 严格输出6个化学式。
+4. **所有物质必须从以下列表中选取。尽量选择与上次不同的组合：**
+{ALLOWED_SUBSTANCES_LIST}
+
+**格式示例：**
+HCl,NaOH,CuSO4,CaCO3,Fe,H2O
+"""
+
+        completion = kimi_clients.chat_completion(
+            model=KIMI_MODEL,
+            messages=[
+                {
+                    "role": "system",
+                    "content": system_content
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            temperature=SUBSTANCE_LIST_TEMPERATURE,
+        )
+
+        result = completion.choices[0].message.content
+        logging.debug(f"AI Substance List Response: {result}")
+
+        # 解析化学式列表
+        substance_list = [s.strip() for s in result.split(',') if s.strip()]
+
+        if len(substance_list) == 6:
+            query_cache.set(cache_key, cache_query, ','.join(substance_list))
+            # 随机打乱列表，将能反应和不能反应的物质混合
+            random.shuffle(substance_list)
+            return substance_list
+        else:
+            logging.error(f"AI返回的物质数量不符: {len(substance_list)}个，期待6个")
+            return _cached_substance_list(cache_key)
+
+    except Exception as e:
+        logging.error(f"Kimi查询物质列表错误: {e}")
+        return _cached_substance_list(cache_key)
+
+
+def request_substance_list(context_substance=None):
+    """
+    在后台发起 query_ai_substance_list，同一中心物质的列表已在查询中时直接挂到该查询上。
+    :return: QueryHandle，结果为物质列表或 None
+    """
+    key = ("substance_list", canonical_formula(context_substance) if context_substance else "")
+    return query_service.request(key, lambda partial, cancel_event: query_ai_substance_list(context_substance))
+
+
+def _cached_substance_list(cache_key):
+    """联网查询失败时，从缓存中取上一次成功的物质列表"""
+    cached = query_cache.get(cache_key)
+    if cached is None:
+        return None
+    logging.warning("物质列表查询失败，使用缓存中的列表")
+    substance_list = cached.split(',')
+    random.shuffle(substance_list)
+    return substance_list
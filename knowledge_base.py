@@ -0,0 +1,280 @@
+"""
+离线反应知识库。
+
+ALLOWED_SUBSTANCES_LIST 中大约有 90 种物质，应用能展示的内容是有限的：
+约 4000 个两两反应加上每种物质的信息页。本模块把它们预先查询好保存在本地 SQLite 中，
+运行时 query_ai_general_info 会先查知识库，课堂部署可以完全不联网、不产生 API 费用。
+
+构建（可随时中断，再次运行会从断点继续）：
+
+    python knowledge_base.py build --interval 1.0
+    python knowledge_base.py stats
+    python knowledge_base.py validate --cache --fix
+"""
+import argparse
+import itertools
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+KNOWLEDGE_BASE_PATH = os.getenv(
+    "KIMI_KNOWLEDGE_BASE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge_base.sqlite3")
+)
+
+
+class KnowledgeBase:
+    def __init__(self, path, create=False):
+        """
+        :param path: SQLite 文件路径
+        :param create: 为 False 时文件不存在则知识库处于禁用状态（运行时使用）；构建时为 True
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+        if not create and not os.path.exists(path):
+            return
+
+        try:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " result TEXT NOT NULL,"
+                " prompt_version INTEGER NOT NULL,"
+                " model TEXT NOT NULL,"
+                " created REAL NOT NULL)"
+            )
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"无法打开知识库 {path}: {e}")
+            self._conn = None
+
+    @property
+    def available(self):
+        return self._conn is not None
+
+    def get(self, key, prompt_version=None, model=None):
+        """
+        按规范反应物键（formula.reactants_key）查找结果，未收录时返回 None。
+        给出 prompt_version / model 时只返回用同样的提示词版本和模型生成的结果，旧条目视为未收录。
+        """
+        if self._conn is None:
+            return None
+        sql, params = self._filtered("SELECT result FROM entries WHERE key = ?", [key], prompt_version, model)
+        with self._lock:
+            try:
+                row = self._conn.execute(sql, params).fetchone()
+            except sqlite3.Error as e:
+                logging.warning(f"读取知识库失败: {e}")
+                return None
+        return row[0] if row else None
+
+    def keys(self, prompt_version=None, model=None):
+        """已收录的键；给出 prompt_version / model 时只包括与之一致的条目"""
+        if self._conn is None:
+            return set()
+        sql, params = self._filtered("SELECT key FROM entries WHERE 1", [], prompt_version, model)
+        with self._lock:
+            return {row[0] for row in self._conn.execute(sql, params)}
+
+    @staticmethod
+    def _filtered(sql, params, prompt_version, model):
+        if prompt_version is not None:
+            sql += " AND prompt_version = ?"
+            params.append(prompt_version)
+        if model is not None:
+            sql += " AND model = ?"
+            params.append(model)
+        return sql, params
+
+    def items(self):
+        """返回全部 (key, result, prompt_version, model)"""
+        if self._conn is None:
+            return []
+        with self._lock:
+            return self._conn.execute("SELECT key, result, prompt_version, model FROM entries").fetchall()
+
+    def put(self, key, result, prompt_version, model):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, result, prompt_version, model, created)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, result, prompt_version, model, time.time())
+            )
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def count(self):
+        if self._conn is None:
+            return 0
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def all_queries(substances):
+    """知识库应覆盖的全部查询：每种物质的信息页 + 所有无序物质对"""
+    queries = list(substances)
+    queries += [f"{a} + {b}" for a, b in itertools.combinations(substances, 2)]
+    return queries
+
+
+def build(kb, interval=1.0, limit=None, singles_only=False):
+    """
+    逐条查询尚未收录（或由旧的提示词版本、模型生成）的条目并写入知识库。每条写入后立即提交，中断后再次运行即可续建。
+    :param interval: 两次联网请求之间至少间隔的秒数（限速）
+    :param limit: 本次最多新增的条目数
+    """
+    # 延迟导入，避免 kimi 模块与本模块循环导入
+    from formula import reactants_key
+    from kimi import ALLOWED_SUBSTANCES, KIMI_MODEL, PROMPT_VERSION, query_ai_general_info
+    from query_result import to_json
+
+    queries = list(ALLOWED_SUBSTANCES) if singles_only else all_queries(ALLOWED_SUBSTANCES)
+    # 提示词版本或模型不同的旧条目也重新查询
+    done = kb.keys(PROMPT_VERSION, KIMI_MODEL)
+    pending = [q for q in queries if reactants_key(q) not in done]
+    logging.info(f"知识库共 {len(queries)} 条，已收录 {len(queries) - len(pending)} 条，待查询 {len(pending)} 条")
+    if limit is not None:
+        pending = pending[:limit]
+
+    added = failed = 0
+    last_request = 0.0
+    for i, query in enumerate(pending, 1):
+        wait = interval - (time.monotonic() - last_request)
+        if wait > 0:
+            time.sleep(wait)
+        last_request = time.monotonic()
+
+        # 不经过运行时的查询缓存：既不使用其中可能由旧提示词生成的结果，也不挤掉课堂上缓存的条目
+        result = query_ai_general_info(query, use_cache=False)
+        if result.kind == "ERROR":
+            failed += 1
+            logging.warning(f"[{i}/{len(pending)}] 查询失败，稍后重新运行即可补齐: {query}")
+            continue
+
+        kb.put(reactants_key(query), to_json(result), PROMPT_VERSION, KIMI_MODEL)
+        added += 1
+        logging.info(f"[{i}/{len(pending)}] 已收录: {query}")
+
+    logging.info(f"本次新增 {added} 条，失败 {failed} 条，知识库现有 {kb.count()} 条")
+    return added, failed
+
+
+def validate(kb, cache=None, fix=False, prompt_version=None, model=None):
+    """
+    批量检查知识库（以及可选的查询缓存）中保存的结果，不需要联网：
+    字段是否完整、YES 结果的方程式是否配平。
+    :param cache: 同时检查的 QueryCache（其中的物质列表条目会被跳过）
+    :param fix: 为 True 时写回改正了配平系数（或由旧的 "***" 文本转换为 JSON）的结果，并删除格式有误的条目
+    :param prompt_version: 当前的提示词版本，知识库中版本不同的条目计为过期
+    :param model: 当前的模型，知识库中模型不同的条目计为过期
+    :return: {"ok": 正确条数, "updated": 需要更新的条数, "rejected": 格式有误的条数, "stale": 过期条数}；
+             过期条目运行时不会被使用，也会同时计入前三项之一，重新运行 build 即可更新
+    """
+    from query_result import ResultFormatError, load_result, to_json
+
+    stats = {"ok": 0, "updated": 0, "rejected": 0}
+    stale = 0
+    started = time.perf_counter()
+
+    def visit(source, name, stored, store, remove):
+        try:
+            normalized = to_json(load_result(stored))
+        except ResultFormatError as e:
+            stats["rejected"] += 1
+            logging.warning(f"[{source}] 格式有误: {name}: {e}")
+            if fix:
+                remove()
+            return
+        if normalized != stored:
+            stats["updated"] += 1
+            logging.info(f"[{source}] 需要更新（配平系数有误或为旧格式）: {name}")
+            if fix:
+                store(normalized)
+        else:
+            stats["ok"] += 1
+
+    for key, result, entry_version, entry_model in kb.items():
+        if ((prompt_version is not None and entry_version != prompt_version)
+                or (model is not None and entry_model != model)):
+            stale += 1
+            logging.info(f"[知识库] 已过期（提示词版本 {entry_version}，模型 {entry_model}）: {key}")
+        visit("知识库", key, result,
+              lambda value: kb.put(key, value, entry_version, entry_model), lambda: kb.delete(key))
+    if cache is not None:
+        for key, query, value in cache.items():
+            if query.startswith("substance_list:"):
+                continue
+            visit("查询缓存", query, value, lambda v: cache.set(key, query, v), lambda: cache.delete(key))
+
+    elapsed = (time.perf_counter() - started) * 1000
+    logging.info(f"共检查 {sum(stats.values())} 条（{elapsed:.0f} ms）：正确 {stats['ok']} 条，"
+                 f"需要更新 {stats['updated']} 条，格式有误 {stats['rejected']} 条")
+    if not fix and (stats["updated"] or stats["rejected"]):
+        logging.info("加上 --fix 可写回更新后的结果，并删除格式有误的条目")
+    if stale:
+        logging.info(f"知识库中有 {stale} 条由旧的提示词版本或模型生成，运行时不会使用，重新运行 build 即可更新")
+    stats["stale"] = stale
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="构建离线反应知识库")
+    parser.add_argument("--db", default=KNOWLEDGE_BASE_PATH, help="知识库文件路径")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="查询并收录尚未收录的条目（可续建）")
+    build_parser.add_argument("--interval", type=float, default=1.0, help="两次请求之间的最小间隔（秒）")
+    build_parser.add_argument("--limit", type=int, default=None, help="本次最多新增的条目数")
+    build_parser.add_argument("--singles-only", action="store_true", help="只收录单物质信息页")
+
+    subparsers.add_parser("stats", help="显示知识库收录情况")
+
+    validate_parser = subparsers.add_parser("validate", help="检查已收录结果的格式和反应方程式（不联网）")
+    validate_parser.add_argument("--fix", action="store_true", help="写回更新后的结果并删除格式有误的条目")
+    validate_parser.add_argument("--cache", action="store_true", help="同时检查本地查询缓存")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    kb = KnowledgeBase(args.db, create=args.command == "build")
+    try:
+        if args.command == "build":
+            build(kb, interval=args.interval, limit=args.limit, singles_only=args.singles_only)
+        elif args.command == "validate":
+            from kimi import KIMI_MODEL, PROMPT_VERSION
+            cache = None
+            if args.cache:
+                from kimi import query_cache as cache
+            validate(kb, cache=cache, fix=args.fix, prompt_version=PROMPT_VERSION, model=KIMI_MODEL)
+        else:
+            from kimi import ALLOWED_SUBSTANCES, KIMI_MODEL, PROMPT_VERSION
+            total = len(all_queries(ALLOWED_SUBSTANCES))
+            current = len(kb.keys(PROMPT_VERSION, KIMI_MODEL))
+            print(f"{args.db}: 已收录 {kb.count()} / {total} 条，其中 {kb.count() - current} 条已过期")
+    finally:
+        kb.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,16 +3,29 @@ import random
 import sys
 import os
 import cv2
-import mediapipe as mp
+import numpy as np
 import threading
 import time
+import queue
 from collections import deque
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import webbrowser
 import re
-from openai import OpenAI
 from dotenv import load_dotenv
 from urllib.parse import urlparse
+from thumbnails import ThumbnailCache
+from text_layout import layout_lines, wrap_text
+from formula import canonical_formula, split_reactants
+from frame_sources import GESTURE_RECORD, GESTURE_SOURCE, SessionRecorder, open_source
+from gestures import GESTURE_BACKEND, GestureAnalyzer
+from kimi import (ALLOWED_SUBSTANCES, KIMI_STREAM_IDLE_TIMEOUT, KIMI_SUBSTANCE_LISTS, query_service,
+                  reaction_prefetcher, request_general_info, request_substance_list)
+from query_result import QueryError, ReactionResult, SubstanceInfo
+from reactivity import ReactivityIndex, SubstanceSampler
+from retained import RetainedScreen
+from ui_tasks import TASK_DONE_EVENT, TASK_PARTIAL_EVENT, UiTaskRunner
 
 load_dotenv()
 
@@ -20,9 +33,13 @@ load_dotenv()
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("kimiai")
 
-KIMI_API_KEY = os.getenv("KIMI_API_KEY")
-KIMI_BASE_URL="https://api.moonshot.cn/v1"
-KIMI_MODEL = "kimi-k2-turbo-preview" # 这是一个模型名称，可以保留在代码中，或者也放到 .env 中
+# 本地缓存目录（查询结果、缩略图等）
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+
+# 无界面模式（CHEM_HEADLESS=1，ui_driver.py 使用）：SDL 使用 dummy 驱动，不需要显示器和声卡
+if os.getenv("CHEM_HEADLESS", "0") == "1":
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
 
 pygame.init()
 WIDTH, HEIGHT = 1400, 800
@@ -43,22 +60,6 @@ BACKGROUND_DARK = (210, 220, 230)
 CURSOR_COLOR = ERROR_RED
 CURSOR_RADIUS = 12
 
-# 化学物质列表
-ALLOWED_SUBSTANCES_LIST = (
-    "H₂, O₂, N₂, Cl₂, C, S, P, Fe, Cu, Zn, Al, Mg, Ag, Au, Hg, "
-    "H₂O, CO, CO₂, CaO, Fe₂O₃, CuO, MgO, Al₂O₃, MnO₂, SO₂, SO₃, "
-    "HCl, H₂SO₄, HNO₃, H₂CO₃, H₃PO₄, CH₃COOH, "
-    "NaOH, Ca(OH)₂, KOH, Ba(OH)₂, Cu(OH)₂, Fe(OH)₃, Al(OH)₃, NH₃·H₂O, "
-    "NaCl, CaCl₂, BaCl₂, FeCl₃, CuCl₂, AgCl, NH₄Cl, "
-    "Na₂SO₄, CuSO₄·5H₂O, BaSO₄, CaSO₄·2H₂O, FeSO₄, ZnSO₄, "
-    "Na₂CO₃, NaHCO₃, CaCO₃, BaCO₃, K₂CO₃, "
-    "AgNO₃, KNO₃, NaNO₃, Cu(NO₃)₂, Ba(NO₃)₂, "
-    "Na₃PO₄, Ca₃(PO₄)₂, NH₄H₂PO₄, "
-    "FeS, CuS, ZnS, "
-    "KMnO₄, K₂MnO₄, KClO₃, NaClO, "
-    "H₂O₂, CH₄, C₂H₅OH, C₆H₁₂O₆, C₁₂H₂₂O₁₁, (C₆H₁₀O₅)ₙ, 蛋白质, 油脂, 石蜡, "
-    "KAl(SO₄)₂·12H₂O, SiO₂, NH₃"
-)
 def get_font(size):
     # 1. 优先尝试本地字体文件
     font_files = [
@@ -114,12 +115,24 @@ font_large = get_font(48)
 font_tiny = get_font(18)  # 用于下标
 
 
-def render_chemical_formula(surface, formula_text, x, y, main_font, sub_font, color):
+@lru_cache(maxsize=256)
+def render_text(font, text, color):
+    """整段文本的渲染结果缓存，用于每帧重复绘制的固定文字"""
+    return font.render(text, True, color)
+
+
+@lru_cache(maxsize=4096)
+def render_glyph(font, char, color):
+    """单个字符的渲染结果缓存（LRU 字形表），键为 (字体, 字符, 颜色)"""
+    return font.render(char, True, color)
+
+
+@lru_cache(maxsize=512)
+def render_formula_surface(formula_text, main_font, sub_font, color):
     """
-    渲染化学式，使用 get_ascent() 针对 CJK 字体进行精确下标定位。
+    把整个化学式预先合成到一张透明 Surface 上并缓存，返回 (surface, 宽度)。
+    使用 get_ascent() 针对 CJK 字体进行精确下标定位。
     """
-    current_x = x
-
     # 核心修复: 使用 get_ascent() (字符基线上方的高度) 计算偏移，忽略不稳定的行高。
     main_ascent = main_font.get_ascent()
 
@@ -130,6 +143,10 @@ def render_chemical_formula(surface, formula_text, x, y, main_font, sub_font, co
     is_prev_digit = False
     is_prev_subscript = False
 
+    glyphs = []
+    current_x = 0
+    right_edge = 0
+
     for i, char in enumerate(formula_text):
         use_sub_font = False
 
@@ -152,81 +169,42 @@ def render_chemical_formula(surface, formula_text, x, y, main_font, sub_font, co
         # 选择字体
         font = sub_font if use_sub_font else main_font
 
-        # 计算 Y 坐标：下标从 Y + 偏移量开始，主字体从 Y 开始
-        draw_y = y + subscript_offset_y if use_sub_font else y
+        # 计算 Y 坐标：下标从偏移量开始，主字体从 0 开始
+        draw_y = subscript_offset_y if use_sub_font else 0
 
         try:
-            char_surf = font.render(char, True, color)
-            surface.blit(char_surf, (current_x, draw_y))
-
-            # 步进距离
-            step = char_surf.get_width()
-            # 细微调整：下标字符可以更紧凑一些
-            if use_sub_font:
-                step -= 1
-
-            current_x += step
-
+            char_surf = render_glyph(font, char, color)
         except Exception as e:
             logging.error(f"渲染字符 '{char}' 失败: {e}")
             continue
 
-    return current_x - x
+        glyphs.append((char_surf, current_x, draw_y))
+        right_edge = max(right_edge, current_x + char_surf.get_width())
 
+        # 步进距离
+        step = char_surf.get_width()
+        # 细微调整：下标字符可以更紧凑一些
+        if use_sub_font:
+            step -= 1
 
-def wrap_text(font, text, max_width):
-    """将文本根据最大宽度进行换行"""
-    if not text:
-        return []
-
-    lines = []
-    current_line = ""
-    # 使用空格分割，对于中文或其他连续文本，可以按字符处理
-    segments = text.split(' ') if ' ' in text else list(text)
-
-    for segment in segments:
-        if current_line:
-            # 尝试在当前行追加段落（包括一个空格）
-            test_line = current_line + (" " if ' ' in text else "") + segment
-        else:
-            test_line = segment
+        current_x += step
 
-        text_width = font.size(test_line)[0]
+    height = max(main_font.get_height(), subscript_offset_y + sub_font.get_height())
+    formula_surf = pygame.Surface((max(right_edge, 1), height), pygame.SRCALPHA)
+    for char_surf, glyph_x, glyph_y in glyphs:
+        # 取最大值合成，保持字形原有的颜色和透明度，避免在透明底上二次混合造成边缘发暗
+        formula_surf.blit(char_surf, (glyph_x, glyph_y), special_flags=pygame.BLEND_RGBA_MAX)
 
-        if text_width <= max_width:
-            current_line = test_line
-        else:
-            # 如果整段/整词就超宽，需要按字符分割
-            if not current_line and ' ' not in text:
-                temp_line = ""
-                for i, char in enumerate(segment):
-                    if font.size(temp_line + char)[0] <= max_width:
-                        temp_line += char
-                    else:
-                        lines.append(temp_line)
-                        temp_line = char
-                if temp_line:
-                    current_line = temp_line
-            elif not current_line and ' ' in text:
-                # 当前行空，但新段落超宽（例如一个超长的URL）
-                temp_line = ""
-                for char in segment:
-                    if font.size(temp_line + char)[0] <= max_width:
-                        temp_line += char
-                    else:
-                        lines.append(temp_line)
-                        temp_line = char
-                if temp_line:
-                    current_line = temp_line
-            else:
-                # 当前行已满，将当前行结束并开始新行
-                lines.append(current_line.strip())
-                current_line = segment
+    return formula_surf, current_x
 
-    if current_line.strip():
-        lines.append(current_line.strip())
 
-    return lines
+def render_chemical_formula(surface, formula_text, x, y, main_font, sub_font, color):
+    """
+    渲染化学式，返回渲染宽度。合成好的化学式会被缓存，重复绘制只需一次 blit。
+    """
+    formula_surf, width = render_formula_surface(formula_text, main_font, sub_font, color)
+    surface.blit(formula_surf, (x, y))
+    return width
 
 
 def extract_links(text):
@@ -252,34 +230,25 @@ def draw_text_with_links(surface, font, text, x, y, color, link_color=PRIMARY_BL
         surface.blit(text_surf, (x, y))
         return text_surf, []
 
-    current_x = x
-    current_y = y
-
     # 预先进行换行处理，确保链接不会被截断
     # 假设 surface 已经是 content_rect.width 大小的临时 surface
     max_line_width = surface.get_width() - 20
-    full_text_lines = wrap_text(font, text, max_line_width)
     line_height = font.get_height()
 
     current_y = y
 
-    for line_text in full_text_lines:
-        current_x = x
-
-        # 查找当前行文本与原始文本的对应关系
-        line_start_in_full = text.find(line_text)
-
-        # 简化处理：由于 wrap_text 已经处理了换行，我们只处理当前行内的文本和链接
-        temp_line_pos_x = current_x
+    # 排版结果直接给出每行在原文中的偏移，链接区间可以精确映射到行内
+    for line_start_in_full, line_end_in_full in layout_lines(font, text, max_line_width):
+        line_text = text[line_start_in_full:line_end_in_full]
+        temp_line_pos_x = x
 
-        # 修复：初始化当前行已处理文本的结束位置，解决 UnboundLocalError
+        # 当前行已处理文本的结束位置
         last_end_in_line = 0
 
         for link_info in links:
             # 检查链接是否完全或部分在当前行内
             link_start_in_full = link_info['start']
             link_end_in_full = link_info['end']
-            line_end_in_full = line_start_in_full + len(line_text)
 
             # 链接在当前行之前或之后，跳过
             if link_end_in_full <= line_start_in_full or link_start_in_full >= line_end_in_full:
@@ -327,13 +296,192 @@ def draw_text_with_links(surface, font, text, x, y, color, link_color=PRIMARY_BL
     return None, link_rects
 
 
-# --- 【修改 1a】移除固定物质列表 ---
-def load_substance_images(substances, image_dir="images"):
-    substance_images = {}
-    # 为了避免启动时报错，直接返回空字典，在需要时再尝试加载
-    return {}
+def build_reaction_report(info, width):
+    """
+    把一次查询结果排版成一张与内容等高的透明 Surface，返回 (surface, links)。
+    links 中的 rect 相对于该 Surface；结果只在 reaction_info 变化时构建一次，
+    滚动时只需从中 blit 一个子区域。
+    """
+    blocks = []  # (surface, (x, y))
+    report_links = []
+    y_offset = 10
+    max_display_width = width - 40
+
+    def add_label(text, color=BLACK, font=font_medium, step=40):
+        nonlocal y_offset
+        blocks.append((font.render(text, True, color), (20, y_offset)))
+        y_offset += step
+
+    def add_paragraph(text, color=BLACK):
+        nonlocal y_offset
+        for line in wrap_text(font_small, text, max_display_width):
+            blocks.append((font_small.render(line, True, color), (30, y_offset)))
+            y_offset += 35
+
+    def add_links(text):
+        nonlocal y_offset
+        line_count = max(1, len(layout_lines(font_small, text, width - 20)))
+        link_surface = pygame.Surface((width, line_count * font_small.get_height()), pygame.SRCALPHA)
+        _, links = draw_text_with_links(link_surface, font_small, text, 30, 0, BLACK, PRIMARY_BLUE)
+        blocks.append((link_surface, (0, y_offset)))
+        for link in links:
+            report_links.append({
+                'rect': link['rect'].move(0, y_offset),
+                'url': link['url']
+            })
+        y_offset += link_surface.get_height() + 10
+
+    result = info['result']
+
+    # --- 统一的查询内容显示 ---
+    reactants_text = f"查询内容: {info['reactants']}"
+    query_type_font = font_large
+    if isinstance(result, SubstanceInfo):
+        query_type_font = font_medium
+
+    reactants_surf, _ = render_formula_surface(reactants_text, query_type_font, font_medium, PRIMARY_BLUE)
+    blocks.append((reactants_surf, (20, y_offset + (font_large.get_height() // 2 - font_medium.get_height() // 2))))
+    y_offset += 70
+
+    # --- 核心逻辑：区分 INFO 和 YES/NO ---
+    if isinstance(result, SubstanceInfo):
+        # --- 单物质信息逻辑 ---
+        add_label("▶ 报告类型: 物质信息报告", SUCCESS_GREEN, step=50)
+
+        # 详细信息
+        if result.description:
+            add_label("【详细信息】:")
+            # 确保内容能被换行正确处理
+            add_paragraph(result.description.replace('\n', ' ').replace('\r', ''))
+
+        # 参考链接
+        if result.link:
+            add_label("【参考链接】:")
+            add_links(result.link)
+
+    elif isinstance(result, ReactionResult):
+        # --- 反应分析逻辑 ---
+        if result.reacts:
+            add_label("▶ 结论: ✓ 能发生化学反应", SUCCESS_GREEN, step=50)
+
+            # 反应方程式
+            if result.equation:
+                add_label("【反应方程式】:")
+                for line in wrap_text(font_small, result.equation, max_display_width):
+                    equation_surf, _ = render_formula_surface(line, font_small, font_tiny, PRIMARY_BLUE)
+                    blocks.append((equation_surf, (30, y_offset)))
+                    y_offset += 35
+
+            # 反应条件和现象
+            if result.conditions:
+                add_label("【条件与现象】:")
+                add_paragraph(result.conditions)
+
+            # 参考链接
+            if result.link:
+                add_label("【参考链接】:")
+                add_links(result.link)
+
+            # 详细说明
+            if result.mechanism:
+                add_label("【反应机理与应用】:")
+                add_paragraph(result.mechanism)
+        else:
+            add_label("▶ 结论: ✗ 不能发生化学反应", ERROR_RED, step=50)
+
+            # 不能反应的原因
+            if result.reason:
+                add_label("【不能反应的原因】:")
+                add_paragraph(result.reason)
+
+    else:
+        add_label("❌ 查询失败或AI返回格式错误", ERROR_RED, step=60)
+        add_label(result.message or "请检查网络或输入的查询内容", font=font_small, step=font_small.get_height())
+
+    report_surface = pygame.Surface((width, max(y_offset, 1)), pygame.SRCALPHA)
+    for surf, pos in blocks:
+        report_surface.blit(surf, pos)
+
+    return report_surface, report_links
+
+
+# 物质图片缓存：规范化学式 -> 缩放后的图片，只在界面线程中写入
+substance_images = {}
+# 预先缩放好的 100x100 缩略图，运行时不再解码原图
+thumbnail_cache = ThumbnailCache(os.path.join(CACHE_DIR, "thumbs"), (100, 100))
+
+
+class AssetPreloader:
+    """
+    后台预加载物质图片：线程池负责读文件和解码 PNG，解码好的图片通过队列交给界面线程，
+    由 drain() 在界面线程中完成 convert_alpha 并放入 substance_images。
+    图片就绪前 SelectionBox 显示占位框。
+    """
+
+    def __init__(self, image_dir="images", max_workers=4):
+        self.image_dir = image_dir
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="asset-preload")
+        self._ready = queue.Queue()
+        self._lock = threading.Lock()
+        self._requested = set()
+
+    def image_path(self, substance):
+        """按规范化学式定位图片，"H₂SO₄" 和 "H2SO4" 都对应 images/H2SO4.png"""
+        return os.path.join(self.image_dir, f"{canonical_formula(substance)}.png")
+
+    def has_image(self, substance):
+        return os.path.exists(self.image_path(substance))
+
+    def request(self, substances):
+        """提交一批物质的图片加载任务（可在任意线程调用），已提交过的会被跳过"""
+        for substance in substances:
+            key = canonical_formula(substance)
+            with self._lock:
+                if key in self._requested:
+                    continue
+                self._requested.add(key)
+
+            image_path = self.image_path(key)
+            if os.path.exists(image_path):
+                self._executor.submit(self._load, key, image_path)
+
+    def _load(self, key, image_path):
+        try:
+            image = thumbnail_cache.load(image_path)
+        except Exception as e:
+            logging.warning(f"无法加载 {key} 的图片: {e}")
+            image = None
+        self._ready.put((key, image))
+
+    def drain(self):
+        """在界面线程中调用：把已解码的图片转换为显示格式并登记"""
+        while True:
+            try:
+                key, image = self._ready.get_nowait()
+            except queue.Empty:
+                return
+            if image is None:
+                continue
+            try:
+                substance_images[key] = image.convert_alpha()
+            except pygame.error as e:
+                logging.warning(f"无法转换 {key} 的图片: {e}")
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+asset_preloader = AssetPreloader()
+# 启动时就在后台预加载整个物质列表的图片
+asset_preloader.request(ALLOWED_SUBSTANCES)
+
+# 本地反应性索引：即时生成中心物质和反应物列表
+reactivity_index = ReactivityIndex(ALLOWED_SUBSTANCES)
+substance_sampler = SubstanceSampler(reactivity_index)
+
+# 界面后台任务：结果以 TASK_DONE_EVENT 事件返回界面线程
+ui_tasks = UiTaskRunner()
 
-substance_images = load_substance_images([]) # 初始化为空
 
 def load_background_image(image_path="images/1234.png"):
     """加载背景图片"""
@@ -349,281 +497,227 @@ def load_background_image(image_path="images/1234.png"):
 background_image = load_background_image()
 
 
-def query_ai_general_info(substances_str):
-    """
-    通过Kimi查询物质信息（单物质）或反应情况（多物质）。
-    :param substances_str: 物质列表，用逗号或加号分隔，例如 "H2O", "Na, HCl"
-    :return: 格式化的AI结果字符串
-    """
-    # 移除查询字符串中的等号，避免方程式提前解析
-    substances_str = substances_str.replace('=', '').strip()
+def draw_background(surface):
+    if background_image:
+        surface.blit(background_image, (0, 0))
+    else:
+        surface.fill(BACKGROUND_LIGHT)
 
-    substances_list = [s.strip() for s in re.split(r'[+,，]', substances_str) if s.strip()]
 
-    if not substances_list:
-        return "ERROR***请输入有效的物质名称"
+def draw_cursor(surface, hand_pos):
+    """绘制手势光标，返回其占用的矩形（没有光标时为 None）"""
+    if not hand_pos:
+        return None
+    return pygame.draw.circle(surface, CURSOR_COLOR, hand_pos, CURSOR_RADIUS)
 
-    substance1 = substances_list[0]
-    substance2_list = substances_list[1:]
-    substance2 = ', '.join(substance2_list) if substance2_list else ""
+class CameraCapture:
+    """
+    后台摄像头采集线程：独占画面来源（摄像头、视频文件等，见 frame_sources），只在环形缓冲区中保留最新的几帧，
+    渲染循环通过 latest_frame() 非阻塞地取帧，不再被摄像头帧间隔或驱动卡顿拖住。
+    """
 
-    try:
-        client = OpenAI(
-            api_key=KIMI_API_KEY,
-            base_url=KIMI_BASE_URL,
-        )
+    def __init__(self, source=0, buffer_size=2):
+        self.cap = open_source(source)
+        self._frames = deque(maxlen=buffer_size)
+        self._new_frame = threading.Condition()
+        self._seq = 0
+        self._running = True
+        self._thread = threading.Thread(target=self._capture_loop, name="camera-capture", daemon=True)
+        self._thread.start()
+
+    def _capture_loop(self):
+        while self._running:
+            ret, frame = self.cap.read()
+            if not ret:
+                # 摄像头暂时无画面，稍等后重试，避免空转占满 CPU
+                time.sleep(0.01)
+                continue
+            with self._new_frame:
+                self._seq += 1
+                self._frames.append((self._seq, frame))
+                self._new_frame.notify_all()
 
-        if len(substances_list) == 1:
-            # 单物质查询
-            prompt = f"""请提供物质 {substance1} 的详细信息。
+    def latest_frame(self):
+        """
+        返回 (序号, 帧)。序号在每次采集到新帧时递增；尚无画面时返回 (0, None)。
+        """
+        with self._new_frame:
+            if not self._frames:
+                return 0, None
+            return self._frames[-1]
 
-**分析要求：**
-1. 详细介绍该物质的基本性质、结构特点和主要用途（不少于150字）。
-2. 提供相关的学习资源和参考链接。
+    def wait_frame(self, after_seq, timeout=0.1):
+        """
+        阻塞等待序号大于 after_seq 的新帧（供推理线程使用），超时返回 (after_seq, None)。
+        """
+        with self._new_frame:
+            self._new_frame.wait_for(lambda: self._seq > after_seq or not self._running, timeout)
+            if self._seq <= after_seq or not self._frames:
+                return after_seq, None
+            return self._frames[-1]
 
-**回答格式必须严格按照以下三段式格式输出，并且每段内容之间必须使用三个星号（***）作为唯一分隔符：**
+    def release(self):
+        self._running = False
+        with self._new_frame:
+            self._new_frame.notify_all()
+        self._thread.join(timeout=1.0)
+        self.cap.release()
 
-INFO***物质的详细介绍（不少于150字，需包含基本性质和结构特点）***参考链接：https://www.ranktracker.com/zh/seo/glossary/link-text/
 
-**请确保：**
-* 第一段必须是 **INFO**。
-* 第二段是详细的介绍文本，不能包含 `***` 字符。
-* 第三段必须以 **`参考链接：`** 开头，后面紧跟一个完整的、可访问的 URL 链接（例如：`https://zh.wikipedia.org/wiki/水`）。
-"""
+class CameraPreview:
+    """
+    摄像头预览：每帧只做一次缩放（需要时再做一次水平翻转），结果写入预先分配的 NumPy 缓冲区。
+    缓冲区在创建时就被一个 pygame Surface 包装（frombuffer 共享内存），之后每帧只需 blit 这个 Surface，
+    不再为每一帧创建新的字节串和 Surface。同一帧重复绘制时直接复用上次的结果。
+    """
 
-            system_content = "你是一个资深的化学专家和化学教育工作者，擅长用通俗易懂的语言解释复杂的化学概念，并提供准确的学习资源。请始终按照指定的格式回答，不要添加额外的解释。"
+    def __init__(self, size):
+        self.size = size
+        width, height = size
+        self._buffer = np.zeros((height, width, 3), dtype=np.uint8)
+        self._scratch = np.zeros((height, width, 3), dtype=np.uint8)
+        # surface 与 _buffer 共享内存，_buffer 更新后 surface 的内容随之更新
+        self.surface = pygame.image.frombuffer(self._buffer, size, 'BGR')
+        self._source = None
 
+    def update(self, frame, mirrored=True):
+        """
+        把一帧画面缩放到预览尺寸。
+        :param mirrored: 画面是否已经水平翻转过（HandDetector.analyze 的结果已翻转，原始摄像头画面未翻转）
+        """
+        if frame is self._source:
+            return self.surface
+        self._source = frame
+        if mirrored:
+            cv2.resize(frame, self.size, dst=self._buffer, interpolation=cv2.INTER_AREA)
         else:
-            # 多物质反应查询 (格式保持不变)
-            reactants_formula = substance1 + ' + ' + '+'.join(substance2_list)
-            prompt = f"""请详细分析化学反应 {reactants_formula} 的情况。
-
-
-分析要求：
-1. 判断这两种物质是否能发生化学反应
-2. 分析反应的条件（温度、压力、催化剂等）
-3. 分析反应的类型（置换反应、化合反应、分解反应、复分解反应等）
-4. 说明反应的现象（颜色变化、气体产生、沉淀生成、放热等）
-5. 提供相关的学习资源和参考链接（百度百科直接询问化学品（比如水））
-
-回答格式必须严格按照以下格式：（中间记得要加上***）
-如果能发生反应：YES***反应方程式***反应条件和现象***参考链接：https://zh.wikipedia.org/wiki/(反应后生成物质)***详细的反应机理和应用说明（500字以内）
-如果不能发生反应：NO***不能反应的具体原因和化学原理（500字以内，需要说明为什么不能反应）
-（实例：YES
-*** 2 HCl(aq) + 2 Na(s) → 2 NaCl(aq) + H₂(g)↑
-*** 常温常压即可，无需催化剂；钠熔成银白色小球并快速游动，发出“嘶嘶”声，溶液放热，伴随无色气泡（H₂）逸出，点燃可听到轻微爆鸣。
-*** 参考链接：https://zh.wikipedia.org/wiki/氯化钠
-*** 机理：Na失电子被氧化成Na⁺，H⁺得电子还原为H₂；实验室可用此法制少量纯净H₂，工业上因成本高已淘汰。）
-请确保：
-- 反应方程式必须正确和平衡
-- 链接必须是真实的化学学习网站
-- 现象描述要具体和专业
-- 原因解释要基于化学原理"""
-
-            system_content = "你是一个资深的化学专家和化学教育工作者，擅长用通俗易懂的语言解释复杂的化学概念。你需要：\n1. 准确判断化学反应的可能性\n2. 提供正确的化学方程式\n3. 解释反应条件和现象\n4. 提供有用的学习资源\n5. 帮助学生理解化学反应的原理\n请始终按照指定的格式回答，不要添加额外的解释。"
-
-        completion = client.chat.completions.create(
-            model=KIMI_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": system_content
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.6,
-        )
-
-        result = completion.choices[0].message.content
-        logging.debug(f"Kimi AI Response: {result}")
+            cv2.resize(frame, self.size, dst=self._scratch, interpolation=cv2.INTER_AREA)
+            cv2.flip(self._scratch, 1, dst=self._buffer)
+        return self.surface
 
-        # 使用新的分隔符 '***' 解析并重组
-        result_lines = result.strip().split('***')
 
-        is_info = len(substances_list) == 1 and 'INFO' in result_lines[0]
-        is_reaction = len(substances_list) > 1 and ('YES' in result_lines[0] or 'NO' in result_lines[0])
-
-        if is_info or is_reaction:
-            return '***'.join([line.strip() for line in result_lines])
-
-        return "ERROR***AI返回格式错误，请尝试不同的查询"
+class GestureWorker:
+    """
+    独立的手势推理线程：从 CameraCapture 取最新帧做 MediaPipe 推理，只发布最新结果。
+    渲染循环只读取结果，UI 帧率不再受推理速度限制；推理跟不上时旧帧直接丢弃。
+    """
 
-    except Exception as e:
-        logging.error(f"Kimi查询错误: {e}", exc_info=True)
-        return "ERROR***Kimi查询发生异常"
+    def __init__(self, hand_detector, camera, recorder=None):
+        self.hand_detector = hand_detector
+        self.camera = camera
+        self.recorder = recorder
+        self._lock = threading.Lock()
+        self._latest = None
+        self._running = True
+
+        # 统计计数器
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.last_latency_ms = 0.0
+        self.avg_latency_ms = 0.0
+
+        self._thread = threading.Thread(target=self._inference_loop, name="gesture-worker", daemon=True)
+        self._thread.start()
+
+    def _inference_loop(self):
+        last_seq = 0
+        dropped = 0  # 尚未计入 frames_dropped 的丢帧数（推理失败时留到下一次发布结果）
+        while self._running:
+            seq, frame = self.camera.wait_frame(last_seq)
+            if frame is None:
+                continue
 
+            # 两次推理之间被新帧覆盖掉的帧都算作丢帧，与结果一起在锁内计入
+            if last_seq:
+                dropped += seq - last_seq - 1
+            last_seq = seq
 
-# --- 【核心修改点】AI 动态生成物质列表的函数，已加入用户列表约束和不可反应物质约束 ---
-def query_ai_substance_list(context_substance=None):
-    """
-    调用 Kimi AI 生成物质列表。
-    :param context_substance: 如果提供，生成与该物质反应的物质列表；否则生成中心物质列表。
-    :return: 物质列表 (list of str)，或 None（如果失败）
-    """
-    try:
-        client = OpenAI(
-            api_key=KIMI_API_KEY,
-            base_url=KIMI_BASE_URL,
-        )
-
-        system_content = "你是一个资深的化学专家，专门为初中/高一学生设计化学实验和教学内容。请仅输出物质的化学式，不要包含任何额外的文字、解释或编号。"
-
-        if context_substance:
-            # 生成反应物列表 - 包含能反应和不能反应的物质（4能反应 + 2不能反应）
-            prompt = f"""请针对初中/高一化学阶段，提供6个物质的化学式，用于与中心物质 {context_substance} 进行反应模拟。
-
-**要求：**
-1. 在这6个物质中，必须包含4个能与 {context_substance} 发生化学反应的物质。
-2. 在这6个物质中，必须包含2个**不能**与 {context_substance} 发生化学反应的物质（惰性气体除外，应选择常见的酸、碱、盐、氧化物等）。
-3. 物质必须是常见的、且反应原理符合初中/高一教学大纲。
-4. 每个物质的化学式之间使用英文逗号 `,` 分隔。
-5. 严格输出6个化学式。
-6. **所有物质必须从以下列表中选取。尽量选择与上次不同的组合：**
-{ALLOWED_SUBSTANCES_LIST}
-
-**格式示例：**
-Na,H2O,FeCl3,AgNO3,SiO2,C
-"""
-        else:
-            # 生成中心物质列表 (保持原样)
-            prompt = f"""请针对初中/高一化学阶段，提供6个常见的、具有代表性的物质的化学式，作为实验的中心物质。
-
-**要求：**
-1. 物质必须是常见的，如酸、碱、盐、氧化物、单质。
-2. 每个物质的化学式之间使用英文逗号 `,` 分隔。
-3. 严格输出6个化学式。
-4. **所有物质必须从以下列表中选取。尽量选择与上次不同的组合：**
-{ALLOWED_SUBSTANCES_LIST}
-
-**格式示例：**
-HCl,NaOH,CuSO4,CaCO3,Fe,H2O
-"""
-
-        completion = client.chat.completions.create(
-            model=KIMI_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": system_content
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.7,
-        )
+            start = time.perf_counter()
+            try:
+                result = self.hand_detector.analyze(frame)
+            except Exception as e:
+                logging.error(f"手势推理失败: {e}")
+                continue
+            latency_ms = (time.perf_counter() - start) * 1000
 
-        result = completion.choices[0].message.content
-        logging.debug(f"AI Substance List Response: {result}")
+            result.seq = seq
+            result.timestamp = time.time()
 
-        # 解析化学式列表
-        substance_list = [s.strip() for s in result.split(',') if s.strip()]
+            if self.recorder is not None:
+                try:
+                    self.recorder.write(frame, result.landmarks)
+                except Exception as e:
+                    logging.error(f"录制会话失败: {e}")
+                    self.recorder = None
+
+            with self._lock:
+                self._latest = result
+                self.frames_processed += 1
+                self.frames_dropped += dropped
+                dropped = 0
+                self.last_latency_ms = latency_ms
+                # 指数滑动平均，平滑偶发的卡顿
+                if self.avg_latency_ms:
+                    self.avg_latency_ms = self.avg_latency_ms * 0.9 + latency_ms * 0.1
+                else:
+                    self.avg_latency_ms = latency_ms
+
+    def latest_result(self):
+        """返回最近一次推理结果（HandFrame），尚无结果时返回 None"""
+        with self._lock:
+            return self._latest
+
+    def stats(self):
+        with self._lock:
+            return {
+                'frames_processed': self.frames_processed,
+                'frames_dropped': self.frames_dropped,
+                'last_latency_ms': self.last_latency_ms,
+                'avg_latency_ms': self.avg_latency_ms,
+            }
 
-        if len(substance_list) == 6:
-            # 随机打乱列表，将能反应和不能反应的物质混合
-            random.shuffle(substance_list)
-            return substance_list
-        else:
-            logging.error(f"AI返回的物质数量不符: {len(substance_list)}个，期待6个")
-            return None
+    def stop(self):
+        self._running = False
+        self._thread.join(timeout=1.0)
 
-    except Exception as e:
-        logging.error(f"Kimi查询物质列表错误: {e}")
-        return None
 
-# --- 【修改 1b】修改 HandDetector 类 (略) ---
 class HandDetector:
-    # (保持原样不变)
-    def __init__(self):
-        self.mp_hands = mp.solutions.hands
-        self.mp_drawing = mp.solutions.drawing_utils
-        self.hands = self.mp_hands.Hands(
-            max_num_hands=2,
-            min_detection_confidence=0.7,
-            min_tracking_confidence=0.5
-        )
-        self.cap = cv2.VideoCapture(0)
-
-    def get_hand_position(self, frame):
+    def __init__(self, backend=GESTURE_BACKEND, source=GESTURE_SOURCE, record=GESTURE_RECORD):
+        try:
+            self.analyzer = GestureAnalyzer(backend, screen_size=(WIDTH, HEIGHT))
+        except (FileNotFoundError, ImportError, ValueError) as e:
+            logging.warning(f"手势后端 {backend} 不可用，改用 legacy: {e}")
+            self.analyzer = GestureAnalyzer("legacy", screen_size=(WIDTH, HEIGHT))
+        logging.debug(f"手势后端: {self.analyzer.name}")
+        self.cap = CameraCapture(source)
+        # 设置 GESTURE_RECORD 时录制原始画面和关键点，之后可用 GESTURE_SOURCE 回放
+        self.recorder = SessionRecorder(record, self.cap.cap.fps) if record else None
+        self.worker = GestureWorker(self, self.cap, self.recorder)
+        self._last_seq = 0
+
+    def poll(self):
         """
-        获取手的中心位置并校准到 Pygame 屏幕坐标。
+        读取推理线程发布的最新结果，不在渲染线程中推理。
+        结果与上一次读取的是同一帧时 is_new 为 False；尚无结果时返回 None。
         """
-        frame = cv2.flip(frame, 1)  # 水平翻转以校正摄像头镜像（视觉镜像）
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.hands.process(rgb_frame)
-
-        hand_pos = None
-        if results.multi_hand_landmarks:
-            for hand_landmarks in results.multi_hand_landmarks:
-                wrist = hand_landmarks.landmark[0]
-                middle_finger = hand_landmarks.landmark[9]
-
-                # 计算手部中心的归一化坐标
-                avg_x_norm = (wrist.x + middle_finger.x) / 2
-                avg_y_norm = (wrist.y + middle_finger.y) / 2
-
-                # 使用直接映射到屏幕坐标
-                x_cursor = int(avg_x_norm * WIDTH)
-                y_cursor = int(avg_y_norm * HEIGHT)
-
-                hand_pos = (x_cursor, y_cursor)
-
-                # 绘制手部地标
-                self.mp_drawing.draw_landmarks(frame, hand_landmarks, self.mp_hands.HAND_CONNECTIONS)
-
-        return frame, hand_pos
-
-    def detect_palm_open(self, frame):
-        """检测手掌是否张开（用于清除操作）"""
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.hands.process(rgb_frame)
-
-        if results.multi_hand_landmarks:
-            for hand_landmarks in results.multi_hand_landmarks:
-                fingers = 0
-                if hand_landmarks.landmark[4].x < hand_landmarks.landmark[3].x:
-                    fingers += 1
-                for tip, root in [(8, 7), (12, 11), (16, 15), (20, 19)]:
-                    if hand_landmarks.landmark[tip].y < hand_landmarks.landmark[root].y:
-                        fingers += 1
-
-                return fingers >= 4
-        return False
-
-    def detect_fist(self, frame):
-        """检测是否握拳（用于确认选择）"""
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.hands.process(rgb_frame)
-
-        if results.multi_hand_landmarks:
-            for hand_landmarks in results.multi_hand_landmarks:
-                fingers = 0
-                # 检查拇指和其他四个手指是否弯曲
-                is_thumb_curled = hand_landmarks.landmark[4].x < hand_landmarks.landmark[3].x if \
-                hand_landmarks.landmark[4].x < hand_landmarks.landmark[0].x else hand_landmarks.landmark[4].x > \
-                                                                                 hand_landmarks.landmark[
-                                                                                     0].x  # 简化判断，确保不伸直
-                if is_thumb_curled: fingers += 1
-                for tip, root in [(8, 7), (12, 11), (16, 15), (20, 19)]:
-                    if hand_landmarks.landmark[tip].y < hand_landmarks.landmark[root].y:
-                        fingers += 1
-
-                return fingers <= 1  # 如果伸直的手指少于等于1，认为是握拳
-        return False
-
-    def detect_two_hands(self, frame):
-        """检测是否同时存在两只手"""
-        if frame is not None:
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = self.hands.process(rgb_frame)
-
-            if results.multi_hand_landmarks and len(results.multi_hand_landmarks) >= 2:
-                return True
-        return False
+        result = self.worker.latest_result()
+        if result is None:
+            return None
+        result.is_new = result.seq != self._last_seq
+        self._last_seq = result.seq
+        return result
+
+    def release(self):
+        self.worker.stop()
+        self.cap.release()
+        self.analyzer.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        logging.debug(f"手势推理统计: {self.worker.stats()}")
+
+    def analyze(self, frame):
+        """对一帧画面做一次手势分析（在推理线程中调用），返回 HandFrame"""
+        return self.analyzer.analyze(frame)
 
 
 class InputBox:
@@ -660,6 +754,9 @@ class InputBox:
                     if text_surf.get_width() < self.rect.width - 20:
                         self.text = new_text
 
+    def render_key(self):
+        return self.text, self.color, self.active and self.cursor_visible
+
     def update(self):
         # Cursor blink
         if self.active and pygame.time.get_ticks() - self.cursor_timer > 500:
@@ -698,8 +795,11 @@ class SelectionBox:
         self.is_selected = False
         self.is_hovering = False
         # 从全局字典获取图片
-        self.image = substance_images.get(substance)
-        self.has_image = self.image is not None
+        self.image_key = canonical_formula(substance)
+        self.has_image = asset_preloader.has_image(substance)
+        # 图片可能还在后台加载，这里确保已提交加载任务
+        if self.has_image:
+            asset_preloader.request([substance])
 
     def draw(self, surface):
         text_color = BLACK
@@ -726,14 +826,8 @@ class SelectionBox:
 
         # ====== 渲染化学式 ======
         if self.has_image:
-            # 1. 计算文本总宽度 (使用临时Surface计算，避免影响主Surface)
-            temp_surf = pygame.Surface((self.rect.width, font_small.get_height() + font_tiny.get_height()))
-            temp_surf.fill(WHITE)
-            temp_surf.set_colorkey(WHITE)
-
-            total_width = render_chemical_formula(temp_surf, self.substance,
-                                                  0, 0,
-                                                  font_small, font_tiny, text_color)
+            # 1. 取缓存的化学式图像及其宽度（不再单独渲染一遍来测量）
+            formula_surf, total_width = render_formula_surface(self.substance, font_small, font_tiny, text_color)
 
             # 2. 计算居中位置
             text_x = self.rect.centerx - (total_width // 2)
@@ -743,20 +837,18 @@ class SelectionBox:
             # 绘制图片
             image_x = self.rect.centerx - 50
             image_y = self.rect.centery - 40
-            surface.blit(self.image, (image_x, image_y))
+            image = substance_images.get(self.image_key)
+            if image is not None:
+                surface.blit(image, (image_x, image_y))
+            else:
+                # 图片尚未加载完成，先显示占位框
+                pygame.draw.rect(surface, BACKGROUND_LIGHT, (image_x, image_y, 100, 100), border_radius=8)
 
             # 最终渲染到屏幕
-            render_chemical_formula(surface, self.substance,
-                                    text_x, text_y,
-                                    font_small, font_tiny, text_color)
+            surface.blit(formula_surf, (text_x, text_y))
         else:
-            # 1. 计算文本总宽度
-            temp_surf = pygame.Surface((self.rect.width, font_large.get_height() + font_small.get_height()))
-            temp_surf.fill(WHITE)
-            temp_surf.set_colorkey(WHITE)
-            total_width = render_chemical_formula(temp_surf, self.substance,
-                                                  0, 0,
-                                                  font_large, font_small, text_color)
+            # 1. 取缓存的化学式图像及其宽度
+            formula_surf, total_width = render_formula_surface(self.substance, font_large, font_small, text_color)
 
             # 2. 计算居中位置
             text_x = self.rect.centerx - (total_width // 2)
@@ -766,15 +858,17 @@ class SelectionBox:
                 font_to_use = font_medium
                 text_x = self.rect.centerx - (font_to_use.size(self.substance)[0] // 2)
                 text_y = self.rect.centery - (font_to_use.get_ascent() // 2)
-                text_surf = font_to_use.render(self.substance, True, text_color)
+                text_surf = render_text(font_to_use, self.substance, text_color)
                 surface.blit(text_surf, (text_x, text_y))
             else:
                 text_y = self.rect.centery - (font_large.get_ascent() // 2)
-                render_chemical_formula(surface, self.substance,
-                                        text_x, text_y,
-                                        font_large, font_small, text_color)
+                surface.blit(formula_surf, (text_x, text_y))
         # ======================================================================
 
+    def render_key(self):
+        """影响外观的全部状态，变化时才需要重画"""
+        return self.is_selected, self.is_hovering, self.image_key in substance_images
+
     def contains_point(self, pos):
         return self.rect.collidepoint(pos)
 
@@ -789,15 +883,34 @@ class GameState:
         self.center_substance = None
         self.selected_substances = []
         self.reaction_info = None
-        self.ai_query_thread = None
+        # 当前界面持有的在途查询（kimi.request_*），以及界面代数：
+        # 每次发起新查询或离开等待结果的界面时加一，旧查询的结果和部分结果都被丢弃。
+        # 查询结果以 ui_tasks 事件返回，以下字段只在界面线程中修改
+        self.query_handle = None
+        self.generation = 0
         self.is_querying = False
         self.hand_pos = None
         self.last_query_str = ""
+        # 最近一次收到 AI 数据的时间（time.monotonic），用于判断流式输出是否卡住
+        self.query_activity_time = 0.0
         # 【新增 2b】用于存储 AI 生成的物质列表
         self.center_substances_list = None
         self.available_reactants_list = None
 
 
+    def supersede(self):
+        """放弃当前界面的查询（不再接收其结果），返回新的界面代数"""
+        self.generation += 1
+        if self.query_handle is not None:
+            self.query_handle.release()
+            self.query_handle = None
+        self.is_querying = False
+        return self.generation
+
+    def is_task_event(self, event, tag, event_type=TASK_DONE_EVENT):
+        """event 是否为当前界面代数下 tag 任务的事件（已被取代的查询结果返回 False）"""
+        return event.type == event_type and event.tag == tag and event.generation == self.generation
+
     def reset_selected(self):
         self.selected_substances.clear()
 
@@ -812,28 +925,68 @@ class GameState:
 
 
 class ChemistryLearner:
-    def __init__(self):
-        self.hand_detector = HandDetector()
+    def __init__(self, hand_detector=None, frame_hook=None, fps=30):
+        """
+        :param hand_detector: 默认使用摄像头的 HandDetector；脚本驱动时传入替身（需提供 poll、cap.latest_frame、release）
+        :param frame_hook: 可选回调 frame_hook(learner)，每帧开始时在界面线程中调用，用于注入输入和统计帧时间
+        :param fps: 帧率上限，0 表示不限制
+        """
+        self.hand_detector = hand_detector if hand_detector is not None else HandDetector()
         self.game_state = GameState(self.hand_detector)
         self.clock = pygame.time.Clock()
+        self.fps = fps
+        self.frame_hook = frame_hook
         self.running = True
+        # 静态内容只画一次，每帧只刷新光标、摄像头等变化的区域
+        self.view = RetainedScreen(screen)
+        self.camera_preview = CameraPreview((WIDTH // 4, HEIGHT // 4))
+
+    def tick(self):
+        """每帧开始时调用：限制帧率，并接收后台加载完成的图片"""
+        self.clock.tick(self.fps)
+        asset_preloader.drain()
+        if self.frame_hook is not None:
+            self.frame_hook(self)
+
+    def draw_widgets(self, widgets):
+        """把状态有变化的控件重画到 static 层"""
+        for widget in widgets:
+            self.view.update_widget(widget, widget.rect, widget.render_key(), widget.draw)
+
+    def draw_overlays(self, ret, frame, mirrored=True):
+        """绘制每帧都会变化的光标和摄像头画面，并刷新变化的区域"""
+        self.view.overlay(draw_cursor(screen, self.game_state.hand_pos))
+        cam_x, cam_y, frame_width, frame_height = self.draw_camera_feed(screen, ret, frame, mirrored)
+        if frame_width:
+            self.view.overlay((cam_x - 2, cam_y - 2, frame_width + 4, frame_height + 4))
+        self.view.present()
+
+    def draw_loading_base(self, title_text):
+        """加载界面的静态部分：背景和标题"""
+        def draw_base(surface):
+            draw_background(surface)
+            title = font_large.render(title_text, True, PRIMARY_BLUE)
+            surface.blit(title, title.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 50)))
+        self.view.reset(draw_base)
+
+    def draw_loading_dots(self, start_time):
+        """加载界面的动画提示"""
+        dots = "." * ((pygame.time.get_ticks() - start_time) // 500 % 4)
+        loading = render_text(font_medium, f"请稍候{dots}", BLACK)
+        loading_rect = loading.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 50))
+        screen.blit(loading, loading_rect)
+        self.view.overlay(loading_rect)
 
     # 统一的摄像头绘制函数
-    def draw_camera_feed(self, screen, ret, frame):
-        """统一在右上角绘制摄像头画面"""
+    def draw_camera_feed(self, screen, ret, frame, mirrored=True):
+        """
+        统一在右上角绘制摄像头画面。
+        手势推理结果中的画面已经翻转过（mirrored=True），只有原始摄像头画面才需要再翻转。
+        """
         cam_x, cam_y, frame_width, frame_height = 0, 0, 0, 0  # 默认值
         if ret and frame is not None:
-            # 翻转摄像头画面使其不镜像
-            frame = cv2.flip(frame, 1)
-            frame_width = WIDTH // 4
-            frame_height = HEIGHT // 4
-            frame_small = cv2.resize(frame, (frame_width, frame_height))
-
-            frame_surface = pygame.image.frombuffer(
-                frame_small.tobytes(),
-                (frame_width, frame_height),
-                'BGR'
-            )
+            frame_surface = self.camera_preview.update(frame, mirrored)
+            frame_width, frame_height = self.camera_preview.size
 
             # 统一放置在右上角
             cam_x = WIDTH - frame_width - 20
@@ -850,21 +1003,26 @@ class ChemistryLearner:
         """
         加载中心物质列表的等待界面
         """
-        self.game_state.is_querying = True
         self.game_state.center_substances_list = None # 清空旧列表
 
-        def load_substances():
-            sub_list = query_ai_substance_list(context_substance=None)
+        if not KIMI_SUBSTANCE_LISTS:
+            # 本地反应性索引即时生成，无需等待 AI
+            sub_list = substance_sampler.center_list()
+            asset_preloader.request(sub_list)
             self.game_state.center_substances_list = sub_list
-            self.game_state.is_querying = False
+            self.game_state.state = "select_center"
+            return
 
-        self.game_state.ai_query_thread = threading.Thread(target=load_substances)
-        self.game_state.ai_query_thread.start()
+        generation = self.game_state.supersede()
+        self.game_state.is_querying = True
+        self.game_state.query_handle = ui_tasks.watch(
+            "center_substances", generation, request_substance_list(context_substance=None))
 
         start_time = pygame.time.get_ticks()
+        self.draw_loading_base("AI 正在准备实验物质列表...")
 
         while self.running and self.game_state.state == "load_center_substances":
-            self.clock.tick(30)
+            self.tick()
 
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
@@ -873,38 +1031,24 @@ class ChemistryLearner:
                 elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
                     self.running = False
                     return
+                elif self.game_state.is_task_event(event, "center_substances"):
+                    self.game_state.is_querying = False
+                    sub_list = event.result
+                    if not sub_list:
+                        # 加载失败，改用本地反应性索引生成的列表
+                        sub_list = substance_sampler.center_list()
+                        logging.warning("AI加载失败，使用本地生成的物质列表")
+                    asset_preloader.request(sub_list)
+                    self.game_state.center_substances_list = sub_list
+                    self.game_state.state = "select_center"
+                    return
 
-            ret, frame = self.hand_detector.cap.read()
-            # 绘制界面
-            if background_image:
-                screen.blit(background_image, (0, 0))
-            else:
-                screen.fill(BACKGROUND_LIGHT)
-
-            # 标题
-            title = font_large.render("AI 正在准备实验物质列表...", True, PRIMARY_BLUE)
-            title_rect = title.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 50))
-            screen.blit(title, title_rect)
-
-            # 动画提示
-            dots = "." * ((pygame.time.get_ticks() - start_time) // 500 % 4)
-            loading = font_medium.render(f"请稍候{dots}", True, BLACK)
-            loading_rect = loading.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 50))
-            screen.blit(loading, loading_rect)
-
-            # 绘制摄像头
-            self.draw_camera_feed(screen, ret, frame)
-
-            pygame.display.flip()
-
-            # 检查是否加载完成
-            if not self.game_state.is_querying:
-                if self.game_state.center_substances_list is None:
-                    # 加载失败，提供默认列表或重试
-                    self.game_state.center_substances_list = ['HCl', 'NaOH', 'CuSO4', 'Fe', 'O2', 'CO2']
-                    logging.warning("AI加载失败，使用默认物质列表")
-                self.game_state.state = "select_center"
-                return
+            _, frame = self.hand_detector.cap.latest_frame()
+            ret = frame is not None
+            # 绘制界面：只更新动画提示和摄像头（原始画面，尚未翻转）
+            self.view.begin_frame()
+            self.draw_loading_dots(start_time)
+            self.draw_overlays(ret, frame, mirrored=False)
 
     def screen_select_center(self):
         """
@@ -932,16 +1076,6 @@ class ChemistryLearner:
         # 【修改 4b】动态加载 SelectionBox
         for i, substance in enumerate(display_substances):
             x, y = positions[i]
-            # 每次选择前都尝试更新图片，避免 SelectionBox 构造函数使用旧的 substance_images
-            if substance not in substance_images:
-                try:
-                    image_path = os.path.join("images", f"{substance}.png")
-                    if os.path.exists(image_path):
-                        image = pygame.image.load(image_path).convert_alpha()
-                        substance_images[substance] = pygame.transform.scale(image, (100, 100))
-                except pygame.error as e:
-                    logging.warning(f"无法加载 {substance} 的图片: {e}")
-
             boxes.append(SelectionBox(x, y, 220, 180, substance))
 
         # 手动查询按钮
@@ -953,8 +1087,24 @@ class ChemistryLearner:
         frame = None
         fist_detected_count = 0
 
+        def draw_base(surface):
+            draw_background(surface)
+
+            # 标题和提示
+            title = font_large.render("元素之手——AI化学实验室", True, BLACK)
+            surface.blit(title, title.get_rect(center=(WIDTH // 2, 50)))
+
+            subtitle = font_medium.render("选择中心反应物质 或 进入手动查询", True, PRIMARY_BLUE)
+            surface.blit(subtitle, subtitle.get_rect(center=(WIDTH // 2, 110)))
+
+            hint_text = font_small.render("操作提示: 移动光标至物质框，握拳（Fist）进行选择 | ESC 退出", True,
+                                          BACKGROUND_DARK)
+            surface.blit(hint_text, (50, HEIGHT - 50))
+
+        self.view.reset(draw_base)
+
         while not selected and self.running and self.game_state.state == "select_center":
-            self.clock.tick(30)
+            self.tick()
 
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
@@ -975,13 +1125,15 @@ class ChemistryLearner:
                             box.is_selected = True
                             break
 
-            ret, frame = self.hand_detector.cap.read()
+            hand_frame = self.hand_detector.poll()
+            ret = hand_frame is not None
             if ret:
-                frame, hand_pos = self.hand_detector.get_hand_position(frame)
+                frame, hand_pos = hand_frame.frame, hand_frame.hand_pos
                 self.game_state.hand_pos = hand_pos
 
-                if hand_pos and self.hand_detector.detect_fist(frame):
-                    fist_detected_count += 1
+                if hand_pos and hand_frame.is_fist:
+                    if hand_frame.is_new:
+                        fist_detected_count += 1
                     if fist_detected_count >= 2:
                         for box in boxes[:-1]:
                             if box.contains_point(hand_pos):
@@ -1002,36 +1154,13 @@ class ChemistryLearner:
                         else:
                             box.set_hover(False)
 
-            if background_image:
-                screen.blit(background_image, (0, 0))
-            else:
-                screen.fill(BACKGROUND_LIGHT)
-
-            # 标题和提示
-            title = font_large.render("元素之手——AI化学实验室", True, BLACK)
-            title_rect = title.get_rect(center=(WIDTH // 2, 50))
-            screen.blit(title, title_rect)
-
-            subtitle = font_medium.render("选择中心反应物质 或 进入手动查询", True, PRIMARY_BLUE)
-            subtitle_rect = subtitle.get_rect(center=(WIDTH // 2, 110))
-            screen.blit(subtitle, subtitle_rect)
-
-            hint_text = font_small.render("操作提示: 移动光标至物质框，握拳（Fist）进行选择 | ESC 退出", True,
-                                          BACKGROUND_DARK)
-            screen.blit(hint_text, (50, HEIGHT - 50))
-
-            # 绘制所有物质框
-            for box in boxes:
-                box.draw(screen)
-
-            # 绘制光标
-            if self.game_state.hand_pos:
-                pygame.draw.circle(screen, CURSOR_COLOR, self.game_state.hand_pos, CURSOR_RADIUS)
+            self.view.begin_frame()
 
-            # 绘制摄像头
-            self.draw_camera_feed(screen, ret, frame)
+            # 只重画状态有变化的物质框
+            self.draw_widgets(boxes)
 
-            pygame.display.flip()
+            # 绘制光标和摄像头
+            self.draw_overlays(ret, frame)
 
         if selected:
             self.game_state.center_substance = selected
@@ -1047,22 +1176,29 @@ class ChemistryLearner:
             self.game_state.state = "load_center_substances" # 异常情况，返回起始状态
             return
 
-        self.game_state.is_querying = True
         self.game_state.available_reactants_list = None # 清空旧列表
 
-        def load_reactants():
-            # 【修改 5a】调用 AI 生成反应物列表
-            reactants_list = query_ai_substance_list(context_substance=self.game_state.center_substance)
-            self.game_state.available_reactants_list = reactants_list
-            self.game_state.is_querying = False
+        if not KIMI_SUBSTANCE_LISTS:
+            # 中心物质在本地索引中时即时生成；否则（例如 AI 给出的中心物质）仍交给 AI
+            reactants_list = substance_sampler.reactant_list(self.game_state.center_substance)
+            if reactants_list:
+                asset_preloader.request(reactants_list)
+                self.game_state.available_reactants_list = reactants_list
+                self.game_state.state = "playing"
+                return
 
-        self.game_state.ai_query_thread = threading.Thread(target=load_reactants)
-        self.game_state.ai_query_thread.start()
+        generation = self.game_state.supersede()
+        self.game_state.is_querying = True
+        # 【修改 5a】调用 AI 生成反应物列表
+        self.game_state.query_handle = ui_tasks.watch(
+            "reactants", generation,
+            request_substance_list(context_substance=self.game_state.center_substance))
 
         start_time = pygame.time.get_ticks()
+        self.draw_loading_base(f"AI 正在为 {self.game_state.center_substance} 匹配反应物...")
 
         while self.running and self.game_state.state == "load_reactants":
-            self.clock.tick(30)
+            self.tick()
 
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
@@ -1071,52 +1207,42 @@ class ChemistryLearner:
                 elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
                     self.game_state.reset_to_select_center() # ESC 返回起始状态
                     return
+                elif self.game_state.is_task_event(event, "reactants"):
+                    self.game_state.is_querying = False
+                    self.on_reactants_loaded(event.result)
+                    return
 
-            ret, frame = self.hand_detector.cap.read()
-
-            # 绘制界面
-            if background_image:
-                screen.blit(background_image, (0, 0))
-            else:
-                screen.fill(BACKGROUND_LIGHT)
+            _, frame = self.hand_detector.cap.latest_frame()
+            ret = frame is not None
 
-            # 标题
-            title = font_large.render(f"AI 正在为 {self.game_state.center_substance} 匹配反应物...", True, PRIMARY_BLUE)
-            title_rect = title.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 50))
-            screen.blit(title, title_rect)
-
-            # 动画提示
-            dots = "." * ((pygame.time.get_ticks() - start_time) // 500 % 4)
-            loading = font_medium.render(f"请稍候{dots}", True, BLACK)
-            loading_rect = loading.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 50))
-            screen.blit(loading, loading_rect)
-
-            # 绘制摄像头
-            self.draw_camera_feed(screen, ret, frame)
-
-            pygame.display.flip()
-
-            # 检查是否加载完成
-            if not self.game_state.is_querying:
-                # 【修改 5b】加载失败，使用中心物质生成一个简单的默认列表 (例如水、金属、氧气)
-                if self.game_state.available_reactants_list is None:
-                    logging.warning("AI加载反应物列表失败，使用默认列表")
-                    # 使用 4个可能反应 + 2个惰性/不反应物质 (例如CO2, N2)
-                    default_reactants = ['H2O', 'Na', 'Fe', 'HCl', 'CO2', 'N2']
-                    # 尝试从默认列表中排除中心物质，但保留6个
-                    final_list = [r for r in default_reactants if r != self.game_state.center_substance]
-                    # 简单填充，确保有 6 个
-                    if len(final_list) < 6:
-                        for r in default_reactants:
-                            if r != self.game_state.center_substance and r not in final_list:
-                                final_list.append(r)
-                                if len(final_list) == 6: break
-                    self.game_state.available_reactants_list = final_list[:6] # 确保只取 6 个
-                    # 随机打乱
-                    random.shuffle(self.game_state.available_reactants_list)
+            # 绘制界面：只更新动画提示和摄像头（原始画面，尚未翻转）
+            self.view.begin_frame()
+            self.draw_loading_dots(start_time)
+            self.draw_overlays(ret, frame, mirrored=False)
 
-                self.game_state.state = "playing"
-                return
+    def on_reactants_loaded(self, reactants_list):
+        """反应物列表查询完成（界面线程中调用），失败时依次回退到本地索引和默认列表"""
+        if reactants_list:
+            asset_preloader.request(reactants_list)
+        else:
+            # 【修改 5b】加载失败，先尝试本地反应性索引
+            reactants_list = substance_sampler.reactant_list(self.game_state.center_substance)
+            if reactants_list:
+                asset_preloader.request(reactants_list)
+                logging.warning("AI加载反应物列表失败，使用本地生成的列表")
+
+        if not reactants_list:
+            logging.warning("AI加载反应物列表失败，使用默认列表")
+            # 使用 4个可能反应 + 2个惰性/不反应物质 (例如CO2, N2)
+            default_reactants = ['H2O', 'Na', 'Fe', 'HCl', 'CO2', 'N2']
+            # 尝试从默认列表中排除中心物质，但保留6个
+            final_list = [r for r in default_reactants if r != self.game_state.center_substance]
+            reactants_list = final_list[:6] # 确保只取 6 个
+            # 随机打乱
+            random.shuffle(reactants_list)
+
+        self.game_state.available_reactants_list = reactants_list
+        self.game_state.state = "playing"
 
 
     def screen_playing(self):
@@ -1132,6 +1258,9 @@ class ChemistryLearner:
         top_substances = available[:3]
         bottom_substances = available[3:6]
 
+        # 学生只可能触发这几个“中心物质 + 反应物”查询，先在后台预取，握拳选择时即可直接命中缓存
+        reaction_prefetcher.prefetch([self.game_state.center_substance + ' + ' + sub for sub in available[:6]])
+
         box_width, box_height = 200, 160
         gap_x, gap_y = 50, 50
 
@@ -1140,18 +1269,6 @@ class ChemistryLearner:
 
         all_boxes = []
 
-        # 动态加载 SelectionBox (并尝试加载图片)
-        for sub_list in [top_substances, bottom_substances]:
-            for i, sub in enumerate(sub_list):
-                if sub not in substance_images:
-                    try:
-                        image_path = os.path.join("images", f"{sub}.png")
-                        if os.path.exists(image_path):
-                            image = pygame.image.load(image_path).convert_alpha()
-                            substance_images[sub] = pygame.transform.scale(image, (100, 100))
-                    except pygame.error as e:
-                        logging.warning(f"无法加载 {sub} 的图片: {e}")
-
         # 第一列
         for i, sub in enumerate(top_substances):
             x = WIDTH // 2 - 200
@@ -1174,8 +1291,23 @@ class ChemistryLearner:
         frame = None
         two_hands_history = deque(maxlen=10)
 
+        def draw_base(surface):
+            draw_background(surface)
+
+            # 标题
+            title = font_large.render("化学反应模拟 - 选择反应物", True, BLACK)
+            surface.blit(title, (50, 20))
+
+            center_label = font_medium.render("中心物质", True, PRIMARY_BLUE)
+            surface.blit(center_label, (center_box.rect.x, center_box.rect.y - 40))
+
+            hint = font_small.render(info_text, True, BLACK)
+            surface.blit(hint, (50, HEIGHT - 100))
+
+        self.view.reset(draw_base)
+
         while self.running and self.game_state.state == "playing":
-            self.clock.tick(30)
+            self.tick()
 
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
@@ -1203,13 +1335,15 @@ class ChemistryLearner:
                                     return
                             break
 
-            ret, frame = self.hand_detector.cap.read()
+            hand_frame = self.hand_detector.poll()
+            ret = hand_frame is not None
             if ret:
-                frame, hand_pos = self.hand_detector.get_hand_position(frame)
+                frame, hand_pos = hand_frame.frame, hand_frame.hand_pos
                 self.game_state.hand_pos = hand_pos
 
-                if hand_pos and self.hand_detector.detect_fist(frame):
-                    fist_detected_count += 1
+                if hand_pos and hand_frame.is_fist:
+                    if hand_frame.is_new:
+                        fist_detected_count += 1
                     if fist_detected_count >= 2:
                         for box in all_boxes:
                             if box.contains_point(hand_pos):
@@ -1228,7 +1362,7 @@ class ChemistryLearner:
                 else:
                     fist_detected_count = 0
 
-                if self.hand_detector.detect_palm_open(frame):
+                if hand_frame.is_palm_open:
                     self.game_state.reset_selected()
                     message = "已清除选择!"
                     message_time = pygame.time.get_ticks()
@@ -1242,8 +1376,8 @@ class ChemistryLearner:
                         else:
                             box.set_hover(False)
 
-                two_hands = self.hand_detector.detect_two_hands(frame)
-                two_hands_history.append(two_hands)
+                if hand_frame.is_new:
+                    two_hands_history.append(hand_frame.two_hands)
 
                 if sum(two_hands_history) >= 5:
                     self.game_state.reset_to_select_center()
@@ -1252,54 +1386,30 @@ class ChemistryLearner:
             if pygame.time.get_ticks() - message_time > 2000:
                 message = ""
 
-            if background_image:
-                screen.blit(background_image, (0, 0))
-            else:
-                screen.fill(BACKGROUND_LIGHT)
-
-            # 标题
-            title = font_large.render("化学反应模拟 - 选择反应物", True, BLACK)
-            screen.blit(title, (50, 20))
-
-            # 绘制中心物质框
-            center_box.draw(screen)
-            center_label = font_medium.render("中心物质", True, PRIMARY_BLUE)
-            screen.blit(center_label, (center_box.rect.x, center_box.rect.y - 40))
+            self.view.begin_frame()
 
-            # 绘制所有物质框
+            # 只重画状态有变化的物质框
             for box in all_boxes:
-                if box.substance in self.game_state.selected_substances:
-                    box.is_selected = True
-                else:
-                    box.is_selected = False
-                box.draw(screen)
+                box.is_selected = box.substance in self.game_state.selected_substances
+            self.draw_widgets([center_box] + all_boxes)
 
-            # 已选择物质/消息/操作提示 (放在左下方)
+            # 已选择物质/消息/操作提示 (放在左下方)，可能与物质框重叠，作为 overlay 每帧绘制
             selected_text = f"已选择 ({len(self.game_state.selected_substances)}/{max_selections}): {', '.join(self.game_state.selected_substances) if self.game_state.selected_substances else '无'}"
-            text_surf = font_medium.render(selected_text, True, PRIMARY_BLUE)
-            screen.blit(text_surf, (50, HEIGHT - 200))
+            text_surf = render_text(font_medium, selected_text, PRIMARY_BLUE)
+            self.view.overlay(screen.blit(text_surf, (50, HEIGHT - 200)))
 
             if message:
-                msg_surf = font_medium.render(message, True, ACCENT_ORANGE)
-                screen.blit(msg_surf, (50, HEIGHT - 150))
+                msg_surf = render_text(font_medium, message, ACCENT_ORANGE)
+                self.view.overlay(screen.blit(msg_surf, (50, HEIGHT - 150)))
             else:
                 if len(self.game_state.selected_substances) > 0:
-                    quick_hint = font_small.render("已选择物质, 正在分析反应... | 张开手清除 | 两只手/ESC 返回选择中心", True, SUCCESS_GREEN)
+                    quick_hint = render_text(font_small, "已选择物质, 正在分析反应... | 张开手清除 | 两只手/ESC 返回选择中心", SUCCESS_GREEN)
                 else:
-                    quick_hint = font_small.render("选择一种物质进行反应，将立即查询", True, BACKGROUND_DARK)
-                screen.blit(quick_hint, (50, HEIGHT - 150))
-
-            hint = font_small.render(info_text, True, BLACK)
-            screen.blit(hint, (50, HEIGHT - 100))
-
-            # 绘制光标
-            if self.game_state.hand_pos:
-                pygame.draw.circle(screen, CURSOR_COLOR, self.game_state.hand_pos, CURSOR_RADIUS)
+                    quick_hint = render_text(font_small, "选择一种物质进行反应，将立即查询", BACKGROUND_DARK)
+                self.view.overlay(screen.blit(quick_hint, (50, HEIGHT - 150)))
 
-            # 绘制摄像头
-            self.draw_camera_feed(screen, ret, frame)
-
-            pygame.display.flip()
+            # 绘制光标和摄像头
+            self.draw_overlays(ret, frame)
 
     def screen_manual_search(self):
         """
@@ -1311,8 +1421,23 @@ class ChemistryLearner:
 
         ret, frame = False, None
 
+        def draw_base(surface):
+            draw_background(surface)
+
+            title = font_large.render("物质信息/反应查询", True, BLACK)
+            surface.blit(title, (50, 20))
+
+            hint = font_medium.render("请输入物质或反应物（用 + 或 , 分隔）:", True, BLACK)
+            surface.blit(hint, (WIDTH // 2 - 400, HEIGHT // 2 - 100))
+
+            # 操作提示
+            op_hint = font_small.render("键盘输入内容，鼠标点击按钮确认/返回", True, BACKGROUND_DARK)
+            surface.blit(op_hint, (50, HEIGHT - 50))
+
+        self.view.reset(draw_base)
+
         while self.running and self.game_state.state == "manual_search":
-            self.clock.tick(30)
+            self.tick()
 
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
@@ -1339,9 +1464,10 @@ class ChemistryLearner:
                         return
 
             # Hand Detection Logic
-            ret, frame = self.hand_detector.cap.read()
+            hand_frame = self.hand_detector.poll()
+            ret = hand_frame is not None
             if ret:
-                frame, hand_pos = self.hand_detector.get_hand_position(frame)
+                frame, hand_pos = hand_frame.frame, hand_frame.hand_pos
                 self.game_state.hand_pos = hand_pos
 
                 if hand_pos:
@@ -1351,66 +1477,82 @@ class ChemistryLearner:
                     confirm_button.set_hover(False)
                     back_button.set_hover(False)
 
-            # Drawing
-            if background_image:
-                screen.blit(background_image, (0, 0))
-            else:
-                screen.fill(BACKGROUND_LIGHT)
-
-            title = font_large.render("物质信息/反应查询", True, BLACK)
-            screen.blit(title, (50, 20))
-
-            hint = font_medium.render("请输入物质或反应物（用 + 或 , 分隔）:", True, BLACK)
-            screen.blit(hint, (WIDTH // 2 - 400, HEIGHT // 2 - 100))
-
+            # Drawing: 输入框只在文字或光标闪烁变化时重画
+            self.view.begin_frame()
             input_box.update()
-            input_box.draw(screen)
-            confirm_button.draw(screen)
-            back_button.draw(screen)
-
-            # 操作提示
-            op_hint = font_small.render("键盘输入内容，鼠标点击按钮确认/返回", True, BACKGROUND_DARK)
-            screen.blit(op_hint, (50, HEIGHT - 50))
-
-            # 绘制光标
-            if self.game_state.hand_pos:
-                pygame.draw.circle(screen, CURSOR_COLOR, self.game_state.hand_pos, CURSOR_RADIUS)
-
-            # 绘制摄像头
-            self.draw_camera_feed(screen, ret, frame)
+            self.draw_widgets([input_box, confirm_button, back_button])
 
-            pygame.display.flip()
+            # 绘制光标和摄像头
+            self.draw_overlays(ret, frame)
 
-    def query_and_show_info(self, query_str):
+    def query_and_show_info(self, query_str, force_refresh=False):
         """查询信息（物质或反应）并显示结果"""
+        # 上一次查询（例如按 R 重新查询前的那次）的结果不再显示
+        generation = self.game_state.supersede()
         self.game_state.state = "reaction_info"
         self.game_state.is_querying = True
         self.game_state.last_query_str = query_str  # 保存查询字符串
 
-        def query():
-            result = query_ai_general_info(query_str)
+        self.game_state.reaction_info = None
+        self.game_state.query_activity_time = time.monotonic()
+
+        # 同一反应已在查询中（例如实验台的预取）时直接挂到该查询上；
+        # 部分结果和最终结果都以事件返回，由 screen_reaction_info 处理
+        self.game_state.query_handle = ui_tasks.watch(
+            "reaction_info", generation,
+            request_general_info(query_str, force_refresh=force_refresh,
+                                 on_partial=ui_tasks.partial_poster("reaction_info", generation)))
+
+    def handle_reaction_event(self, event):
+        """在界面线程中应用查询的部分结果或最终结果"""
+        query_str = self.game_state.last_query_str
+        if self.game_state.is_task_event(event, "reaction_info", TASK_PARTIAL_EVENT):
+            self.game_state.query_activity_time = time.monotonic()
+            current = self.game_state.reaction_info
+            # 只有新的一段完整到达时才更新，界面据此重新排版
+            if event.result is not None and (current is None or current['result'] is not event.result):
+                self.game_state.reaction_info = {
+                    'reactants': query_str,
+                    'result': event.result
+                }
+        elif self.game_state.is_task_event(event, "reaction_info"):
             self.game_state.reaction_info = {
                 'reactants': query_str,
-                'ai_result': result
+                'result': event.result if event.result is not None else QueryError('Kimi查询发生异常')
             }
             self.game_state.is_querying = False
 
-        self.game_state.ai_query_thread = threading.Thread(target=query)
-        self.game_state.ai_query_thread.start()
-
     def screen_reaction_info(self):
         """反应信息界面，兼容物质信息和反应分析"""
-        start_time = pygame.time.get_ticks()
-        max_wait_time = 15000
+        # 流式输出时两次收到数据之间允许的最长间隔（秒）
+        max_idle_time = KIMI_STREAM_IDLE_TIMEOUT
 
         two_hands_history = deque(maxlen=10)
 
+        # 创建文本显示区域
+        content_rect = pygame.Rect(50, 100, WIDTH - 100, HEIGHT - 200)
+
         current_links = []
         scroll_offset = 0
         max_scroll = 0
+        # 已排版的报告及其对应的查询结果
+        report_source = None
+        report_surface = None
+        report_height = 0
+        # 标题以下的整块区域（内容框、滚动条、底部提示）
+        report_area = pygame.Rect(0, content_rect.y, WIDTH, HEIGHT - content_rect.y)
+
+        def draw_base(surface):
+            draw_background(surface)
+
+            # 标题
+            title = font_large.render("分析报告", True, BLACK)
+            surface.blit(title, (50, 20))
+
+        self.view.reset(draw_base)
 
         while self.running:
-            self.clock.tick(30)
+            self.tick()
 
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
@@ -1419,8 +1561,7 @@ class ChemistryLearner:
                 elif event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_ESCAPE or event.key == pygame.K_SPACE:
                         # 返回逻辑：如果查询源自手动查询界面，返回手动查询；否则返回实验台
-                        substances_in_query = [s.strip() for s in re.split(r'[+,，]', self.game_state.last_query_str) if
-                                               s.strip()]
+                        substances_in_query = split_reactants(self.game_state.last_query_str)
 
                         is_multi_substance_query = len(substances_in_query) > 1 and self.game_state.center_substance
 
@@ -1432,37 +1573,42 @@ class ChemistryLearner:
                         self.game_state.selected_substances.clear()
                         return
 
+                    elif event.key == pygame.K_r and not self.game_state.is_querying:
+                        # 忽略缓存重新查询
+                        self.query_and_show_info(self.game_state.last_query_str, force_refresh=True)
+                        scroll_offset = 0
                     elif event.key == pygame.K_UP:
                         scroll_offset = min(scroll_offset + 50, 0)
                     elif event.key == pygame.K_DOWN:
                         scroll_offset = max(scroll_offset - 50, -max_scroll)
+                elif event.type in (TASK_DONE_EVENT, TASK_PARTIAL_EVENT):
+                    self.handle_reaction_event(event)
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     if event.button == 1:
                         mouse_pos = pygame.mouse.get_pos()
                         for link_info in current_links:
                             # 必须将链接的相对位置加上滚动偏移和内容框的起始位置
-                            rect_on_screen = link_info['rect'].copy()
-                            rect_on_screen.y = content_rect.y + link_info['rect'].y + scroll_offset
-
-                            if rect_on_screen.collidepoint(mouse_pos):
-                                try:
-                                    webbrowser.open(link_info['url'])
-                                    logging.debug(f"打开链接: {link_info['url']}")
-                                except Exception as e:
-                                    logging.error(f"打开链接失败: {e}")
+                            rect_on_screen = link_info['rect'].move(content_rect.x, content_rect.y + scroll_offset)
+
+                            if content_rect.collidepoint(mouse_pos) and rect_on_screen.collidepoint(mouse_pos):
+                                # 启动浏览器可能要等上几百毫秒，放到后台任务中
+                                ui_tasks.submit("open_link", self.game_state.generation,
+                                                webbrowser.open, link_info['url'])
+                                logging.debug(f"打开链接: {link_info['url']}")
                                 break
 
-            ret, frame = self.hand_detector.cap.read()
+            hand_frame = self.hand_detector.poll()
+            ret = hand_frame is not None
             if ret:
-                frame, hand_pos = self.hand_detector.get_hand_position(frame)
+                frame, hand_pos = hand_frame.frame, hand_frame.hand_pos
                 self.game_state.hand_pos = hand_pos
             else:
                 frame = None
                 hand_pos = None
 
             if frame is not None:
-                two_hands = self.hand_detector.detect_two_hands(frame)
-                two_hands_history.append(two_hands)
+                if hand_frame.is_new:
+                    two_hands_history.append(hand_frame.two_hands)
 
                 if sum(two_hands_history) >= 5:
                     self.game_state.reset_to_select_center()
@@ -1470,256 +1616,104 @@ class ChemistryLearner:
             else:
                 two_hands_history.clear()
 
-            # 绘制界面
-            if background_image:
-                screen.blit(background_image, (0, 0))
-            else:
-                screen.fill(BACKGROUND_LIGHT)
-
-            # 标题
-            title = font_large.render("分析报告", True, BLACK)
-            screen.blit(title, (50, 20))
-
-            # 创建文本显示区域
-            content_rect = pygame.Rect(50, 100, WIDTH - 100, HEIGHT - 200)
-
-            # 绘制内容背景
-            pygame.draw.rect(screen, WHITE, content_rect, border_radius=10)
-            pygame.draw.rect(screen, BACKGROUND_DARK, content_rect, 2, border_radius=10)
-
             if self.game_state.is_querying:
-                # 查询中
-                loading = font_large.render("AI 正在分析信息，请稍候...", True, PRIMARY_BLUE)
-                screen.blit(loading, (WIDTH // 2 - 300, HEIGHT // 2 - 50))
-
-                # 超时检查
-                if pygame.time.get_ticks() - start_time > max_wait_time:
-                    self.game_state.is_querying = False
+                # 超时检查：流式输出时只看距离上一次收到数据的间隔
+                if time.monotonic() - self.game_state.query_activity_time > max_idle_time:
+                    self.game_state.supersede()
                     self.game_state.reaction_info = {
                         'reactants': 'Unknown',
-                        'ai_result': 'ERROR***查询超时，请检查网络或API配置'
+                        'result': QueryError('查询超时，请检查网络或API配置')
                     }
-            else:
-                # 显示反应结果
-                if self.game_state.reaction_info:
-                    info = self.game_state.reaction_info
-                    current_links = []
-
-                    # 创建临时Surface用于绘制所有内容
-                    temp_surface = pygame.Surface((content_rect.width, 5000))  # 扩大临时表面
-                    temp_surface.fill(WHITE)
-                    temp_surface.set_colorkey(WHITE)
-
-                    y_offset = 10
-                    max_display_width = content_rect.width - 40
-
-                    result = info['ai_result']
-                    lines = [line.strip() for line in result.split('***') if line.strip()]
-
-                    # --- 统一的查询内容显示 ---
-                    reactants_text = f"查询内容: {info['reactants']}"
-                    query_type_font = font_large
-                    if len(lines) > 0 and 'INFO' in lines[0]:
-                        query_type_font = font_medium
-
-                    # 仅在 temp_surface 上计算渲染宽度，不实际渲染
-                    temp_text_surf = pygame.Surface((content_rect.width, 1))
-                    temp_text_surf.set_colorkey(BLACK)
-                    total_width = render_chemical_formula(temp_text_surf, reactants_text, 0, 0, query_type_font,
-                                                          font_medium, BLACK)
-
-                    # 渲染到主临时 Surface
-                    render_chemical_formula(temp_surface, reactants_text,
-                                            20,
-                                            y_offset + (font_large.get_height() // 2 - font_medium.get_height() // 2),
-                                            query_type_font, font_medium, PRIMARY_BLUE)
-                    y_offset += 70
-
-                    # --- 核心逻辑：区分 INFO 和 YES/NO ---
-                    if 'INFO' in lines[0]:
-                        # --- 单物质信息逻辑 ---
-                        result_text = font_medium.render(f"▶ 报告类型: 物质信息报告", True, SUCCESS_GREEN)
-                        temp_surface.blit(result_text, (20, y_offset))
-                        y_offset += 50
-
-                        # 详细信息
-                        if len(lines) > 1 and lines[1].strip():
-                            detail_label = font_medium.render("【详细信息】:", True, BLACK)
-                            temp_surface.blit(detail_label, (20, y_offset))
-                            y_offset += 40
-
-                            # 确保内容能被换行正确处理
-                            info_content = lines[1].replace('\n', ' ').replace('\r', '')
-                            info_lines = wrap_text(font_small, info_content, max_display_width)
-                            for line in info_lines:
-                                info_surf = font_small.render(line, True, BLACK)
-                                temp_surface.blit(info_surf, (30, y_offset))
-                                y_offset += 35
-
-                        # 参考链接
-                        if len(lines) > 2 and lines[2].strip():
-                            link_label = font_medium.render("【参考链接】:", True, BLACK)
-                            temp_surface.blit(link_label, (20, y_offset))
-                            y_offset += 40
-
-                            link_text = lines[2]
-                            _, links = draw_text_with_links(
-                                temp_surface, font_small, link_text, 30, y_offset,
-                                BLACK, PRIMARY_BLUE
-                            )
-
-                            for link in links:
-                                # 链接矩形需要相对于 content_rect.y 的位置，因为 temp_surface 是从 y=0 开始的
-                                current_links.append({
-                                    'rect': link['rect'],
-                                    'url': link['url']
-                                })
-
-                            y_offset += font_small.get_height() + 10
-
-                    elif 'YES' in lines[0] or 'NO' in lines[0]:
-                        # --- 反应分析逻辑 ---
-                        if 'YES' in lines[0]:
-                            result_text = font_medium.render("▶ 结论: ✓ 能发生化学反应", True, SUCCESS_GREEN)
-                        else:
-                            result_text = font_medium.render("▶ 结论: ✗ 不能发生化学反应", True, ERROR_RED)
-
-                        temp_surface.blit(result_text, (20, y_offset))
-                        y_offset += 50
-
-                        # 反应方程式 (YES)
-                        if 'YES' in lines[0] and len(lines) > 1 and lines[1].strip():
-                            eq_label = font_medium.render("【反应方程式】:", True, BLACK)
-                            temp_surface.blit(eq_label, (20, y_offset))
-                            y_offset += 40
-
-                            equation_lines = wrap_text(font_small, lines[1], max_display_width)
-                            for line in equation_lines:
-                                render_chemical_formula(temp_surface, line,
-                                                        30, y_offset,
-                                                        font_small, font_tiny, PRIMARY_BLUE)
-                                y_offset += 35
-
-                        # 不能反应的原因 (NO)
-                        elif 'NO' in lines[0] and len(lines) > 1 and lines[1].strip():
-                            reason_label = font_medium.render("【不能反应的原因】:", True, BLACK)
-                            temp_surface.blit(reason_label, (20, y_offset))
-                            y_offset += 40
-
-                            reason_lines = wrap_text(font_small, lines[1], max_display_width)
-                            for line in reason_lines:
-                                reason_surf = font_small.render(line, True, BLACK)
-                                temp_surface.blit(reason_surf, (30, y_offset))
-                                y_offset += 35
-
-                        # 反应条件和现象 (YES)
-                        if 'YES' in lines[0] and len(lines) > 2 and lines[2].strip():
-                            condition_label = font_medium.render("【条件与现象】:", True, BLACK)
-                            temp_surface.blit(condition_label, (20, y_offset))
-                            y_offset += 40
-
-                            condition_lines = wrap_text(font_small, lines[2], max_display_width)
-                            for line in condition_lines:
-                                cond_surf = font_small.render(line, True, BLACK)
-                                temp_surface.blit(cond_surf, (30, y_offset))
-                                y_offset += 35
-
-                        # 参考链接
-                        if 'YES' in lines[0] and len(lines) > 3 and lines[3].strip():
-                            link_label = font_medium.render("【参考链接】:", True, BLACK)
-                            temp_surface.blit(link_label, (20, y_offset))
-                            y_offset += 40
-
-                            link_text = lines[3]
-                            _, links = draw_text_with_links(
-                                temp_surface, font_small, link_text, 30, y_offset,
-                                BLACK, PRIMARY_BLUE
-                            )
-
-                            for link in links:
-                                current_links.append({
-                                    'rect': link['rect'],
-                                    'url': link['url']
-                                })
-
-                            y_offset += font_small.get_height() + 10
-
-                        # 详细说明 (YES)
-                        if 'YES' in lines[0] and len(lines) > 4 and lines[4].strip():
-                            detail_label = font_medium.render("【反应机理与应用】:", True, BLACK)
-                            temp_surface.blit(detail_label, (20, y_offset))
-                            y_offset += 40
-
-                            detail_lines = wrap_text(font_small, lines[4], max_display_width)
-                            for line in detail_lines:
-                                detail_surf = font_small.render(line, True, BLACK)
-                                temp_surface.blit(detail_surf, (30, y_offset))
-                                y_offset += 35
 
-                    else:
-                        error_text = font_medium.render("❌ 查询失败或AI返回格式错误", True, ERROR_RED)
-                        temp_surface.blit(error_text, (20, y_offset))
-                        y_offset += 60
-                        hint_text = font_small.render("请检查网络或输入的查询内容", True, BLACK)
-                        temp_surface.blit(hint_text, (20, y_offset))
-
-                    # 计算最大滚动距离
-                    max_scroll = max(0, y_offset - content_rect.height)
-                    # 限制滚动偏移量
-                    scroll_offset = max(scroll_offset, -max_scroll)
-
-                    # 绘制内容到屏幕
-                    screen.blit(temp_surface,
-                                (content_rect.x, content_rect.y + scroll_offset),
-                                (0, 0, content_rect.width, content_rect.height))
+            if self.game_state.reaction_info and self.game_state.reaction_info is not report_source:
+                # 查询结果变化时才重新排版（流式输出时已到达的部分先显示），之后只 blit 可见区域
+                report_source = self.game_state.reaction_info
+                report_surface, current_links = build_reaction_report(report_source, content_rect.width)
+                report_height = report_surface.get_height()
+                # 计算最大滚动距离
+                max_scroll = max(0, report_height - content_rect.height)
+                # 限制滚动偏移量
+                scroll_offset = max(scroll_offset, -max_scroll)
+
+            def draw_report(surface):
+                # 绘制内容背景
+                pygame.draw.rect(surface, WHITE, content_rect, border_radius=10)
+                pygame.draw.rect(surface, BACKGROUND_DARK, content_rect, 2, border_radius=10)
+
+                if self.game_state.reaction_info:
+                    # 绘制内容
+                    surface.blit(report_surface, content_rect.topleft,
+                                 (0, -scroll_offset, content_rect.width, content_rect.height))
 
                     # 绘制滚动条
                     if max_scroll > 0:
-                        scrollbar_height = max(20, content_rect.height * content_rect.height / (y_offset + 50))
+                        scrollbar_height = max(20, content_rect.height * content_rect.height / (report_height + 50))
                         scroll_ratio = (-scroll_offset) / max_scroll if max_scroll > 0 else 0
                         scrollbar_y = content_rect.y + scroll_ratio * (content_rect.height - scrollbar_height)
-                        pygame.draw.rect(screen, PRIMARY_BLUE,
+                        pygame.draw.rect(surface, PRIMARY_BLUE,
                                          (WIDTH - 20, scrollbar_y, 10, scrollbar_height), border_radius=5)
 
-                    # 返回提示
-                    back_hint = font_small.render(
-                        "SPACE/ESC 返回 | 两只手返回选择中心 | 点击链接打开 ", True,
-                        BACKGROUND_DARK)
-                    screen.blit(back_hint, (50, HEIGHT - 50))
+                    if self.game_state.is_querying:
+                        streaming_hint = render_text(font_small, "AI 正在继续生成，请稍候...", PRIMARY_BLUE)
+                        surface.blit(streaming_hint, (50, HEIGHT - 50))
+                    else:
+                        # 返回提示
+                        back_hint = render_text(
+                            font_small, "SPACE/ESC 返回 | 两只手返回选择中心 | 点击链接打开 | R 重新查询 ",
+                            BACKGROUND_DARK)
+                        surface.blit(back_hint, (50, HEIGHT - 50))
 
-            # 绘制光标
-            if self.game_state.hand_pos:
-                pygame.draw.circle(screen, CURSOR_COLOR, self.game_state.hand_pos, CURSOR_RADIUS)
+                elif self.game_state.is_querying:
+                    # 查询中，尚未收到第一段内容
+                    loading = render_text(font_large, "AI 正在分析信息，请稍候...", PRIMARY_BLUE)
+                    surface.blit(loading, (WIDTH // 2 - 300, HEIGHT // 2 - 50))
 
-            # 绘制摄像头
-            self.draw_camera_feed(screen, ret, frame)
+            # 报告区域只在内容、滚动位置或查询状态变化时重画
+            self.view.begin_frame()
+            report_key = (self.game_state.reaction_info, scroll_offset, self.game_state.is_querying)
+            self.view.update_widget("report", report_area, report_key, draw_report)
 
-            pygame.display.flip()
+            # 绘制光标和摄像头
+            self.draw_overlays(ret, frame)
 
     def run(self):
-        """主游戏循环"""
+        """主游戏循环，退出后释放摄像头和后台线程"""
         while self.running:
             # 【修改 7】新增加载状态
             if self.game_state.state == "load_center_substances":
                 self.screen_load_center_substances()
+                self.game_state.supersede()
             elif self.game_state.state == "select_center":
                 self.screen_select_center()
             elif self.game_state.state == "load_reactants": # 【新增 8】加载反应物状态
                 self.screen_load_reactants()
+                self.game_state.supersede()
             elif self.game_state.state == "playing":
                 self.screen_playing()
+                # 离开实验台时取消尚未完成的预取
+                reaction_prefetcher.cancel()
             elif self.game_state.state == "manual_search":
                 self.screen_manual_search()
             elif self.game_state.state == "reaction_info":
                 self.screen_reaction_info()
+                # 离开报告界面时放弃尚未完成的查询
+                self.game_state.supersede()
 
         pygame.quit()
-        self.hand_detector.cap.release()
-        cv2.destroyAllWindows()
-        sys.exit()
+        self.hand_detector.release()
+        asset_preloader.shutdown()
+        ui_tasks.shutdown()
+        reaction_prefetcher.shutdown()
+        query_service.shutdown()
+        # 无 GUI 支持的 OpenCV（无界面机器上的常见情况）没有实现 destroyAllWindows
+        try:
+            cv2.destroyAllWindows()
+        except cv2.error:
+            pass
 
 
 # ========== 主程序入口 ==========
 if __name__ == "__main__":
     game = ChemistryLearner()
-    game.run()
\ No newline at end of file
+    game.run()
+    sys.exit()
\ No newline at end of file
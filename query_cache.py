@@ -0,0 +1,136 @@
+"""
+Kimi 查询结果的本地持久化缓存。
+
+使用 SQLite 存储，键由规范化的查询内容、提示词版本、模型名和温度共同决定，
+支持 TTL 过期和按最近访问时间（LRU）限制条目数量。缓存命中时无需联网，毫秒级返回。
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+
+class QueryCache:
+    def __init__(self, path, ttl=30 * 24 * 3600, max_entries=5000, timeout=5.0):
+        """
+        :param path: SQLite 数据库文件路径，所在目录不存在时自动创建
+        :param ttl: 条目有效期（秒），None 或 0 表示永不过期
+        :param max_entries: 最多保留的条目数，超出时淘汰最久未访问的条目
+        :param timeout: 数据库被其他进程锁住时最多等待的秒数，超时后按未命中处理
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = None
+
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            # 查询线程和界面线程都会访问缓存，由 self._lock 串行化
+            self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS query_cache ("
+                " key TEXT PRIMARY KEY,"
+                " query TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " created REAL NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_query_cache_last_access ON query_cache (last_access)"
+            )
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"无法打开查询缓存 {path}，缓存已禁用: {e}")
+            self._conn = None
+
+    @staticmethod
+    def make_key(query, prompt_version, model, temperature):
+        """根据查询内容、提示词版本、模型和温度生成缓存键"""
+        raw = json.dumps([query, prompt_version, model, temperature], ensure_ascii=False)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """返回缓存的字符串；未命中或已过期时返回 None"""
+        if self._conn is None:
+            return None
+
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    "SELECT value, created FROM query_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+
+                value, created = row
+                if self.ttl and now - created > self.ttl:
+                    self._conn.execute("DELETE FROM query_cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                    return None
+
+                self._conn.execute("UPDATE query_cache SET last_access = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                return value
+            except sqlite3.Error as e:
+                logging.warning(f"读取查询缓存失败: {e}")
+                return None
+
+    def set(self, key, query, value):
+        """写入（或覆盖）一条缓存，并按 LRU 淘汰超出上限的条目"""
+        if self._conn is None:
+            return
+
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO query_cache (key, query, value, created, last_access)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (key, query, value, now, now)
+                )
+                self._evict()
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logging.warning(f"写入查询缓存失败: {e}")
+
+    def items(self):
+        """返回全部 (key, query, value)，供批量校验等离线任务使用"""
+        if self._conn is None:
+            return []
+        with self._lock:
+            return self._conn.execute("SELECT key, query, value FROM query_cache").fetchall()
+
+    def delete(self, key):
+        if self._conn is None:
+            return
+        with self._lock:
+            try:
+                self._conn.execute("DELETE FROM query_cache WHERE key = ?", (key,))
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logging.warning(f"删除查询缓存失败: {e}")
+
+    def _evict(self):
+        if self.ttl:
+            self._conn.execute("DELETE FROM query_cache WHERE created < ?", (time.time() - self.ttl,))
+
+        if self.max_entries:
+            count = self._conn.execute("SELECT COUNT(*) FROM query_cache").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM query_cache WHERE key IN ("
+                    " SELECT key FROM query_cache ORDER BY last_access ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
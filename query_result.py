@@ -0,0 +1,156 @@
+"""
+Kimi 查询结果的结构化表示。
+
+AI 按 "***" 分隔的文本协议回答（INFO***介绍***链接、YES***方程式***条件***链接***机理、NO***原因）。
+回答在收到时只解析一次，得到 SubstanceInfo / ReactionResult 对象，缓存、知识库和界面都直接使用对象；
+缺少必要字段、类型与查询不符或方程式无法配平的回答在写入任何缓存之前就被识别出来。
+缓存中以 JSON 保存，旧版本缓存中的 "***" 文本在读取时自动转换。
+"""
+import json
+
+from equation import check_equation_field
+
+
+class ResultFormatError(ValueError):
+    pass
+
+
+class SubstanceInfo:
+    """单物质信息（INFO）"""
+    kind = "INFO"
+
+    def __init__(self, description, link="", partial=False):
+        self.description = description
+        self.link = link
+        self.partial = partial  # 流式输出尚未结束
+
+    def to_dict(self):
+        return {"type": self.kind, "description": self.description, "link": self.link}
+
+
+class ReactionResult:
+    """反应分析（YES / NO）"""
+
+    def __init__(self, reacts, equation="", conditions="", link="", mechanism="", reason="", partial=False):
+        self.reacts = reacts
+        self.equation = equation  # 以下四项只在能反应时有
+        self.conditions = conditions
+        self.link = link
+        self.mechanism = mechanism
+        self.reason = reason  # 不能反应的原因
+        self.partial = partial
+
+    @property
+    def kind(self):
+        return "YES" if self.reacts else "NO"
+
+    def to_dict(self):
+        if not self.reacts:
+            return {"type": "NO", "reason": self.reason}
+        return {"type": "YES", "equation": self.equation, "conditions": self.conditions,
+                "link": self.link, "mechanism": self.mechanism}
+
+
+class QueryError:
+    """查询失败（网络错误、超时、格式错误等），不会被缓存"""
+    kind = "ERROR"
+    partial = False
+
+    def __init__(self, message):
+        self.message = message
+
+    def to_dict(self):
+        return {"type": self.kind, "message": self.message}
+
+
+def to_json(result):
+    return json.dumps(result.to_dict(), ensure_ascii=False)
+
+
+def _sections(text):
+    return [section.strip() for section in text.strip().split('***')]
+
+
+def _field(sections, index):
+    return sections[index] if len(sections) > index else ""
+
+
+def _header_kind(header):
+    if 'INFO' in header:
+        return "INFO"
+    if 'YES' in header:
+        return "YES"
+    if 'NO' in header:
+        return "NO"
+    return None
+
+
+def _build(kind, fields, partial=False):
+    """按类型和各字段构造结果对象，并检查必要字段和方程式"""
+    if kind == "INFO":
+        if not fields[0] and not partial:
+            raise ResultFormatError("缺少物质介绍")
+        return SubstanceInfo(fields[0], fields[1], partial=partial)
+
+    if kind == "NO":
+        if not fields[0] and not partial:
+            raise ResultFormatError("缺少不能反应的原因")
+        return ReactionResult(False, reason=fields[0], partial=partial)
+
+    equation, conditions, link, mechanism = fields
+    if not partial:
+        # 系数写错时直接改正，无法配平时视为格式错误
+        equation, checks = check_equation_field(equation)
+        if equation is None:
+            reasons = "；".join(f"{c.text} ({c.message})" for c in checks if not c.acceptable)
+            raise ResultFormatError(f"反应方程式有误: {reasons}")
+    return ReactionResult(True, equation, conditions, link, mechanism, partial=partial)
+
+
+# 各类型回答在 "***" 协议和 JSON 中的字段
+_FIELDS = {
+    "INFO": ("description", "link"),
+    "YES": ("equation", "conditions", "link", "mechanism"),
+    "NO": ("reason",),
+}
+
+
+def parse_response(text, substance_count, partial=False):
+    """
+    解析 AI 的 "***" 格式回答。
+    :param substance_count: 查询中的物质数量，1 个时应为 INFO，多个时应为 YES/NO
+    :param partial: 流式输出中途的部分回答，允许缺少后面的字段，也不检查方程式
+    :raises ResultFormatError: 回答不符合格式
+    """
+    sections = _sections(text)
+    kind = _header_kind(sections[0])
+    expected = ("INFO",) if substance_count == 1 else ("YES", "NO")
+    if kind not in expected:
+        raise ResultFormatError(f"回答类型应为 {'/'.join(expected)}，实际为: {sections[0][:20]!r}")
+
+    fields = [_field(sections, i + 1) for i in range(len(_FIELDS[kind]))]
+    return _build(kind, fields, partial)
+
+
+def from_dict(data):
+    """从 to_dict() 的结果重建对象，并重新做一遍格式检查"""
+    kind = data.get("type")
+    if kind not in _FIELDS:
+        raise ResultFormatError(f"未知的结果类型: {kind!r}")
+    return _build(kind, [str(data.get(name, "")) for name in _FIELDS[kind]])
+
+
+def load_result(stored):
+    """
+    读取缓存或知识库中保存的结果：JSON，或旧版本保存的 "***" 文本。
+    :raises ResultFormatError: 内容不符合格式
+    """
+    if stored.lstrip().startswith("{"):
+        try:
+            data = json.loads(stored)
+        except ValueError as e:
+            raise ResultFormatError(f"无法解析保存的结果: {e}")
+        return from_dict(data)
+
+    kind = _header_kind(_sections(stored)[0])
+    return parse_response(stored, 1 if kind == "INFO" else 2)
@@ -0,0 +1,164 @@
+"""
+合并相同的在途查询。
+
+每个规范化的查询键同一时刻只有一个在途查询（一个 Future）：用户在界面间来回切换、
+鼠标和握拳重复触发，或者前台查询恰好与后台预取的是同一个反应时，后来的调用方直接挂到
+已有的查询上，共享流式的部分结果和最终结果，不会重复发出请求。
+
+每个调用方持有一个 QueryHandle。界面被新的查询或界面切换取代时调用 release()：
+之后这个调用方不会再收到任何回调；所有调用方都 release 后，查询本身也被取消
+（尚未开始的直接取消，进行中的在收到下一个数据块时停止，结果不写入缓存）。
+"""
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class QueryHandle:
+    """一个调用方对在途查询的引用"""
+
+    def __init__(self, service, entry, on_partial=None):
+        self._service = service
+        self._entry = entry
+        self._on_partial = on_partial
+        self._released = False
+        # 查询完成或本调用方 release 后被设置
+        self._finished = threading.Event()
+
+    @property
+    def key(self):
+        return self._entry.key
+
+    @property
+    def released(self):
+        return self._released
+
+    def done(self):
+        return self._entry.future.done()
+
+    def wait(self, timeout=None):
+        """等待查询完成或本调用方 release，返回是否已结束"""
+        return self._finished.wait(timeout)
+
+    def add_done_callback(self, fn):
+        """
+        查询完成后在工作线程中调用 fn(result)；查询被取消或抛出异常时 result 为 None。
+        release 之后不再调用。
+        """
+        def callback(future):
+            if self._released:
+                return
+            if future.cancelled():
+                result = None
+            elif future.exception() is not None:
+                logging.error(f"查询 {self.key} 发生异常: {future.exception()}")
+                result = None
+            else:
+                result = future.result()
+            fn(result)
+
+        self._entry.future.add_done_callback(callback)
+
+    def release(self):
+        """放弃这次查询：不再收到回调，最后一个调用方放弃时取消查询本身"""
+        if not self._released:
+            self._released = True
+            self._service._release(self)
+            self._finished.set()
+
+    def _partial(self, partial):
+        if self._on_partial is not None and not self._released:
+            self._on_partial(partial)
+
+
+class _InflightQuery:
+    def __init__(self, key):
+        self.key = key
+        self.future = Future()
+        self.cancel_event = threading.Event()
+        self.handles = []
+        self.partial = None  # 最近一次的部分结果，后加入的调用方先收到它
+
+
+class QueryService:
+    def __init__(self, max_workers=4, thread_name_prefix="kimi-query"):
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers),
+                                            thread_name_prefix=thread_name_prefix)
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def request(self, key, fn, on_partial=None):
+        """
+        发起查询，或者挂到同一 key 的在途查询上。
+        :param fn: fn(on_partial, cancel_event) -> result，在工作线程中执行
+        :param on_partial: 可选回调 on_partial(partial)，在工作线程中调用
+        :return: QueryHandle
+        """
+        with self._lock:
+            entry = self._inflight.get(key)
+            joined = entry is not None
+            if entry is None:
+                entry = self._inflight[key] = _InflightQuery(key)
+            handle = QueryHandle(self, entry, on_partial)
+            entry.handles.append(handle)
+            partial = entry.partial
+
+        entry.future.add_done_callback(lambda _: handle._finished.set())
+        if joined:
+            logging.debug(f"合并到在途查询: {key}")
+            if partial is not None:
+                handle._partial(partial)
+        else:
+            self._executor.submit(self._run, entry, fn)
+        return handle
+
+    def _run(self, entry, fn):
+        if entry.cancel_event.is_set():
+            entry.future.cancel()
+            return
+        entry.future.set_running_or_notify_cancel()
+        try:
+            result = fn(lambda partial: self._publish(entry, partial), entry.cancel_event)
+        except Exception as e:
+            self._finish(entry)
+            entry.future.set_exception(e)
+            return
+        self._finish(entry)
+        entry.future.set_result(result)
+
+    def _finish(self, entry):
+        with self._lock:
+            if self._inflight.get(entry.key) is entry:
+                del self._inflight[entry.key]
+
+    def _publish(self, entry, partial):
+        with self._lock:
+            entry.partial = partial
+            handles = list(entry.handles)
+        for handle in handles:
+            handle._partial(partial)
+
+    def _release(self, handle):
+        entry = handle._entry
+        with self._lock:
+            if handle in entry.handles:
+                entry.handles.remove(handle)
+            if entry.handles or entry.future.done():
+                return
+            entry.cancel_event.set()
+            # 之后再发起同一查询时重新开始，而不是挂到已取消的查询上
+            if self._inflight.get(entry.key) is entry:
+                del self._inflight[entry.key]
+        logging.debug(f"查询已无调用方，取消: {entry.key}")
+
+    def inflight_count(self):
+        with self._lock:
+            return len(self._inflight)
+
+    def shutdown(self):
+        with self._lock:
+            entries = list(self._inflight.values())
+            self._inflight.clear()
+        for entry in entries:
+            entry.cancel_event.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,751 @@
+"""
+本地反应性索引。
+
+ALLOWED_SUBSTANCES_LIST 是固定的，挑选中心物质和反应物不需要每次都问 AI。
+这里为每种物质记录类别（酸、碱、盐、氧化物、金属等）、溶解性和金属活动性，
+按初中/高一教材中的规律推出任意两种物质能否反应，结果保存为位图；
+SubstanceSampler 据此即时生成中心物质列表和"4 个能反应 + 2 个不反应"的反应物列表。
+
+两两判断是三态的：REACTS（教材中出现的反应，含加热、点燃、高温、催化剂等条件）、
+NO_REACTION（常见条件下不反应）、UNCERTAIN（条件苛刻、有争议或规则未覆盖）。
+抽样只使用前两种，保证列表中"不能反应"的物质确实不反应。
+"""
+import random
+from collections import deque
+
+from formula import canonical_formula
+
+NO_REACTION, UNCERTAIN, REACTS = 0, 1, 2
+
+# 金属活动性顺序（越靠前越活泼）
+ACTIVITY_SERIES = ("K", "Ba", "Ca", "Na", "Mg", "Al", "Mn", "Zn", "Fe", "Sn", "Pb", "H", "Cu", "Hg", "Ag", "Pt", "Au")
+_ACTIVITY_RANK = {element: i for i, element in enumerate(ACTIVITY_SERIES)}
+
+# 物质类别
+ACID, BASE, SALT, OXIDE, METAL, NONMETAL, ORGANIC, OTHER = (
+    "acid", "base", "salt", "oxide", "metal", "nonmetal", "organic", "other"
+)
+CATEGORY_NAMES = {
+    ACID: "酸", BASE: "碱", SALT: "盐", OXIDE: "氧化物",
+    METAL: "金属", NONMETAL: "非金属", ORGANIC: "有机物", OTHER: "其他",
+}
+
+# 溶解性
+SOLUBLE, SLIGHT, INSOLUBLE = "soluble", "slight", "insoluble"
+
+
+class SubstanceProfile:
+    """一种物质在反应性索引中的档案"""
+
+    def __init__(self, formula, category, solubility=None, element=None, cations=(), anion=None,
+                 kind=None, strength=0, tags=()):
+        self.formula = canonical_formula(formula)
+        self.category = category
+        self.solubility = solubility  # 在水中的溶解性，不适用时为 None
+        self.element = element  # 金属单质、金属氧化物对应的金属元素
+        self.cations = cations  # 酸/碱/盐在溶液中的阳离子
+        self.anion = anion  # 酸/碱/盐在溶液中的阴离子
+        self.kind = kind  # 氧化物：acidic/basic/amphoteric/neutral；有机物：alkane/alcohol/...
+        self.strength = strength  # 酸：3 强酸、2 中强酸、1 弱酸、0 碳酸；碱：2 可溶强碱、1 弱碱、0 难溶碱
+        self.tags = frozenset(tags)  # oxidizer（氧化剂）、reducer（还原剂）、fuel（可燃）
+
+    def __repr__(self):
+        return f"SubstanceProfile({self.formula!r}, {self.category!r})"
+
+
+def _metal(symbol, burns=True):
+    return SubstanceProfile(symbol, METAL, element=symbol, tags=("reducer", "fuel") if burns else ("reducer",))
+
+
+def _acid(formula, anion, strength, tags=()):
+    return SubstanceProfile(formula, ACID, SOLUBLE, cations=("H",), anion=anion, strength=strength, tags=tags)
+
+
+def _base(formula, cation, solubility, strength, kind=None):
+    return SubstanceProfile(formula, BASE, solubility, cations=(cation,), anion="OH", kind=kind, strength=strength)
+
+
+def _salt(formula, cations, anion, solubility=SOLUBLE, tags=()):
+    if isinstance(cations, str):
+        cations = (cations,)
+    return SubstanceProfile(formula, SALT, solubility, cations=cations, anion=anion, tags=tags)
+
+
+def _oxide(formula, kind, element=None, tags=()):
+    return SubstanceProfile(formula, OXIDE, element=element, kind=kind, tags=tags)
+
+
+def _organic(formula, kind):
+    tags = ("fuel", "reducer") if kind in ("alcohol", "glucose") else ("fuel",)
+    return SubstanceProfile(formula, ORGANIC, kind=kind, tags=tags)
+
+
+PROFILES = {profile.formula: profile for profile in (
+    _metal("Fe"), _metal("Cu"), _metal("Zn"), _metal("Al"), _metal("Mg"),
+    _metal("Ag", burns=False), _metal("Au", burns=False), _metal("Hg"),
+
+    SubstanceProfile("H2", NONMETAL, tags=("reducer", "fuel")),
+    SubstanceProfile("O2", NONMETAL, tags=("oxidizer",)),
+    SubstanceProfile("N2", NONMETAL),
+    SubstanceProfile("Cl2", NONMETAL, tags=("oxidizer",)),
+    SubstanceProfile("C", NONMETAL, tags=("reducer", "fuel")),
+    SubstanceProfile("S", NONMETAL, tags=("reducer", "fuel")),
+    SubstanceProfile("P", NONMETAL, tags=("reducer", "fuel")),
+
+    _oxide("H2O", "neutral"),
+    _oxide("CO", "neutral", tags=("reducer", "fuel")),
+    _oxide("CO2", "acidic"),
+    _oxide("SO2", "acidic", tags=("reducer",)),
+    _oxide("SO3", "acidic"),
+    _oxide("SiO2", "acidic"),
+    _oxide("CaO", "basic", "Ca"),
+    _oxide("MgO", "basic", "Mg"),
+    _oxide("CuO", "basic", "Cu"),
+    _oxide("Fe2O3", "basic", "Fe"),
+    _oxide("Al2O3", "amphoteric", "Al"),
+    _oxide("MnO2", "other", "Mn", tags=("oxidizer",)),
+
+    _acid("HCl", "Cl", 3),
+    _acid("H2SO4", "SO4", 3),
+    _acid("HNO3", "NO3", 3, tags=("oxidizer",)),
+    _acid("H3PO4", "PO4", 2),
+    _acid("CH3COOH", "CH3COO", 1),
+    _acid("H2CO3", "CO3", 0),
+
+    _base("NaOH", "Na", SOLUBLE, 2),
+    _base("KOH", "K", SOLUBLE, 2),
+    _base("Ba(OH)2", "Ba", SOLUBLE, 2),
+    _base("Ca(OH)2", "Ca", SLIGHT, 2),
+    _base("NH3·H2O", "NH4", SOLUBLE, 1),
+    _base("Cu(OH)2", "Cu", INSOLUBLE, 0),
+    _base("Fe(OH)3", "Fe3", INSOLUBLE, 0),
+    _base("Al(OH)3", "Al", INSOLUBLE, 0, kind="amphoteric"),
+
+    _salt("NaCl", "Na", "Cl"),
+    _salt("CaCl2", "Ca", "Cl"),
+    _salt("BaCl2", "Ba", "Cl"),
+    _salt("FeCl3", "Fe3", "Cl", tags=("oxidizer",)),
+    _salt("CuCl2", "Cu", "Cl"),
+    _salt("AgCl", "Ag", "Cl", INSOLUBLE),
+    _salt("NH4Cl", "NH4", "Cl"),
+    _salt("Na2SO4", "Na", "SO4"),
+    _salt("CuSO4·5H2O", "Cu", "SO4"),
+    _salt("BaSO4", "Ba", "SO4", INSOLUBLE),
+    _salt("CaSO4·2H2O", "Ca", "SO4", SLIGHT),
+    _salt("FeSO4", "Fe2", "SO4", tags=("reducer",)),
+    _salt("ZnSO4", "Zn", "SO4"),
+    _salt("KAl(SO4)2·12H2O", ("K", "Al"), "SO4"),
+    _salt("Na2CO3", "Na", "CO3"),
+    _salt("K2CO3", "K", "CO3"),
+    _salt("NaHCO3", "Na", "HCO3"),
+    _salt("CaCO3", "Ca", "CO3", INSOLUBLE),
+    _salt("BaCO3", "Ba", "CO3", INSOLUBLE),
+    _salt("AgNO3", "Ag", "NO3"),
+    _salt("KNO3", "K", "NO3"),
+    _salt("NaNO3", "Na", "NO3"),
+    _salt("Cu(NO3)2", "Cu", "NO3"),
+    _salt("Ba(NO3)2", "Ba", "NO3"),
+    _salt("Na3PO4", "Na", "PO4"),
+    _salt("Ca3(PO4)2", "Ca", "PO4", INSOLUBLE),
+    _salt("NH4H2PO4", "NH4", "H2PO4"),
+    _salt("FeS", "Fe2", "S", INSOLUBLE, tags=("reducer",)),
+    _salt("CuS", "Cu", "S", INSOLUBLE, tags=("reducer",)),
+    _salt("ZnS", "Zn", "S", INSOLUBLE, tags=("reducer",)),
+    _salt("KMnO4", "K", "MnO4", tags=("oxidizer",)),
+    _salt("K2MnO4", "K", "MnO4^2-", tags=("oxidizer",)),
+    _salt("KClO3", "K", "ClO3", tags=("oxidizer",)),
+    _salt("NaClO", "Na", "ClO", tags=("oxidizer",)),
+
+    SubstanceProfile("H2O2", OTHER, tags=("oxidizer", "reducer")),
+    SubstanceProfile("NH3", OTHER, tags=("reducer", "fuel")),
+
+    _organic("CH4", "alkane"),
+    _organic("石蜡", "alkane"),
+    _organic("C2H5OH", "alcohol"),
+    _organic("C6H12O6", "glucose"),
+    _organic("C12H22O11", "disaccharide"),
+    _organic("(C6H10O5)n", "polysaccharide"),
+    _organic("蛋白质", "protein"),
+    _organic("油脂", "fat"),
+)}
+
+
+def _pairs(*entries):
+    return {frozenset(canonical_formula(s) for s in pair): result for *pair, result in entries}
+
+
+# 规则之外的具体反应（优先级最高）
+SPECIAL_PAIRS = _pairs(
+    ("N2", "O2", REACTS), ("N2", "H2", REACTS), ("N2", "Mg", REACTS),
+    ("O2", "SO2", REACTS),
+    ("Cl2", "P", REACTS), ("Cl2", "H2O", REACTS), ("Cl2", "NH3", REACTS), ("Cl2", "CH4", REACTS),
+    ("Cl2", "FeSO4", REACTS), ("Cl2", "SO2", REACTS),
+    ("C", "CO2", REACTS), ("C", "H2O", REACTS), ("C", "SiO2", REACTS),
+    ("C", "KNO3", REACTS), ("S", "KNO3", REACTS), ("P", "KClO3", REACTS),
+    ("Mg", "CO2", REACTS),
+    ("MnO2", "H2O2", REACTS), ("MnO2", "KClO3", REACTS), ("MnO2", "HCl", REACTS),
+    ("KMnO4", "HCl", REACTS), ("KClO3", "HCl", REACTS), ("NaClO", "HCl", REACTS),
+    ("KMnO4", "H2O2", REACTS), ("KMnO4", "SO2", REACTS), ("KMnO4", "FeSO4", REACTS),
+    ("KMnO4", "C2H5OH", REACTS),
+    ("FeCl3", "Cu", REACTS), ("FeCl3", "Fe", REACTS), ("FeCl3", "H2O2", UNCERTAIN),
+    ("NH3", "H2O", REACTS), ("NH3", "CuO", REACTS),
+    ("CaO", "NH4Cl", REACTS),
+    ("C2H5OH", "CuO", REACTS), ("C2H5OH", "CH3COOH", REACTS),
+    ("C6H12O6", "Cu(OH)2", REACTS),
+    ("HNO3", "HCl", UNCERTAIN),
+    ("AgCl", "NH3·H2O", UNCERTAIN), ("AgCl", "NH3", UNCERTAIN), ("Cu(OH)2", "NH3·H2O", UNCERTAIN),
+)
+
+
+def product_solubility(cation, anion):
+    """按溶解性表判断阳离子与阴离子组成的物质在水中的溶解性"""
+    if anion == "OH":
+        if cation in ("Na", "K", "Ba", "NH4"):
+            return SOLUBLE
+        return SLIGHT if cation == "Ca" else INSOLUBLE
+    if anion == "Cl":
+        return INSOLUBLE if cation == "Ag" else SOLUBLE
+    if anion == "SO4":
+        if cation == "Ba":
+            return INSOLUBLE
+        return SLIGHT if cation in ("Ca", "Ag") else SOLUBLE
+    if anion in ("CO3", "PO4", "S"):
+        return SOLUBLE if cation in ("Na", "K", "NH4") else INSOLUBLE
+    return SOLUBLE
+
+
+def activity_rank(element):
+    """元素在金属活动性顺序中的位置，越小越活泼；Fe2/Fe3 等离子按对应金属处理"""
+    if element is None:
+        return None
+    return _ACTIVITY_RANK.get(element.rstrip("0123456789"))
+
+
+def _more_active(a, b):
+    rank_a, rank_b = activity_rank(a), activity_rank(b)
+    return rank_a is not None and rank_b is not None and rank_a < rank_b
+
+
+def _is_reducible_oxide(oxide):
+    """能被 H2、C、CO 还原的金属氧化物（活动性在 Zn 之后）"""
+    return oxide.category == OXIDE and oxide.element is not None and _more_active("Zn", oxide.element)
+
+
+def _redox(x, y):
+    return ("oxidizer" in x.tags and "reducer" in y.tags) or ("reducer" in x.tags and "oxidizer" in y.tags)
+
+
+def _ion_exchange(x, y, acid_precipitates=True):
+    """
+    两种酸/碱/盐在溶液中交换成分：生成沉淀、气体或水则能反应。
+    :param acid_precipitates: 为 False 时酸与盐生成的沉淀不计（弱酸制不出强酸盐沉淀，如 CO2 与 BaCl2）
+    """
+    if {x.anion, y.anion} == {"HCO3", "OH"}:
+        return REACTS
+
+    result = NO_REACTION
+    for donor, acceptor in ((x, y), (y, x)):
+        for cation in donor.cations:
+            anion = acceptor.anion
+            if cation == "H":
+                outcome = _acid_with_anion(donor, acceptor)
+            elif anion == "OH" and cation == "NH4" and acceptor.strength == 2:
+                outcome = REACTS  # 铵盐与强碱生成氨气
+            else:
+                solubility = product_solubility(cation, anion)
+                if solubility == INSOLUBLE:
+                    outcome = REACTS if acid_precipitates or "H" not in acceptor.cations else NO_REACTION
+                else:
+                    outcome = UNCERTAIN if solubility == SLIGHT else NO_REACTION
+            result = max(result, outcome)
+    return result
+
+
+def _acid_with_anion(acid, other):
+    """酸中的 H⁺ 与另一种物质的阴离子结合"""
+    anion = other.anion
+    if anion == "OH":
+        return REACTS
+    if anion == "CO3":
+        return REACTS
+    if anion == "HCO3":
+        return REACTS if acid.strength > 0 else NO_REACTION
+    if anion == "S":
+        if other.cations == ("Cu",):
+            return NO_REACTION  # CuS 不溶于非氧化性酸
+        if "oxidizer" in acid.tags or acid.strength < 3:
+            return UNCERTAIN
+        return REACTS
+    if anion in ("PO4", "ClO", "MnO4^2-"):
+        return UNCERTAIN
+    return NO_REACTION
+
+
+def _rule_oxygen(x, y):
+    if x.formula != "O2":
+        return None
+    if y.category == METAL:
+        return REACTS if "fuel" in y.tags else NO_REACTION
+    if "fuel" in y.tags or y.anion == "S":
+        return REACTS
+    if "reducer" in y.tags:
+        return UNCERTAIN
+    return NO_REACTION
+
+
+def _rule_chlorine(x, y):
+    if x.formula != "Cl2":
+        return None
+    if y.category == METAL:
+        if y.element == "Au":
+            return NO_REACTION
+        return UNCERTAIN if y.element in ("Ag", "Hg") else REACTS
+    if y.category == BASE:
+        return REACTS if y.strength == 2 else UNCERTAIN
+    if "reducer" in y.tags or y.category == ORGANIC:
+        return UNCERTAIN
+    if y.category == SALT and (y.anion in ("CO3", "HCO3") or y.cations == ("Ag",)):
+        return UNCERTAIN  # 氯水中的 HCl 与碳酸盐、银盐反应
+    return NO_REACTION
+
+
+def _rule_nitrogen(x, y):
+    if x.formula != "N2":
+        return None
+    return NO_REACTION
+
+
+def _rule_hydrogen(x, y):
+    if x.formula != "H2":
+        return None
+    if y.formula == "S" or _is_reducible_oxide(y):
+        return REACTS
+    if y.formula == "C" or y.kind == "fat":
+        return UNCERTAIN
+    if "oxidizer" in y.tags and y.category != ACID:
+        return UNCERTAIN
+    return NO_REACTION
+
+
+def _rule_carbon(x, y):
+    if x.formula != "C":
+        return None
+    if _is_reducible_oxide(y) or y.formula in ("HNO3", "H2SO4"):
+        return REACTS
+    if "oxidizer" in y.tags or y.category == NONMETAL:
+        return UNCERTAIN
+    return NO_REACTION
+
+
+def _rule_sulfur(x, y):
+    if x.formula != "S":
+        return None
+    if y.category == METAL:
+        if y.element == "Au":
+            return NO_REACTION
+        return UNCERTAIN if y.element == "Ag" else REACTS
+    if y.formula in ("H2", "HNO3", "H2SO4"):
+        return REACTS
+    if "oxidizer" in y.tags or y.category == NONMETAL or (y.category == BASE and y.strength == 2):
+        return UNCERTAIN
+    return NO_REACTION
+
+
+def _rule_phosphorus(x, y):
+    if x.formula != "P":
+        return None
+    if "oxidizer" in y.tags or y.category in (NONMETAL, METAL) or (y.category == BASE and y.strength == 2):
+        return UNCERTAIN
+    return NO_REACTION
+
+
+def _rule_organic(x, y):
+    if x.category != ORGANIC:
+        return None
+    kind = x.kind
+    hydrolyzable = kind in ("disaccharide", "polysaccharide", "protein", "fat")
+
+    if y.category == ACID:
+        if kind == "protein" and y.formula == "HNO3":
+            return REACTS  # 蛋白质的显色反应
+        if kind in ("glucose", "disaccharide", "polysaccharide") and y.formula == "H2SO4":
+            return REACTS  # 浓硫酸的脱水性
+        if y.strength == 3 and (hydrolyzable or kind == "alcohol" or "oxidizer" in y.tags):
+            return UNCERTAIN
+        return NO_REACTION
+    if y.category == BASE:
+        if kind == "fat" and y.strength == 2:
+            return REACTS  # 皂化
+        if (kind == "protein" and y.strength == 2) or (kind == "disaccharide" and y.formula == "Cu(OH)2"):
+            return UNCERTAIN
+        return NO_REACTION
+    if y.category == SALT:
+        if kind == "protein" and y.solubility == SOLUBLE and set(y.cations) & {"Cu", "Ag", "Ba"}:
+            return REACTS  # 重金属盐使蛋白质变性
+        if "oxidizer" in y.tags and kind != "alkane":
+            return UNCERTAIN
+        if kind == "glucose" and y.cations == ("Ag",):
+            return UNCERTAIN
+        return NO_REACTION
+    if y.category == OXIDE:
+        return UNCERTAIN if hydrolyzable and y.formula == "H2O" else NO_REACTION
+    if y.formula == "H2O2":
+        return NO_REACTION if kind == "alkane" else UNCERTAIN
+    if y.category in (METAL, ORGANIC, OTHER):
+        return NO_REACTION
+    return None
+
+
+def _rule_metal(x, y):
+    if x.category != METAL:
+        return None
+    metal = x.element
+    active = _more_active(metal, "H")
+
+    if y.category == METAL:
+        return NO_REACTION
+    if y.category == ACID:
+        if metal == "Au":
+            return NO_REACTION
+        if y.formula == "HNO3":
+            return REACTS
+        if active:
+            return REACTS if y.strength > 0 else UNCERTAIN
+        return UNCERTAIN if y.formula == "H2SO4" else NO_REACTION  # 浓硫酸可氧化铜、银
+    if y.category == BASE:
+        if metal == "Al" and y.strength == 2:
+            return REACTS
+        return UNCERTAIN if metal == "Zn" and y.strength == 2 else NO_REACTION
+    if y.category == SALT:
+        if y.solubility == INSOLUBLE:
+            return NO_REACTION
+        if any(_more_active(metal, cation) for cation in y.cations):
+            return REACTS  # 活泼金属置换出盐溶液中的不活泼金属
+        if "oxidizer" in y.tags:
+            return UNCERTAIN
+        if y.cations == ("NH4",) and active:
+            return UNCERTAIN
+        return NO_REACTION
+    if y.category == OXIDE:
+        if y.formula == "H2O":
+            if metal in ("Mg", "Fe"):
+                return REACTS  # 镁与热水、铁与水蒸气
+            return UNCERTAIN if metal == "Al" else NO_REACTION
+        if y.element is not None:
+            if _more_active(metal, y.element):
+                return REACTS if metal in ("Al", "Mg") else UNCERTAIN  # 铝热反应等
+            return NO_REACTION
+        if y.formula in ("SO2", "SO3", "SiO2") and metal in ("Mg", "Al"):
+            return UNCERTAIN
+        return NO_REACTION
+    if y.category == OTHER:
+        return UNCERTAIN if "oxidizer" in y.tags and metal != "Au" else NO_REACTION
+    return None
+
+
+def _rule_acid(x, y):
+    if x.category != ACID:
+        return None
+    if y.category == ACID:
+        return NO_REACTION
+    if y.category == BASE:
+        if x.strength == 0 and y.solubility == INSOLUBLE:
+            return UNCERTAIN
+        return REACTS
+    if y.category == OXIDE:
+        if y.kind == "basic":
+            if x.strength > 0 or y.formula == "CaO":
+                return REACTS
+            return UNCERTAIN
+        if y.kind == "amphoteric":
+            return REACTS if x.strength == 3 else UNCERTAIN
+        if _redox(x, y) or y.kind == "other":
+            return UNCERTAIN
+        return NO_REACTION
+    if y.category == SALT:
+        if "oxidizer" in x.tags and "reducer" in y.tags:
+            return UNCERTAIN
+        if y.solubility == INSOLUBLE:
+            if y.anion == "CO3" and x.formula == "H2SO4" and set(y.cations) & {"Ca", "Ba"}:
+                return UNCERTAIN  # 生成的微溶/难溶硫酸盐覆盖在表面，反应很快停止
+            if y.anion == "PO4":
+                return UNCERTAIN if x.strength == 3 else NO_REACTION
+            return _acid_with_anion(x, y)
+        if y.solubility == SLIGHT:
+            return NO_REACTION
+        return _ion_exchange(x, y, acid_precipitates=x.strength == 3)
+    if y.category == OTHER:
+        return REACTS if y.formula == "NH3" else NO_REACTION
+    return None
+
+
+def _rule_base(x, y):
+    if x.category != BASE:
+        return None
+    if y.category == BASE:
+        if y.kind == "amphoteric" and x.strength == 2:
+            return REACTS if x.solubility == SOLUBLE else UNCERTAIN
+        return NO_REACTION
+    if y.category == OXIDE:
+        if x.strength == 0:
+            return NO_REACTION
+        if y.formula == "SiO2":
+            if x.formula in ("NaOH", "KOH"):
+                return REACTS
+            return UNCERTAIN if x.strength == 2 else NO_REACTION
+        if y.kind == "acidic":
+            return REACTS
+        if y.kind == "amphoteric" and x.strength == 2:
+            return REACTS if x.solubility == SOLUBLE else UNCERTAIN
+        return NO_REACTION
+    if y.category == SALT:
+        if x.strength == 0 or y.solubility == INSOLUBLE:
+            return NO_REACTION
+        return _ion_exchange(x, y)
+    if y.category == OTHER:
+        return UNCERTAIN if "oxidizer" in y.tags else NO_REACTION
+    return None
+
+
+def _rule_salt(x, y):
+    if x.category != SALT:
+        return None
+    if _redox(x, y):
+        return UNCERTAIN
+    if y.category == SALT:
+        if x.solubility == INSOLUBLE or y.solubility == INSOLUBLE:
+            return NO_REACTION
+        return _ion_exchange(x, y)
+    if y.category == OXIDE:
+        if y.formula == "H2O":
+            if x.formula in ("FeCl3", "NaClO", "K2MnO4") or "Al" in x.cations:
+                return UNCERTAIN  # 水解、歧化
+            return NO_REACTION
+        if y.formula == "CO2":
+            return REACTS if x.anion in ("CO3", "ClO") else NO_REACTION
+        if y.formula == "SO2":
+            return REACTS if x.anion in ("CO3", "HCO3") and x.solubility != INSOLUBLE else NO_REACTION
+        if y.formula == "SO3":
+            if x.solubility == INSOLUBLE:
+                return NO_REACTION
+            return REACTS if x.anion in ("CO3", "HCO3") or "Ba" in x.cations else NO_REACTION
+        if y.formula == "SiO2":
+            return REACTS if x.anion == "CO3" else NO_REACTION  # 高温制玻璃
+        if y.formula == "CaO":
+            if x.solubility == INSOLUBLE:
+                return NO_REACTION
+            return REACTS if "NH4" in x.cations else UNCERTAIN
+        return NO_REACTION
+    if y.category == OTHER:
+        if y.formula == "NH3" and x.solubility == SOLUBLE:
+            if any(product_solubility(cation, "OH") == INSOLUBLE for cation in x.cations):
+                return UNCERTAIN
+            return NO_REACTION
+        return NO_REACTION
+    return None
+
+
+def _rule_oxide(x, y):
+    if x.category != OXIDE:
+        return None
+    if y.category == OXIDE:
+        if x.formula == "H2O":
+            if y.formula == "CaO" or y.kind == "acidic" and y.formula != "SiO2":
+                return REACTS
+            return UNCERTAIN if y.formula in ("MgO", "CO") else NO_REACTION
+        if x.formula == "CaO" and y.kind == "acidic":
+            return REACTS
+        if x.formula == "MgO" and y.kind == "acidic":
+            return UNCERTAIN
+        if x.formula == "CO" and _is_reducible_oxide(y):
+            return REACTS
+        return UNCERTAIN if _redox(x, y) else NO_REACTION
+    if y.category == OTHER:
+        if _redox(x, y):
+            return UNCERTAIN
+        if y.formula == "NH3" and x.kind == "acidic":
+            return UNCERTAIN
+        return NO_REACTION
+    return None
+
+
+def _rule_other(x, y):
+    if x.category != OTHER or y.category != OTHER:
+        return None
+    return NO_REACTION
+
+
+_RULES = (
+    _rule_oxygen, _rule_chlorine, _rule_nitrogen, _rule_hydrogen, _rule_carbon, _rule_sulfur, _rule_phosphorus,
+    _rule_organic, _rule_metal, _rule_acid, _rule_base, _rule_salt, _rule_oxide, _rule_other,
+)
+
+
+def judge_pair(a, b):
+    """判断两种物质（SubstanceProfile）能否反应，返回 REACTS / NO_REACTION / UNCERTAIN"""
+    if a.formula == b.formula:
+        return NO_REACTION
+    special = SPECIAL_PAIRS.get(frozenset((a.formula, b.formula)))
+    if special is not None:
+        return special
+    for rule in _RULES:
+        for x, y in ((a, b), (b, a)):
+            result = rule(x, y)
+            if result is not None:
+                return result
+    return UNCERTAIN
+
+
+class ReactivityIndex:
+    """
+    物质反应性索引：每种物质一行，"能反应"和"不反应"各用一个整数位图表示，
+    查询任意一对物质或某种物质的全部反应伙伴都不需要再做规则推导。
+    """
+
+    def __init__(self, substances):
+        """
+        :param substances: 物质列表（如 ALLOWED_SUBSTANCES），没有档案的物质会被忽略
+        """
+        self.substances = tuple(dict.fromkeys(
+            canonical_formula(s) for s in substances if canonical_formula(s) in PROFILES
+        ))
+        self._position = {s: i for i, s in enumerate(self.substances)}
+        n = len(self.substances)
+        self._reacts = [0] * n
+        self._inert = [0] * n
+
+        profiles = [PROFILES[s] for s in self.substances]
+        for i in range(n):
+            for j in range(i + 1, n):
+                result = judge_pair(profiles[i], profiles[j])
+                if result == REACTS:
+                    self._reacts[i] |= 1 << j
+                    self._reacts[j] |= 1 << i
+                elif result == NO_REACTION:
+                    self._inert[i] |= 1 << j
+                    self._inert[j] |= 1 << i
+
+    def __contains__(self, substance):
+        return canonical_formula(substance) in self._position
+
+    def profile(self, substance):
+        return PROFILES.get(canonical_formula(substance))
+
+    def category(self, substance):
+        profile = self.profile(substance)
+        return profile.category if profile else None
+
+    def solubility(self, substance):
+        profile = self.profile(substance)
+        return profile.solubility if profile else None
+
+    def activity(self, substance):
+        """金属单质在活动性顺序中的位置，非金属单质返回 None"""
+        profile = self.profile(substance)
+        if profile is None or profile.category != METAL:
+            return None
+        return activity_rank(profile.element)
+
+    def can_react(self, a, b):
+        """两种物质能否反应：True / False，无法确定或物质不在索引中时返回 None"""
+        i = self._position.get(canonical_formula(a))
+        j = self._position.get(canonical_formula(b))
+        if i is None or j is None:
+            return None
+        if self._reacts[i] >> j & 1:
+            return True
+        if self._inert[i] >> j & 1:
+            return False
+        return None
+
+    def _decode(self, bits):
+        return [self.substances[i] for i in range(bits.bit_length()) if bits >> i & 1]
+
+    def reactive_partners(self, substance):
+        i = self._position.get(canonical_formula(substance))
+        return [] if i is None else self._decode(self._reacts[i])
+
+    def inert_partners(self, substance):
+        i = self._position.get(canonical_formula(substance))
+        return [] if i is None else self._decode(self._inert[i])
+
+
+class SubstanceSampler:
+    """
+    根据反应性索引即时生成物质列表。
+    最近展示过的物质会被记住，下次优先选择没出现过的；同一列表中尽量覆盖不同类别。
+    """
+
+    def __init__(self, index, count=6, reactive=4, inert=2, history=2, rng=None):
+        """
+        :param count: 中心物质列表的长度
+        :param reactive: 反应物列表中能与中心物质反应的数量
+        :param inert: 反应物列表中不能与中心物质反应的数量
+        :param history: 记住最近几轮展示过的物质
+        """
+        self.index = index
+        self.count = count
+        self.reactive = reactive
+        self.inert = inert
+        self.history = history
+        self._rng = rng or random.Random()
+        self._recent_centers = deque(maxlen=count * history)
+        self._recent_reactants = {}
+
+        # 能凑出完整反应物列表的物质才适合做中心物质
+        self.center_candidates = [
+            s for s in index.substances
+            if len(index.reactive_partners(s)) >= reactive and len(index.inert_partners(s)) >= inert
+        ]
+
+    def _diverse_sample(self, pool, k, recent):
+        """从 pool 中抽取 k 个，优先最近没出现过的，并按类别轮流抽取"""
+        fresh = [s for s in pool if s not in recent]
+        stale = [s for s in pool if s in recent]
+        self._rng.shuffle(fresh)
+        self._rng.shuffle(stale)
+
+        by_category = {}
+        for s in fresh:
+            by_category.setdefault(self.index.category(s), []).append(s)
+        groups = list(by_category.values())
+        self._rng.shuffle(groups)
+
+        chosen = []
+        while len(chosen) < k and groups:
+            for group in list(groups):
+                if len(chosen) == k:
+                    break
+                chosen.append(group.pop())
+                if not group:
+                    groups.remove(group)
+
+        chosen += stale[:k - len(chosen)]
+        return chosen
+
+    def center_list(self):
+        """中心物质列表"""
+        chosen = self._diverse_sample(self.center_candidates, self.count, self._recent_centers)
+        self._recent_centers.extend(chosen)
+        return chosen
+
+    def reactant_list(self, center):
+        """
+        与中心物质配对的反应物列表（reactive 个能反应 + inert 个不能反应，已打乱）。
+        中心物质不在索引中或凑不齐时返回 None。
+        """
+        key = canonical_formula(center)
+        reactive_pool = self.index.reactive_partners(key)
+        inert_pool = self.index.inert_partners(key)
+        if len(reactive_pool) < self.reactive or len(inert_pool) < self.inert:
+            return None
+
+        recent = self._recent_reactants.get(key)
+        if recent is None:
+            recent = self._recent_reactants[key] = deque(maxlen=(self.reactive + self.inert) * self.history)
+
+        chosen = (self._diverse_sample(reactive_pool, self.reactive, recent)
+                  + self._diverse_sample(inert_pool, self.inert, recent))
+        recent.extend(chosen)
+        self._rng.shuffle(chosen)
+        return chosen
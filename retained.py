@@ -0,0 +1,76 @@
+"""
+保留模式的界面绘制：静态内容只画一次，每帧只刷新变化的区域。
+
+界面分三层：
+- base：背景图和标题、提示等固定文字，进入界面时画一次；
+- static：base 之上的控件（物质框、按钮等），控件状态变化时只重画该控件所在的区域；
+- overlay：光标、摄像头画面、闪烁的提示等每帧都会变的内容，直接画在屏幕上，
+  下一帧开始时用 static 层中对应的区域擦除。
+
+present() 只把本帧变化过的矩形交给 pygame.display.update(rects)，
+静止的界面几乎不占 CPU；需要整屏刷新时（刚进入界面）才调用 display.flip()。
+"""
+import pygame
+
+
+class RetainedScreen:
+    def __init__(self, target):
+        self.target = target
+        size = target.get_size()
+        self.base = pygame.Surface(size).convert()
+        self.static = pygame.Surface(size).convert()
+        self._widget_keys = {}
+        self._overlays = []  # 上一帧 overlay 占用的矩形
+        self._dirty = []
+        self._full_redraw = True
+
+    def reset(self, draw_base):
+        """进入新界面时调用：draw_base(surface) 画出背景和固定文字，下一次 present 整屏刷新"""
+        draw_base(self.base)
+        self.static.blit(self.base, (0, 0))
+        self.target.blit(self.static, (0, 0))
+        self._widget_keys.clear()
+        self._overlays = []
+        self._dirty = []
+        self._full_redraw = True
+
+    def update_widget(self, widget, rect, key, draw):
+        """
+        key 与上次不同时在 static 层重画控件：先用 base 擦除 rect，再调用 draw(surface)。
+        返回是否重画。
+        """
+        if self._widget_keys.get(widget) == key:
+            return False
+        self._widget_keys[widget] = key
+        rect = pygame.Rect(rect)
+        self.static.blit(self.base, rect, rect)
+        draw(self.static)
+        self.target.blit(self.static, rect, rect)
+        self._dirty.append(rect)
+        return True
+
+    def begin_frame(self):
+        """擦除上一帧的 overlay"""
+        for rect in self._overlays:
+            self.target.blit(self.static, rect, rect)
+        self._dirty.extend(self._overlays)
+        self._overlays = []
+
+    def overlay(self, rect):
+        """登记本帧直接画在屏幕上的内容所占的矩形，下一帧自动擦除"""
+        if rect is None:
+            return
+        rect = pygame.Rect(rect).clip(self.target.get_rect())
+        if rect.width and rect.height:
+            self._overlays.append(rect)
+
+    def present(self):
+        """只刷新本帧变化过的区域"""
+        if self._full_redraw:
+            pygame.display.flip()
+            self._full_redraw = False
+        else:
+            rects = self._dirty + self._overlays
+            if rects:
+                pygame.display.update(rects)
+        self._dirty = []
@@ -0,0 +1,229 @@
+"""
+兼容 OpenAI 接口的替身 AI 服务器，只实现 /v1/chat/completions。
+
+按提示词返回固定的回答（物质列表、物质信息或反应分析），流式请求按数据块返回，
+可以设置每个数据块的延迟来模拟真实的生成速度。服务器统计收到的请求数、TCP 连接数和
+同时处理中的请求数的峰值，还可以让接下来的若干个请求返回错误（fail_next），
+用于测试 KimiClientManager 的连接复用、并发上限和重试（test_kimi_clients.py）。
+也可以在没有网络和 API 费用的情况下压测界面流程（ui_driver.py --stub-ai），或者手动试用：
+
+    python stub_ai_server.py --port 8765 --chunk-delay 0.05
+    KIMI_BASE_URL=http://127.0.0.1:8765/v1 KIMI_API_KEY=stub python main.py
+"""
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CENTER_LIST_ANSWER = "HCl,NaOH,CuSO4,CaCO3,Fe,H2O"
+REACTANT_LIST_ANSWER = "Fe,NaOH,CaCO3,AgNO3,SiO2,C"
+INFO_ANSWER = (
+    "INFO***这是替身服务器返回的物质介绍。该物质是中学化学中常见的物质，具有典型的物理性质和化学性质，"
+    "广泛用于实验室和工业生产。***参考链接：https://zh.wikipedia.org/wiki/化学"
+)
+REACTION_ANSWER = (
+    "YES***Fe + 2HCl → FeCl₂ + H₂↑***常温常压即可；铁片表面产生无色气泡，溶液逐渐变为浅绿色。"
+    "***参考链接：https://zh.wikipedia.org/wiki/氯化亚铁***机理：铁失电子被氧化为亚铁离子，氢离子得电子还原为氢气。"
+)
+
+
+def answer_for(messages):
+    """按最后一条用户消息挑选固定回答"""
+    prompt = messages[-1].get("content", "") if messages else ""
+    if "提供6个" in prompt:
+        return REACTANT_LIST_ANSWER if "中心物质" in prompt and "反应模拟" in prompt else CENTER_LIST_ANSWER
+    if "详细信息" in prompt:
+        return INFO_ANSWER
+    return REACTION_ANSWER
+
+
+def split_chunks(text, size=8):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class StubAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    chunk_delay = 0.0
+    first_token_delay = 0.0
+
+    def log_message(self, format, *args):
+        logging.debug("stub-ai: " + format % args)
+
+    def setup(self):
+        super().setup()
+        self.server.on_connection()
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self.send_error(400)
+            return
+
+        self.server.begin_request()
+        try:
+            self._respond(request)
+        finally:
+            self.server.end_request()
+
+    def _respond(self, request):
+        answer = answer_for(request.get("messages", []))
+        model = request.get("model", "stub")
+        time.sleep(self.first_token_delay)
+
+        failure = self.server.take_failure()
+        if failure is not None:
+            self._send_error_json(*failure)
+        elif request.get("stream"):
+            self._stream(answer, model)
+        else:
+            self._send_json({
+                "id": "stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": answer},
+                    "finish_reason": "stop",
+                }],
+            })
+
+    def _send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error_json(self, status, retry_after):
+        headers = {"Retry-After": str(retry_after)} if retry_after is not None else None
+        self._send_json({"error": {"message": f"stub error {status}", "type": "stub_error", "code": status}},
+                        status, headers)
+
+    def _stream(self, answer, model):
+        # 分块传输编码：流结束后连接保持打开，客户端可以复用
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send(data):
+            payload = f"data: {data}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+            self.wfile.flush()
+
+        try:
+            for piece in split_chunks(answer):
+                send(json.dumps({
+                    "id": "stub",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                }, ensure_ascii=False))
+                time.sleep(self.chunk_delay)
+            send("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端取消了查询
+            self.close_connection = True
+
+
+class StubAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, chunk_delay=0.0, first_token_delay=0.0):
+        handler = type("Handler", (StubAIHandler,), {
+            "chunk_delay": chunk_delay,
+            "first_token_delay": first_token_delay,
+        })
+        super().__init__((host, port), handler)
+        self.request_count = 0
+        self.connection_count = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._stats_lock = threading.Lock()
+        self._failures = []
+        self._thread = None
+
+    def on_connection(self):
+        with self._stats_lock:
+            self.connection_count += 1
+
+    def begin_request(self):
+        with self._stats_lock:
+            self.request_count += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def end_request(self):
+        with self._stats_lock:
+            self.in_flight -= 1
+
+    def fail_next(self, status=429, count=1, retry_after=0):
+        """让接下来的 count 个请求返回 status 错误；retry_after 为 None 时不带 Retry-After 头"""
+        with self._stats_lock:
+            self._failures.extend([(status, retry_after)] * count)
+
+    def take_failure(self):
+        with self._stats_lock:
+            return self._failures.pop(0) if self._failures else None
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.request_count = 0
+            self.connection_count = 0
+            self.peak_in_flight = self.in_flight
+            self._failures.clear()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        """在后台线程中运行，返回 base_url"""
+        self._thread = threading.Thread(target=self.serve_forever, name="stub-ai-server", daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="兼容 OpenAI 接口的替身 AI 服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="流式输出每个数据块的延迟（秒）")
+    parser.add_argument("--first-token-delay", type=float, default=0.3, help="开始输出前的延迟（秒）")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    server = StubAIServer(args.host, args.port, args.chunk_delay, args.first_token_delay)
+    print(f"stub AI server: {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
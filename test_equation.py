@@ -0,0 +1,77 @@
+import pytest
+
+from equation import BALANCED, FIXED, MALFORMED, UNBALANCED, UNCHECKED, check_equation, check_equation_field
+
+
+@pytest.mark.parametrize("text", [
+    "2Na + 2HCl → 2NaCl + H₂↑",
+    "2H₂ + O₂ =点燃= 2H₂O",
+    "2KClO₃ =MnO₂,△= 2KCl + 3O₂↑",
+    "2H₂O ==通电== 2H₂↑ + O₂↑",
+    "Cu + 2H₂SO₄(浓) → CuSO₄ + SO₂↑ + 2H₂O",
+    "CuSO₄·5H₂O → CuSO₄ + 5H₂O",
+    "Ba²⁺ + SO₄²⁻ → BaSO₄↓",
+])
+def test_balanced(text):
+    assert check_equation(text).status == BALANCED
+
+
+@pytest.mark.parametrize("text", [
+    "2H₂ + O₂ ——点燃→ 2H₂O",
+    "CaCO₃ —高温→ CaO + CO₂↑",
+    "2H₂O₂ -MnO₂-> 2H₂O + O₂↑",
+])
+def test_condition_decorated_arrow_is_one_arrow(text):
+    assert check_equation(text).status == BALANCED
+
+
+@pytest.mark.parametrize("text", [
+    "CaCO₃ 高温 CaO + CO₂↑",
+    "H₂ + Cl₂ 点燃 2HCl",
+    "2KClO₃ 催化剂、加热 2KCl + 3O₂↑",
+])
+def test_condition_in_place_of_arrow(text):
+    assert check_equation(text).status == BALANCED
+
+
+def test_fixes_wrong_coefficients():
+    check = check_equation("Fe + HCl → FeCl₂ + H₂↑")
+    assert check.status == FIXED
+    assert check.corrected == "Fe + 2HCl → FeCl₂ + H₂↑"
+
+
+def test_unbalanceable_and_malformed():
+    assert check_equation("Fe + HCl → FeCl₃ + O₂").status == UNBALANCED
+    assert check_equation("铁和盐酸反应生成氢气").status == MALFORMED
+    assert check_equation("A → B → C").status == MALFORMED
+    assert check_equation("淀粉 → C₆H₁₂O₆").status == UNCHECKED
+
+
+@pytest.mark.parametrize("field, corrected", [
+    ("Na + HCl → NaCl + H₂↑（置换反应）", "2Na + 2HCl → 2NaCl + H₂↑（置换反应）"),
+    ("Na + HCl → NaCl + H₂↑ (置换反应)。", "2Na + 2HCl → 2NaCl + H₂↑ (置换反应)。"),
+    ("化学方程式：Zn + HCl → ZnCl₂ + H₂↑", "化学方程式：Zn + 2HCl → ZnCl₂ + H₂↑"),
+    ("反应1: Zn + HCl → ZnCl₂ + H₂↑", "反应1: Zn + 2HCl → ZnCl₂ + H₂↑"),
+])
+def test_field_ignores_labels_and_trailing_notes(field, corrected):
+    text, checks = check_equation_field(field)
+    assert [check.status for check in checks] == [FIXED]
+    assert text == corrected
+
+
+def test_field_keeps_state_annotations():
+    text, checks = check_equation_field("NaOH + HCl → NaCl + H₂O (中和反应)；C + O₂ → CO₂ (g)")
+    assert [check.status for check in checks] == [BALANCED, BALANCED]
+
+
+def test_field_condition_words_in_prose_are_ignored():
+    text, checks = check_equation_field("CaCO₃ 高温 CaO + CO₂↑；需要 加热 才能进行")
+    assert [check.status for check in checks] == [BALANCED]
+    assert check_equation_field("需要 加热 才能进行")[0] is None
+
+
+def test_field_without_equation_or_unbalanceable():
+    assert check_equation_field("常温下不反应")[0] is None
+    text, checks = check_equation_field("Fe + HCl → FeCl₃ + O₂")
+    assert text is None
+    assert checks[0].status == UNBALANCED
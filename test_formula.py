@@ -0,0 +1,59 @@
+import pytest
+
+from formula import canonical_formula, canonical_reactants, parse_formula, reactants_key, split_reactants
+
+
+@pytest.mark.parametrize("text, canonical", [
+    ("H₂SO₄", "H2SO4"),
+    ("Ｈ２Ｏ", "H2O"),
+    ("CuSO₄·5H₂O", "CuSO4·5H2O"),
+    ("CuSO4.5H2O", "CuSO4·5H2O"),
+    ("CO₂↑", "CO2"),
+    ("SO₄²⁻", "SO4^2-"),
+    ("Fe^3+", "Fe^3+"),
+    ("OH-", "OH^-"),
+    ("Na+", "Na^+"),
+    ("蛋白质", "蛋白质"),
+])
+def test_canonical_formula(text, canonical):
+    assert canonical_formula(text) == canonical
+
+
+def test_parse_formula_composition_and_charge():
+    formula = parse_formula("Ca(OH)₂")
+    assert formula.composition == {"Ca": 1, "O": 2, "H": 2}
+    assert parse_formula("OH-").charge == -1
+    assert parse_formula("Fe^3+").charge == 3
+    # "Fe3+" 有歧义，不当作电荷
+    assert not parse_formula("Fe3+").is_formula
+    assert parse_formula("(C₆H₁₀O₅)ₙ").composition is None
+
+
+@pytest.mark.parametrize("text, parts", [
+    ("Na + HCl", ["Na", "HCl"]),
+    ("Na+HCl", ["Na", "HCl"]),
+    ("HCl，Na、Fe", ["HCl", "Na", "Fe"]),
+    ("Fe + HCl =", ["Fe", "HCl"]),
+    ("Fe^3+ + OH-", ["Fe^3+", "OH-"]),
+    ("Fe^3++OH-", ["Fe^3+", "OH-"]),
+    ("Na+ + Cl-", ["Na+", "Cl-"]),
+    ("Ag+, Cl-", ["Ag+", "Cl-"]),
+    ("Ba²⁺ + SO₄²⁻", ["Ba²⁺", "SO₄²⁻"]),
+])
+def test_split_reactants(text, parts):
+    assert split_reactants(text) == parts
+
+
+def test_reactants_key_is_order_independent():
+    assert reactants_key("Na + HCl") == reactants_key("HCl, Na") == reactants_key(["HCl", "Na"])
+    assert reactants_key("H₂SO₄ + Zn") == reactants_key("Zn, H2SO4")
+
+
+def test_duplicate_reactants_are_kept():
+    assert canonical_reactants("Na + Na") == ("Na", "Na")
+    assert reactants_key("Na + Na") != reactants_key("Na")
+
+
+def test_ions_keep_their_charge():
+    assert canonical_reactants("Fe^3+ + OH-") == ("Fe^3+", "OH^-")
+    assert reactants_key("Fe³⁺ + OH⁻") == reactants_key("OH- + Fe^3+")
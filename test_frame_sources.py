@@ -0,0 +1,254 @@
+import json
+import types
+
+import cv2
+import numpy as np
+import pytest
+
+import frame_sources
+from frame_sources import (FrameDirectorySource, LandmarkStreamSource, RecordedFrame, SessionRecorder,
+                           open_source)
+
+
+class Clock:
+    """替代 time.monotonic / time.sleep：sleep 只推进时间并记录时长"""
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 6))
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(frame_sources, "time", types.SimpleNamespace(monotonic=clock.monotonic, sleep=clock.sleep))
+    return clock
+
+
+def make_frame(value, size=(32, 24)):
+    return np.full((size[1], size[0], 3), value, dtype=np.uint8)
+
+
+@pytest.fixture
+def frame_dir(tmp_path):
+    directory = tmp_path / "frames"
+    directory.mkdir()
+    # 文件名排序与写入顺序不同；非图片文件被忽略
+    for name, value in [("frame_002.png", 20), ("frame_000.png", 0), ("frame_001.png", 10)]:
+        cv2.imwrite(str(directory / name), make_frame(value))
+    (directory / "notes.txt").write_text("not an image")
+    return str(directory)
+
+
+def hand(x, y, z=0.0):
+    """录制文件中的一只手：21 个关键点都放在同一位置"""
+    return [[x, y, z]] * 21
+
+
+def write_landmarks(path, records, fps=30.0, size=(32, 24)):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"width": size[0], "height": size[1], "fps": fps}) + "\n")
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    return str(path)
+
+
+def read_all(source, limit=20):
+    frames = []
+    for _ in range(limit):
+        ret, frame = source.read()
+        if not ret:
+            break
+        frames.append(frame)
+    return frames
+
+
+def test_frame_directory_reads_in_name_order(frame_dir):
+    source = open_source(f"frames:{frame_dir}", realtime=False)
+    assert isinstance(source, FrameDirectorySource)
+    frames = read_all(source)
+    assert [int(frame[0, 0, 0]) for frame in frames] == [0, 10, 20]
+    # loop=False：读完之后一直返回 (False, None)
+    assert source.read() == (False, None)
+    assert source.read() == (False, None)
+
+
+def test_frame_directory_loops(frame_dir):
+    source = FrameDirectorySource(frame_dir, realtime=False, loop=True)
+    assert [int(frame[0, 0, 0]) for frame in read_all(source, limit=7)] == [0, 10, 20, 0, 10, 20, 0]
+
+
+def test_frame_directory_is_paced_by_fps(frame_dir, clock):
+    source = FrameDirectorySource(frame_dir, fps=10, realtime=True)
+    times = []
+    for _ in range(3):
+        assert source.read()[0]
+        times.append(clock.now)
+    assert times == pytest.approx([100.0, 100.1, 100.2])
+
+    # 读取方本身就比帧率慢时不再等待，也不会为了追赶而连续返回积压的帧
+    source = FrameDirectorySource(frame_dir, fps=10, realtime=True, loop=True)
+    clock.sleeps.clear()
+    for _ in range(4):
+        assert source.read()[0]
+        clock.now += 0.25
+    assert clock.sleeps == []
+
+
+def test_empty_frame_directory_is_rejected(tmp_path):
+    with pytest.raises(OSError):
+        FrameDirectorySource(str(tmp_path))
+
+
+def test_landmark_stream_replays_records_in_order(tmp_path):
+    path = write_landmarks(tmp_path / "s.landmarks.jsonl", [
+        {"t": 0, "hands": []},
+        {"t": 33.3, "hands": [hand(0.1, 0.2)]},
+        {"t": 66.7, "hands": [hand(0.3, 0.4), hand(0.5, 0.6)]},
+    ])
+    source = open_source(path, realtime=False)
+    assert isinstance(source, LandmarkStreamSource)
+    assert source.size == (32, 24)
+    frames = read_all(source)
+    assert all(isinstance(frame, RecordedFrame) for frame in frames)
+    assert all(frame.shape == (24, 32, 3) for frame in frames)
+    assert [len(frame.recorded_hands) for frame in frames] == [0, 1, 2]
+    assert frames[1].recorded_hands[0][0] == [0.1, 0.2, 0.0]
+    assert source.read() == (False, None)
+
+
+def test_landmark_stream_is_paced_by_timestamps(tmp_path, clock):
+    path = write_landmarks(tmp_path / "s.landmarks.jsonl", [
+        {"t": 0, "hands": []},
+        {"t": 40, "hands": []},
+        {"t": 200, "hands": []},
+        {"t": 250, "hands": []},
+    ], fps=30.0)
+    source = LandmarkStreamSource(path, realtime=True, loop=True)
+    start = clock.now
+    times = []
+    for _ in range(4):
+        assert source.read()[0]
+        times.append(round((clock.now - start) * 1000, 3))
+    # 按录制时的间隔回放，而不是按 30 fps
+    assert times == [0, 40, 200, 250]
+
+    # 循环回到开头时重新对齐时间原点，第一帧立即返回
+    clock.now += 0.01
+    before = clock.now
+    assert source.read()[0]
+    assert clock.now == before
+    assert source.read()[0]
+    assert clock.now == pytest.approx(before + 0.04)
+
+
+def test_landmark_stream_does_not_burst_after_falling_behind(tmp_path, clock):
+    path = write_landmarks(tmp_path / "s.landmarks.jsonl", [{"t": t, "hands": []} for t in (0, 50, 100, 150)])
+    source = LandmarkStreamSource(path, realtime=True)
+    assert source.read()[0]
+    # 读取方卡顿了 300 ms，之后的帧仍然间隔 50 ms
+    clock.now += 0.3
+    assert source.read()[0]
+    behind = clock.now
+    assert source.read()[0]
+    assert clock.now == pytest.approx(behind + 0.05)
+    assert source.read()[0]
+    assert clock.now == pytest.approx(behind + 0.1)
+    assert source.read() == (False, None)
+
+
+def test_landmark_stream_without_timestamps_uses_fps(tmp_path, clock):
+    path = write_landmarks(tmp_path / "old.landmarks.jsonl", [{"hands": []}] * 3, fps=20.0)
+    source = LandmarkStreamSource(path, realtime=True)
+    start = clock.now
+    times = []
+    for _ in range(3):
+        assert source.read()[0]
+        times.append(clock.now - start)
+    assert times == pytest.approx([0, 0.05, 0.1])
+
+
+class FakeVideoWriter:
+    instances = []
+
+    def __init__(self, path, fourcc, fps, size):
+        self.path = path
+        self.fps = fps
+        self.size = size
+        self.frames = []
+        self.released = False
+        FakeVideoWriter.instances.append(self)
+
+    def write(self, frame):
+        self.frames.append(int(frame[0, 0, 0]))
+
+    def release(self):
+        self.released = True
+
+
+@pytest.fixture
+def fake_writer(monkeypatch):
+    FakeVideoWriter.instances = []
+    monkeypatch.setattr(frame_sources.cv2, "VideoWriter", FakeVideoWriter)
+    return FakeVideoWriter
+
+
+def landmark_list(x, y):
+    point = types.SimpleNamespace(x=x, y=y, z=0.0)
+    return types.SimpleNamespace(landmark=[point] * 21)
+
+
+def test_recorder_fills_skipped_video_slots(tmp_path, fake_writer):
+    recorder = SessionRecorder(str(tmp_path / "sessions" / "demo"), fps=10)
+    # 推理跟不上：0.31 s 这一帧之前的两个空位用上一帧（0.05 s）补齐；同一空位内的第二帧不写入视频
+    for value, timestamp in [(0, 50.0), (10, 50.05), (20, 50.31), (30, 50.35), (40, 50.52)]:
+        recorder.write(make_frame(value), [landmark_list(0.5, 0.5)], timestamp=timestamp)
+    recorder.close()
+
+    writer, = fake_writer.instances
+    assert writer.path == recorder.video_path
+    assert writer.fps == 10 and writer.size == (32, 24)
+    assert writer.frames == [0, 10, 10, 20, 30, 40]
+    assert writer.released
+    assert recorder.frames == 5
+
+    with open(recorder.landmarks_path, "r", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        records = [json.loads(line) for line in f]
+    assert header == {"width": 32, "height": 24, "fps": 10}
+    assert [record["t"] for record in records] == [0.0, 50.0, 310.0, 350.0, 520.0]
+    assert records[0]["hands"][0][0] == [0.5, 0.5, 0.0]
+
+
+def test_recorder_does_not_create_video_for_recorded_frames(tmp_path, fake_writer):
+    source_path = write_landmarks(tmp_path / "in.landmarks.jsonl", [
+        {"t": 0, "hands": [hand(0.1, 0.2)]},
+        {"t": 100, "hands": [hand(0.3, 0.4)]},
+    ])
+    source = LandmarkStreamSource(source_path, realtime=False)
+    recorder = SessionRecorder(str(tmp_path / "out"))
+    for index, frame in enumerate(read_all(source)):
+        hands = [landmark_list(*points[0][:2]) for points in frame.recorded_hands]
+        recorder.write(frame, hands, timestamp=10.0 + index * 0.1)
+    recorder.close()
+
+    assert fake_writer.instances == []
+    assert not (tmp_path / "out.mp4").exists()
+    # 录制结果可以再次回放
+    replayed = read_all(open_source(recorder.landmarks_path, realtime=False))
+    assert [frame.recorded_hands[0][0][:2] for frame in replayed] == [[0.1, 0.2], [0.3, 0.4]]
+
+
+def test_recorder_close_without_frames(tmp_path, fake_writer):
+    recorder = SessionRecorder(str(tmp_path / "empty"))
+    recorder.close()
+    recorder.close()
+    assert fake_writer.instances == []
+    assert not (tmp_path / "empty.landmarks.jsonl").exists()
@@ -0,0 +1,194 @@
+"""GestureAnalyzer：ROI 裁剪和缩小后的关键点换算回整帧坐标，以及 ROI 丢失时回退到整帧推理"""
+import types
+
+import cv2
+import numpy as np
+import pytest
+
+import gestures
+from gestures import GestureAnalyzer, GestureBackend, HandFrame, hand_center
+
+FRAME_SIZE = (640, 480)
+SCREEN_SIZE = (1400, 800)
+
+
+class FakeBackend(GestureBackend):
+    """
+    把传入图像中的每个亮块当作一只手：21 个关键点都位于亮块的中心（相对于传入图像归一化）。
+    记录每次调用收到的图像尺寸。
+    """
+
+    def __init__(self, name, max_num_hands, calls, supports_roi=True):
+        self.name = name
+        self.max_num_hands = max_num_hands
+        self.supports_roi = supports_roi
+        self.calls = calls
+
+    def detect(self, rgb_image, timestamp_ms):
+        height, width = rgb_image.shape[:2]
+        self.calls.append((self.max_num_hands, (width, height)))
+        gray = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2GRAY)
+        count, _, stats, centroids = cv2.connectedComponentsWithStats((gray > 64).astype(np.uint8))
+        # 面积最大的亮块优先；裁剪边缘上只剩一小部分的亮块不算
+        blobs = sorted(range(1, count), key=lambda i: -stats[i, cv2.CC_STAT_AREA])
+        hands = []
+        for i in blobs[:self.max_num_hands]:
+            if stats[i, cv2.CC_STAT_AREA] < 4:
+                continue
+            x, y = (centroids[i] + 0.5) / (width, height)
+            hands.append(types.SimpleNamespace(landmark=[
+                types.SimpleNamespace(x=float(x), y=float(y), z=0.0) for _ in range(21)
+            ]))
+        return hands
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+    monkeypatch.setitem(gestures.BACKENDS, "fake",
+                        lambda max_num_hands: FakeBackend("fake", max_num_hands, calls))
+    monkeypatch.setitem(gestures.BACKENDS, "fake-async",
+                        lambda max_num_hands: FakeBackend("fake-async", max_num_hands, calls, supports_roi=False))
+    return calls
+
+
+def make_analyzer(backend="fake", **kwargs):
+    kwargs.setdefault("inference_size", (320, 240))
+    kwargs.setdefault("full_frame_interval", 5)
+    return GestureAnalyzer(backend, screen_size=SCREEN_SIZE, draw_landmarks=False, **kwargs)
+
+
+def frame_with_hands(*centers, size=FRAME_SIZE, radius=8):
+    """未翻转的摄像头画面，在 centers（像素坐标）处画亮块"""
+    frame = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+    for x, y in centers:
+        frame[y - radius:y + radius, x - radius:x + radius] = 255
+    return frame
+
+
+def expected_position(x, y, size=FRAME_SIZE):
+    """亮块中心在翻转后整帧中的归一化坐标"""
+    return (size[0] - x) / size[0], y / size[1]
+
+
+def first_point(hand_frame, index=0):
+    point = hand_frame.landmarks[index].landmark[0]
+    return point.x, point.y
+
+
+def test_full_frame_pass_is_downscaled_and_mapped_back(calls):
+    analyzer = make_analyzer()
+    hand_frame = analyzer.analyze(frame_with_hands((160, 120)), timestamp_ms=0)
+
+    # 整帧推理在缩小到 320x240 的画面上进行
+    assert calls == [(2, (320, 240))]
+    assert first_point(hand_frame) == pytest.approx(expected_position(160, 120), abs=0.01)
+    x, y = expected_position(160, 120)
+    assert hand_frame.hand_pos == pytest.approx((x * SCREEN_SIZE[0], y * SCREEN_SIZE[1]), abs=15)
+    assert hand_frame.hand_pos == hand_center(hand_frame.landmarks[0], SCREEN_SIZE)
+
+
+def test_small_frames_are_not_upscaled(calls):
+    analyzer = make_analyzer(inference_size=(1280, 960))
+    analyzer.analyze(frame_with_hands((160, 120)), timestamp_ms=0)
+    assert calls == [(2, FRAME_SIZE)]
+
+
+@pytest.mark.parametrize("center", [(160, 120), (600, 40), (20, 460), (330, 250)])
+def test_roi_pass_is_mapped_back_to_full_frame(calls, center):
+    analyzer = make_analyzer()
+    analyzer.analyze(frame_with_hands(center), timestamp_ms=0)
+    roi = analyzer._roi
+    assert roi is not None
+    x, y, w, h = roi
+    # ROI 是限制在画面内的正方形，不小于短边的 1/4
+    assert w == h >= FRAME_SIZE[1] // 4
+    assert 0 <= x <= FRAME_SIZE[0] - w and 0 <= y <= FRAME_SIZE[1] - h
+
+    # 手在 ROI 内移动了几个像素
+    moved = (center[0] + 3, center[1] - 2)
+    calls.clear()
+    hand_frame = analyzer.analyze(frame_with_hands(moved), timestamp_ms=33)
+    assert calls == [(1, (w, h))]
+    assert first_point(hand_frame) == pytest.approx(expected_position(*moved), abs=0.01)
+
+
+def test_large_roi_is_downscaled_before_inference(calls):
+    analyzer = make_analyzer(inference_size=(64, 48), roi_scale=1.0)
+    analyzer.analyze(frame_with_hands((320, 240)), timestamp_ms=0)
+    x, y, w, h = analyzer._roi
+    assert w > 48
+
+    calls.clear()
+    hand_frame = analyzer.analyze(frame_with_hands((322, 238)), timestamp_ms=33)
+    assert calls == [(1, (48, 48))]
+    assert first_point(hand_frame) == pytest.approx(expected_position(322, 238), abs=0.02)
+
+
+def test_lost_hand_falls_back_to_full_frame_on_same_frame(calls):
+    analyzer = make_analyzer()
+    analyzer.analyze(frame_with_hands((160, 120)), timestamp_ms=0)
+    calls.clear()
+
+    # 手跳到了 ROI 之外：ROI 推理没有结果，当帧立即整帧推理
+    hand_frame = analyzer.analyze(frame_with_hands((560, 400)), timestamp_ms=33)
+    assert [hands for hands, _ in calls] == [1, 2]
+    assert first_point(hand_frame) == pytest.approx(expected_position(560, 400), abs=0.01)
+    # 之后在新位置附近跟踪
+    x, y, w, h = analyzer._roi
+    fx, fy = expected_position(560, 400)
+    assert x <= fx * FRAME_SIZE[0] <= x + w and y <= fy * FRAME_SIZE[1] <= y + h
+
+
+def test_no_hand_clears_roi(calls):
+    analyzer = make_analyzer()
+    analyzer.analyze(frame_with_hands((160, 120)), timestamp_ms=0)
+    hand_frame = analyzer.analyze(frame_with_hands(), timestamp_ms=33)
+    assert hand_frame.hand_pos is None and hand_frame.label == "none"
+    assert analyzer._roi is None
+    calls.clear()
+    analyzer.analyze(frame_with_hands(), timestamp_ms=66)
+    assert calls == [(2, (320, 240))]
+
+
+def test_full_frame_pass_every_interval(calls):
+    analyzer = make_analyzer(full_frame_interval=3)
+    for i in range(8):
+        analyzer.analyze(frame_with_hands((160, 120)), timestamp_ms=i * 33)
+    # 第一帧整帧推理，之后每 3 帧 ROI 推理后做一次整帧推理，以发现第二只手
+    assert [hands for hands, _ in calls] == [2, 1, 1, 1, 2, 1, 1, 1]
+
+
+def test_two_hands_use_full_frame(calls):
+    analyzer = make_analyzer()
+    hand_frame = analyzer.analyze(frame_with_hands((160, 120), (480, 360)), timestamp_ms=0)
+    assert hand_frame.two_hands and hand_frame.label == "two_hands"
+    assert analyzer._roi is None
+    points = sorted(first_point(hand_frame, i) for i in range(2))
+    expected = sorted([expected_position(160, 120), expected_position(480, 360)])
+    assert points[0] == pytest.approx(expected[0], abs=0.01)
+    assert points[1] == pytest.approx(expected[1], abs=0.01)
+    calls.clear()
+    analyzer.analyze(frame_with_hands((160, 120), (480, 360)), timestamp_ms=33)
+    assert calls == [(2, (320, 240))]
+
+
+def test_backend_without_roi_support_always_uses_full_frame(calls):
+    analyzer = make_analyzer("fake-async")
+    assert analyzer.roi_backend is None
+    for i in range(3):
+        hand_frame = analyzer.analyze(frame_with_hands((160, 120)), timestamp_ms=i * 33)
+        assert first_point(hand_frame) == pytest.approx(expected_position(160, 120), abs=0.01)
+    assert calls == [(2, (320, 240))] * 3
+
+
+def test_mouse_backend_needs_no_inference():
+    analyzer = GestureAnalyzer("mouse", screen_size=SCREEN_SIZE)
+    hand_frame = analyzer.analyze(frame_with_hands((160, 120)), timestamp_ms=0)
+    assert isinstance(hand_frame, HandFrame)
+    assert hand_frame.hand_pos is None and hand_frame.landmarks == []
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        GestureAnalyzer("no-such-backend")
@@ -0,0 +1,94 @@
+"""KimiClientManager 对替身 AI 服务器（stub_ai_server.py）的连接复用、并发上限和重试"""
+import threading
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("openai")
+pytest.importorskip("dotenv")
+
+from kimi import KIMI_MAX_CONCURRENCY, KimiClientManager  # noqa: E402
+from stub_ai_server import REACTION_ANSWER, StubAIServer  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "Fe, HCl"}]
+
+
+@pytest.fixture
+def server():
+    server = StubAIServer(first_token_delay=0.05)
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def manager(server):
+    manager = KimiClientManager("stub", server.base_url, max_concurrency=KIMI_MAX_CONCURRENCY,
+                                max_retries=3, backoff_base=0.01, backoff_max=0.05)
+    yield manager
+    manager.close()
+
+
+def complete(manager):
+    completion = manager.chat_completion(model="stub", messages=MESSAGES)
+    return completion.choices[0].message.content
+
+
+def complete_streamed(manager):
+    stream = manager.chat_completion(model="stub", messages=MESSAGES, stream=True)
+    return "".join(chunk.choices[0].delta.content or "" for chunk in stream)
+
+
+def test_sequential_requests_reuse_one_connection(server, manager):
+    for _ in range(3):
+        assert complete(manager) == REACTION_ANSWER
+        assert complete_streamed(manager) == REACTION_ANSWER
+    assert server.request_count == 6
+    assert server.connection_count == 1
+
+
+def test_concurrency_never_exceeds_limit(server, manager):
+    results = []
+    errors = []
+
+    def worker(streamed):
+        try:
+            results.append(complete_streamed(manager) if streamed else complete(manager))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i % 2 == 0,)) for i in range(KIMI_MAX_CONCURRENCY * 3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+
+    assert not errors
+    assert results == [REACTION_ANSWER] * len(threads)
+    assert 1 <= server.peak_in_flight <= KIMI_MAX_CONCURRENCY
+    assert server.connection_count <= KIMI_MAX_CONCURRENCY
+
+
+def test_rate_limited_request_is_retried(server, manager):
+    server.fail_next(status=429, retry_after=0)
+    assert complete(manager) == REACTION_ANSWER
+    assert server.request_count == 2
+    # 错误响应之后连接仍然被复用
+    assert server.connection_count == 1
+
+
+def test_rate_limited_stream_is_retried(server, manager):
+    server.fail_next(status=429, count=2, retry_after=0)
+    assert complete_streamed(manager) == REACTION_ANSWER
+    assert server.request_count == 3
+
+
+def test_gives_up_after_max_retries(server, manager):
+    import openai
+
+    server.fail_next(status=429, count=manager.max_retries + 1, retry_after=0)
+    with pytest.raises(openai.RateLimitError):
+        complete(manager)
+    assert server.request_count == manager.max_retries + 1
+    # 失败的请求也要归还并发名额
+    assert complete(manager) == REACTION_ANSWER
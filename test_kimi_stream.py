@@ -0,0 +1,52 @@
+"""query_ai_general_info 的流式部分结果：只在段落变化时回调，另有节流的心跳"""
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("openai")
+pytest.importorskip("dotenv")
+
+import kimi  # noqa: E402
+from knowledge_base import KnowledgeBase  # noqa: E402
+from stub_ai_server import REACTION_ANSWER, StubAIServer, split_chunks  # noqa: E402
+
+
+@pytest.fixture
+def stub_kimi(tmp_path, monkeypatch):
+    server = StubAIServer()
+    server.start()
+    manager = kimi.KimiClientManager("stub", server.base_url, max_retries=0)
+    monkeypatch.setattr(kimi, "kimi_clients", manager)
+    monkeypatch.setattr(kimi, "knowledge_base", KnowledgeBase(str(tmp_path / "missing.sqlite3")))
+    yield server
+    manager.close()
+    server.stop()
+
+
+def collect_partials(query="Fe + HCl"):
+    partials = []
+    result = kimi.query_ai_general_info(query, on_partial=partials.append, use_cache=False)
+    return result, partials
+
+
+def test_partials_only_when_sections_change(stub_kimi, monkeypatch):
+    monkeypatch.setattr(kimi, "KIMI_PARTIAL_HEARTBEAT", 60)
+    result, partials = collect_partials()
+    assert result.kind == "YES"
+
+    chunks = split_chunks(REACTION_ANSWER)
+    # 只有完整收到新的一段时才回调（第一个数据块 "YES***Fe" 已经带有完整的类型段）
+    assert len(partials) <= REACTION_ANSWER.count("***") < len(chunks)
+    assert partials[0].kind == "YES"
+    sections = [p for p in partials if p is not None]
+    assert all(p.partial for p in sections)
+    assert len({id(p) for p in sections}) == len(sections)
+    assert sections[-1].equation == result.equation
+
+
+def test_heartbeat_while_sections_do_not_change(stub_kimi, monkeypatch):
+    monkeypatch.setattr(kimi, "KIMI_PARTIAL_HEARTBEAT", 0)
+    result, partials = collect_partials()
+    assert result.kind == "YES"
+    # 间隔为 0 时每个数据块都回调；段落没变时是同一个对象
+    assert len(partials) == len(split_chunks(REACTION_ANSWER))
+    assert len({id(p) for p in partials}) <= REACTION_ANSWER.count("***") + 1
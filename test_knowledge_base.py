@@ -0,0 +1,147 @@
+import json
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("openai")
+pytest.importorskip("dotenv")
+
+import kimi  # noqa: E402
+from formula import reactants_key  # noqa: E402
+from knowledge_base import KnowledgeBase, all_queries, build, validate  # noqa: E402
+from query_cache import QueryCache  # noqa: E402
+from query_result import QueryError, load_result, parse_response, to_json  # noqa: E402
+
+SUBSTANCES = ("Fe", "HCl", "Cu")
+INFO_TEXT = "INFO***一种常见的物质。***参考链接：https://zh.wikipedia.org/wiki/化学"
+YES_TEXT = "YES***Fe + 2HCl → FeCl₂ + H₂↑***常温***参考链接：https://zh.wikipedia.org/wiki/氯化亚铁***铁被氧化"
+UNBALANCED = json.dumps({"type": "YES", "equation": "Fe + HCl → FeCl₃ + O₂"}, ensure_ascii=False)
+WRONG_COEFFICIENTS = json.dumps({"type": "YES", "equation": "Fe + HCl → FeCl₂ + H₂↑"}, ensure_ascii=False)
+
+
+class FakeQuery:
+    """替代 kimi.query_ai_general_info：记录调用，fail 中的查询返回 QueryError"""
+
+    def __init__(self, fail=()):
+        self.calls = []
+        self.fail = set(fail)
+
+    def __call__(self, query, use_cache=True):
+        self.calls.append((query, use_cache))
+        if query in self.fail:
+            return QueryError("网络错误")
+        count = len(query.split(" + "))
+        return parse_response(INFO_TEXT if count == 1 else YES_TEXT, count)
+
+
+@pytest.fixture
+def kb(tmp_path):
+    kb = KnowledgeBase(str(tmp_path / "knowledge_base.sqlite3"), create=True)
+    yield kb
+    kb.close()
+
+
+@pytest.fixture
+def fake_query(monkeypatch):
+    fake = FakeQuery()
+    monkeypatch.setattr(kimi, "ALLOWED_SUBSTANCES", SUBSTANCES)
+    monkeypatch.setattr(kimi, "query_ai_general_info", fake)
+    return fake
+
+
+def test_build_respects_limit_and_resumes(kb, fake_query):
+    queries = all_queries(SUBSTANCES)
+    assert len(queries) == 6
+
+    assert build(kb, interval=0, limit=2) == (2, 0)
+    assert [query for query, _ in fake_query.calls] == queries[:2]
+    assert kb.count() == 2
+
+    # 再次运行时从断点继续，已收录的条目不再查询
+    assert build(kb, interval=0) == (4, 0)
+    assert [query for query, _ in fake_query.calls] == queries
+    assert kb.keys(kimi.PROMPT_VERSION, kimi.KIMI_MODEL) == {reactants_key(q) for q in queries}
+
+    assert build(kb, interval=0) == (0, 0)
+    assert len(fake_query.calls) == 6
+
+
+def test_build_retries_failed_queries_on_next_run(kb, fake_query):
+    fake_query.fail = {"HCl + Cu"}
+    assert build(kb, interval=0) == (5, 1)
+    assert kb.get(reactants_key("HCl + Cu")) is None
+
+    fake_query.fail = set()
+    fake_query.calls.clear()
+    assert build(kb, interval=0) == (1, 0)
+    assert fake_query.calls == [("HCl + Cu", False)]
+
+
+def test_build_requeries_stale_entries(kb, fake_query):
+    kb.put(reactants_key("Fe + HCl"), to_json(parse_response(YES_TEXT, 2)), kimi.PROMPT_VERSION - 1, kimi.KIMI_MODEL)
+    kb.put(reactants_key("Fe"), to_json(parse_response(INFO_TEXT, 1)), kimi.PROMPT_VERSION, "another-model")
+    kb.put(reactants_key("Cu"), to_json(parse_response(INFO_TEXT, 1)), kimi.PROMPT_VERSION, kimi.KIMI_MODEL)
+
+    assert build(kb, interval=0) == (5, 0)
+    assert "Cu" not in [query for query, _ in fake_query.calls]
+    assert {"Fe", "Fe + HCl"} <= {query for query, _ in fake_query.calls}
+    assert kb.get(reactants_key("Fe + HCl"), kimi.PROMPT_VERSION, kimi.KIMI_MODEL) is not None
+
+
+def test_build_does_not_use_the_runtime_cache(kb, tmp_path, monkeypatch):
+    """构建时不读也不写运行时的查询缓存：缓存中的旧结果不会进入知识库，课堂上缓存的条目也不会被挤掉"""
+    from stub_ai_server import StubAIServer
+
+    cache = QueryCache(str(tmp_path / "kimi_cache.sqlite3"))
+    old_key = QueryCache.make_key(reactants_key("Fe + HCl"), kimi.PROMPT_VERSION, kimi.KIMI_MODEL,
+                                  kimi.GENERAL_INFO_TEMPERATURE)
+    old_answer = to_json(parse_response("NO***缓存中的旧回答。", 2))
+    cache.set(old_key, reactants_key("Fe + HCl"), old_answer)
+
+    server = StubAIServer()
+    server.start()
+    manager = kimi.KimiClientManager("stub", server.base_url, max_retries=0)
+    monkeypatch.setattr(kimi, "ALLOWED_SUBSTANCES", ("Fe", "HCl"))
+    monkeypatch.setattr(kimi, "kimi_clients", manager)
+    monkeypatch.setattr(kimi, "query_cache", cache)
+    monkeypatch.setattr(kimi, "knowledge_base", KnowledgeBase(str(tmp_path / "missing.sqlite3")))
+    monkeypatch.setattr(kimi, "KIMI_CACHE_REFRESH", False)
+    try:
+        assert build(kb, interval=0) == (3, 0)
+    finally:
+        manager.close()
+        server.stop()
+
+    assert server.request_count == 3
+    assert load_result(kb.get(reactants_key("Fe + HCl"))).kind == "YES"
+    assert cache.items() == [(old_key, reactants_key("Fe + HCl"), old_answer)]
+
+
+def test_validate_rejects_unbalanced_equations(kb):
+    kb.put("Fe + HCl", to_json(parse_response(YES_TEXT, 2)), kimi.PROMPT_VERSION, kimi.KIMI_MODEL)
+    kb.put("Fe + O2", UNBALANCED, kimi.PROMPT_VERSION, kimi.KIMI_MODEL)
+    kb.put("Fe + H2SO4", WRONG_COEFFICIENTS, kimi.PROMPT_VERSION, kimi.KIMI_MODEL)
+
+    stats = validate(kb, prompt_version=kimi.PROMPT_VERSION, model=kimi.KIMI_MODEL)
+    assert stats == {"ok": 1, "updated": 1, "rejected": 1, "stale": 0}
+    # 不加 fix 时不修改知识库
+    assert kb.get("Fe + O2") == UNBALANCED
+    assert kb.get("Fe + H2SO4") == WRONG_COEFFICIENTS
+
+    stats = validate(kb, fix=True, prompt_version=kimi.PROMPT_VERSION, model=kimi.KIMI_MODEL)
+    assert stats == {"ok": 1, "updated": 1, "rejected": 1, "stale": 0}
+    assert kb.get("Fe + O2") is None
+    assert load_result(kb.get("Fe + H2SO4")).equation == "Fe + 2HCl → FeCl₂ + H₂↑"
+    assert validate(kb)["rejected"] == 0
+
+
+def test_validate_checks_cache_and_counts_stale_entries(kb, tmp_path):
+    kb.put("Fe + HCl", to_json(parse_response(YES_TEXT, 2)), kimi.PROMPT_VERSION - 1, kimi.KIMI_MODEL)
+    cache = QueryCache(str(tmp_path / "kimi_cache.sqlite3"))
+    cache.set("unbalanced", "Fe + O2", UNBALANCED)
+    cache.set("list", "substance_list:Fe", "HCl,NaOH")
+
+    stats = validate(kb, cache=cache, fix=True, prompt_version=kimi.PROMPT_VERSION, model=kimi.KIMI_MODEL)
+    assert stats == {"ok": 1, "updated": 0, "rejected": 1, "stale": 1}
+    assert cache.get("unbalanced") is None
+    assert cache.get("list") == "HCl,NaOH"
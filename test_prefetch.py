@@ -0,0 +1,180 @@
+"""kimi.PrefetchScheduler：预算上限、跳过已收录的查询、cancel() 释放 QueryHandle"""
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("openai")
+pytest.importorskip("dotenv")
+
+import kimi  # noqa: E402
+from formula import reactants_key  # noqa: E402
+from knowledge_base import KnowledgeBase  # noqa: E402
+from query_cache import QueryCache  # noqa: E402
+from query_result import QueryError, parse_response, to_json  # noqa: E402
+from query_service import QueryService  # noqa: E402
+
+TIMEOUT = 5
+YES_TEXT = "YES***Fe + 2HCl → FeCl₂ + H₂↑***常温***参考链接：https://zh.wikipedia.org/wiki/氯化亚铁***铁被氧化"
+
+
+class FakeQueries:
+    """替代 kimi.query_ai_general_info：每个查询都等到 release_all() 或被取消才返回"""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self._lock = threading.Lock()
+        self.started = []
+        self.running = 0
+        self.peak = 0
+        self.cancelled = []
+        self._started_events = {}
+
+    def started_event(self, query):
+        with self._lock:
+            return self._started_events.setdefault(reactants_key(query), threading.Event())
+
+    def __call__(self, substances_str, force_refresh=False, on_partial=None, cancel_event=None):
+        with self._lock:
+            self.started.append(reactants_key(substances_str))
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        self.started_event(substances_str).set()
+        try:
+            while not self.gate.wait(0.01):
+                if cancel_event.is_set():
+                    with self._lock:
+                        self.cancelled.append(reactants_key(substances_str))
+                    return QueryError("查询已取消")
+            return parse_response(YES_TEXT, 2)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    def release_all(self):
+        self.gate.set()
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = QueryService(max_workers=8)
+    monkeypatch.setattr(kimi, "query_service", service)
+    yield service
+    service.shutdown()
+
+
+@pytest.fixture
+def queries(monkeypatch, service):
+    fake = FakeQueries()
+    monkeypatch.setattr(kimi, "query_ai_general_info", fake)
+    yield fake
+    fake.release_all()
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    kb = KnowledgeBase(str(tmp_path / "knowledge_base.sqlite3"), create=True)
+    cache = QueryCache(str(tmp_path / "kimi_cache.sqlite3"))
+    monkeypatch.setattr(kimi, "knowledge_base", kb)
+    monkeypatch.setattr(kimi, "query_cache", cache)
+    yield kb, cache
+    kb.close()
+    cache.close()
+
+
+def make_scheduler(max_concurrency=2, max_queued=6):
+    return kimi.PrefetchScheduler(max_concurrency, max_queued)
+
+
+def wait_until(predicate):
+    deadline = time.monotonic() + TIMEOUT
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_prefetch_stays_within_budget(queries, stores):
+    scheduler = make_scheduler(max_concurrency=2, max_queued=3)
+    try:
+        batch = ["Fe + HCl", "Zn + HCl", "Mg + HCl", "Al + HCl", "CaCO3 + HCl"]
+        scheduler.prefetch(batch)
+        assert wait_until(lambda: queries.running == 2)
+        # 两个工作线程都被占住，第三个查询在排队
+        time.sleep(0.1)
+        assert queries.running == 2 and len(queries.started) == 2
+
+        queries.release_all()
+        assert wait_until(lambda: len(queries.started) == 3 and queries.running == 0)
+        assert queries.peak == 2
+        # 每批最多 max_queued 个
+        assert sorted(queries.started) == sorted(reactants_key(q) for q in batch[:3])
+    finally:
+        scheduler.shutdown()
+
+
+def test_prefetch_skips_queries_in_knowledge_base_or_cache(queries, stores):
+    kb, cache = stores
+    kb.put(reactants_key("Fe + HCl"), to_json(parse_response(YES_TEXT, 2)), kimi.PROMPT_VERSION, kimi.KIMI_MODEL)
+    # 旧提示词版本生成的知识库条目运行时不使用，仍然预取
+    kb.put(reactants_key("Zn + HCl"), to_json(parse_response(YES_TEXT, 2)), kimi.PROMPT_VERSION - 1, kimi.KIMI_MODEL)
+    cache_key = QueryCache.make_key(reactants_key("HCl + Mg"), kimi.PROMPT_VERSION, kimi.KIMI_MODEL,
+                                    kimi.GENERAL_INFO_TEMPERATURE)
+    cache.set(cache_key, reactants_key("HCl + Mg"), to_json(parse_response(YES_TEXT, 2)))
+
+    scheduler = make_scheduler(max_concurrency=4)
+    try:
+        queries.release_all()
+        scheduler.prefetch(["Fe + HCl", "Zn + HCl", "Mg + HCl", "Al + HCl"])
+        assert wait_until(lambda: len(queries.started) == 2 and queries.running == 0)
+        assert sorted(queries.started) == sorted([reactants_key("Zn + HCl"), reactants_key("Al + HCl")])
+    finally:
+        scheduler.shutdown()
+
+
+def test_cancel_releases_handles_and_frees_workers(queries, stores, service):
+    scheduler = make_scheduler(max_concurrency=1)
+    try:
+        scheduler.prefetch(["Fe + HCl", "Zn + HCl"])
+        assert queries.started_event("Fe + HCl").wait(TIMEOUT)
+        assert service.inflight_count() == 1
+
+        # 网格变化：新的一批取代旧的一批，旧查询没有其他调用方，被取消
+        scheduler.prefetch(["Mg + HCl"])
+        assert queries.started_event("Mg + HCl").wait(TIMEOUT)
+        assert wait_until(lambda: queries.cancelled == [reactants_key("Fe + HCl")])
+        # 唯一的工作线程没有被泄漏的 handle 占住，排在后面的 "Zn + HCl" 已被取消
+        assert reactants_key("Zn + HCl") not in queries.started
+
+        scheduler.cancel()
+        assert wait_until(lambda: queries.running == 0 and service.inflight_count() == 0)
+        assert sorted(queries.cancelled) == sorted([reactants_key("Fe + HCl"), reactants_key("Mg + HCl")])
+        assert scheduler._handles == [] and scheduler._futures == []
+
+        # 取消之后工作线程空闲，新的一批立即开始
+        scheduler.prefetch(["Al + HCl"])
+        assert queries.started_event("Al + HCl").wait(TIMEOUT)
+    finally:
+        scheduler.shutdown()
+
+
+def test_cancel_keeps_foreground_query_on_same_reaction(queries, stores, service):
+    scheduler = make_scheduler(max_concurrency=1)
+    try:
+        scheduler.prefetch(["Fe + HCl"])
+        assert queries.started_event("Fe + HCl").wait(TIMEOUT)
+        results = []
+        done = threading.Event()
+        foreground = kimi.request_general_info("HCl, Fe")
+        foreground.add_done_callback(lambda result: (results.append(result), done.set()))
+
+        scheduler.cancel()
+        assert queries.cancelled == []
+        queries.release_all()
+        assert done.wait(TIMEOUT)
+        assert results[0].kind == "YES"
+        assert queries.started == [reactants_key("Fe + HCl")]
+    finally:
+        scheduler.shutdown()
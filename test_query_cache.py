@@ -0,0 +1,159 @@
+import sqlite3
+import types
+
+import pytest
+
+import query_cache
+from query_cache import QueryCache
+
+KEY = QueryCache.make_key("Fe + HCl", 1, "kimi-k2-turbo-preview", 0.6)
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(query_cache, "time", types.SimpleNamespace(time=clock.time))
+    return clock
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "cache" / "kimi_cache.sqlite3")
+
+
+def test_hit_and_overwrite(path):
+    cache = QueryCache(path)
+    assert cache.get(KEY) is None
+    cache.set(KEY, "Fe + HCl", "first")
+    cache.set(KEY, "Fe + HCl", "second")
+    assert cache.get(KEY) == "second"
+    cache.close()
+    # 重新打开后仍然命中
+    assert QueryCache(path).get(KEY) == "second"
+
+
+def test_expired_entry_misses(path, clock):
+    cache = QueryCache(path, ttl=60)
+    cache.set(KEY, "Fe + HCl", "value")
+    clock.now += 59
+    assert cache.get(KEY) == "value"
+    clock.now += 2
+    assert cache.get(KEY) is None
+    # 过期条目被删除，不会因为再次访问而复活
+    clock.now -= 2
+    assert cache.get(KEY) is None
+    assert cache.items() == []
+
+
+def test_ttl_zero_never_expires(path, clock):
+    cache = QueryCache(path, ttl=0)
+    cache.set(KEY, "Fe + HCl", "value")
+    clock.now += 10 * 365 * 24 * 3600
+    assert cache.get(KEY) == "value"
+
+
+def test_least_recently_read_entry_is_evicted_first(path, clock):
+    cache = QueryCache(path, max_entries=3)
+    for name in ("a", "b", "c"):
+        cache.set(name, name, name)
+        clock.now += 1
+    # 读取 a 之后，最久未访问的是 b
+    assert cache.get("a") == "a"
+    clock.now += 1
+    cache.set("d", "d", "d")
+    assert cache.get("b") is None
+    assert {key for key, _, _ in cache.items()} == {"a", "c", "d"}
+
+    clock.now += 1
+    cache.set("e", "e", "e")
+    assert {key for key, _, _ in cache.items()} == {"a", "d", "e"}
+
+
+@pytest.mark.parametrize("changed", [
+    ("Fe + HCl", 2, "kimi-k2-turbo-preview", 0.6),  # 提示词版本
+    ("Fe + HCl", 1, "moonshot-v1-8k", 0.6),  # 模型
+    ("Fe + HCl", 1, "kimi-k2-turbo-preview", 0.7),  # 温度
+    ("Fe + H2SO4", 1, "kimi-k2-turbo-preview", 0.6),  # 查询内容
+])
+def test_key_changes_with_prompt_version_model_and_temperature(path, changed):
+    cache = QueryCache(path)
+    cache.set(KEY, "Fe + HCl", "value")
+    other = QueryCache.make_key(*changed)
+    assert other != KEY
+    assert cache.get(other) is None
+    assert cache.get(KEY) == "value"
+
+
+def test_corrupt_database_degrades_to_miss(path):
+    QueryCache(path).close()
+    with open(path, "wb") as f:
+        f.write(b"this is not a sqlite database" * 100)
+
+    cache = QueryCache(path)
+    assert cache.get(KEY) is None
+    cache.set(KEY, "Fe + HCl", "value")
+    assert cache.get(KEY) is None
+    assert cache.items() == []
+    cache.delete(KEY)
+
+
+def test_locked_database_degrades_to_miss(path):
+    cache = QueryCache(path, timeout=0.05)
+    cache.set(KEY, "Fe + HCl", "value")
+
+    other = sqlite3.connect(path)
+    other.execute("BEGIN EXCLUSIVE")
+    try:
+        # 其他进程持有写锁：读取时更新访问时间失败、写入失败，都按未命中处理
+        assert cache.get(KEY) is None
+        cache.set("other", "Fe + CuSO4", "value")
+        cache.delete(KEY)
+    finally:
+        other.rollback()
+        other.close()
+
+    assert cache.get(KEY) == "value"
+    assert cache.get("other") is None
+
+
+def test_kimi_cache_key_follows_prompt_version_and_model(tmp_path, monkeypatch):
+    """kimi 的通用查询用当前的 PROMPT_VERSION 和 KIMI_MODEL 生成缓存键，改动后不再命中旧结果"""
+    pytest.importorskip("httpx")
+    pytest.importorskip("openai")
+    pytest.importorskip("dotenv")
+    import kimi
+    from knowledge_base import KnowledgeBase
+    from stub_ai_server import StubAIServer
+
+    server = StubAIServer()
+    server.start()
+    manager = kimi.KimiClientManager("stub", server.base_url, max_retries=0)
+    monkeypatch.setattr(kimi, "kimi_clients", manager)
+    monkeypatch.setattr(kimi, "query_cache", QueryCache(str(tmp_path / "kimi_cache.sqlite3")))
+    monkeypatch.setattr(kimi, "knowledge_base", KnowledgeBase(str(tmp_path / "missing.sqlite3")))
+    monkeypatch.setattr(kimi, "KIMI_CACHE_REFRESH", False)
+    try:
+        assert kimi.query_ai_general_info("Fe + HCl").kind == "YES"
+        assert kimi.query_ai_general_info("HCl, Fe").kind == "YES"
+        assert server.request_count == 1
+
+        monkeypatch.setattr(kimi, "PROMPT_VERSION", kimi.PROMPT_VERSION + 1)
+        assert kimi.query_ai_general_info("Fe + HCl").kind == "YES"
+        assert server.request_count == 2
+
+        monkeypatch.setattr(kimi, "KIMI_MODEL", "another-model")
+        assert kimi.query_ai_general_info("Fe + HCl").kind == "YES"
+        assert server.request_count == 3
+        assert kimi.query_ai_general_info("Fe + HCl").kind == "YES"
+        assert server.request_count == 3
+    finally:
+        manager.close()
+        server.stop()
@@ -0,0 +1,123 @@
+import json
+
+import pytest
+
+from query_result import (QueryError, ReactionResult, ResultFormatError, SubstanceInfo, from_dict, load_result,
+                          parse_response, to_json)
+
+INFO_TEXT = "INFO***铁是一种银白色金属。***参考链接：https://zh.wikipedia.org/wiki/铁"
+YES_TEXT = "YES***Fe + 2HCl → FeCl₂ + H₂↑***常温***参考链接：https://zh.wikipedia.org/wiki/氯化亚铁***铁被氧化"
+NO_TEXT = "NO***铜的金属活动性排在氢之后，不能置换出氢气。"
+
+
+def test_parse_info():
+    result = parse_response(INFO_TEXT, 1)
+    assert isinstance(result, SubstanceInfo)
+    assert result.kind == "INFO"
+    assert result.description == "铁是一种银白色金属。"
+    assert result.link == "参考链接：https://zh.wikipedia.org/wiki/铁"
+    assert not result.partial
+
+
+def test_parse_yes():
+    result = parse_response(YES_TEXT, 2)
+    assert isinstance(result, ReactionResult)
+    assert result.kind == "YES"
+    assert result.equation == "Fe + 2HCl → FeCl₂ + H₂↑"
+    assert result.conditions == "常温"
+    assert result.mechanism == "铁被氧化"
+
+
+def test_parse_yes_fixes_coefficients():
+    result = parse_response("YES***Fe + HCl → FeCl₂ + H₂↑***常温***链接***机理", 2)
+    assert result.equation == "Fe + 2HCl → FeCl₂ + H₂↑"
+
+
+def test_parse_no():
+    result = parse_response(NO_TEXT, 2)
+    assert result.kind == "NO"
+    assert not result.reacts
+    assert result.reason.startswith("铜的金属活动性")
+
+
+@pytest.mark.parametrize("text, count", [
+    (INFO_TEXT, 2),  # 多物质查询却返回 INFO
+    (YES_TEXT, 1),  # 单物质查询却返回 YES
+    ("抱歉，我无法回答", 2),  # 没有类型
+    ("INFO******", 1),  # 缺少介绍
+    ("NO***", 2),  # 缺少原因
+    ("YES***Fe + HCl → FeCl₃ + O₂***常温***链接***机理", 2),  # 无法配平
+    ("YES***铁和盐酸反应***常温***链接***机理", 2),  # 没有方程式
+])
+def test_parse_rejects_malformed(text, count):
+    with pytest.raises(ResultFormatError):
+        parse_response(text, count)
+
+
+def test_parse_partial():
+    # 流式输出中途：允许缺少字段，不检查方程式
+    result = parse_response("YES***Fe + HCl → Fe", 2, partial=True)
+    assert result.partial
+    assert result.equation == "Fe + HCl → Fe"
+    assert result.conditions == ""
+    assert parse_response("INFO***", 1, partial=True).description == ""
+    assert parse_response("NO", 2, partial=True).reason == ""
+    with pytest.raises(ResultFormatError):
+        parse_response("INFO***", 2, partial=True)
+
+
+@pytest.mark.parametrize("text, count", [(INFO_TEXT, 1), (YES_TEXT, 2), (NO_TEXT, 2)])
+def test_json_round_trip(text, count):
+    result = parse_response(text, count)
+    stored = to_json(result)
+    assert json.loads(stored)["type"] == result.kind
+    loaded = load_result(stored)
+    assert type(loaded) is type(result)
+    assert loaded.to_dict() == result.to_dict()
+    assert to_json(loaded) == stored
+
+
+def test_json_keeps_unicode():
+    assert "铁" in to_json(parse_response(INFO_TEXT, 1))
+
+
+def test_query_error_to_dict():
+    error = QueryError("网络错误")
+    assert error.kind == "ERROR"
+    assert json.loads(to_json(error)) == {"type": "ERROR", "message": "网络错误"}
+
+
+@pytest.mark.parametrize("text, kind", [(INFO_TEXT, "INFO"), (YES_TEXT, "YES"), (NO_TEXT, "NO")])
+def test_load_legacy_text(text, kind):
+    # 旧版本缓存中的 "***" 文本按类型推断物质数量
+    result = load_result(text)
+    assert result.kind == kind
+    assert result.to_dict() == parse_response(text, 1 if kind == "INFO" else 2).to_dict()
+
+
+def test_load_legacy_text_fixes_coefficients():
+    result = load_result("YES***Fe + HCl → FeCl₂ + H₂↑***常温***链接***机理")
+    assert result.equation == "Fe + 2HCl → FeCl₂ + H₂↑"
+
+
+@pytest.mark.parametrize("stored", [
+    '{"type": "YES", "equation": ',  # 截断的 JSON
+    '{"type": "MAYBE"}',  # 未知类型
+    '{"description": "没有类型"}',
+    '{"type": "INFO", "description": ""}',  # 缺少必要字段
+    '{"type": "NO"}',
+    '{"type": "YES", "equation": "Fe + HCl → FeCl₃ + O₂"}',  # 无法配平
+    "抱歉，我无法回答",  # 既不是 JSON 也不是 "***" 格式
+    "YES***",
+])
+def test_load_rejects_malformed(stored):
+    with pytest.raises(ResultFormatError):
+        load_result(stored)
+
+
+def test_from_dict_fills_missing_optional_fields():
+    result = from_dict({"type": "YES", "equation": "2H₂ + O₂ =点燃= 2H₂O"})
+    assert result.reacts
+    assert result.conditions == result.link == result.mechanism == ""
+    info = from_dict({"type": "INFO", "description": "介绍"})
+    assert info.link == ""
@@ -0,0 +1,163 @@
+import threading
+from concurrent.futures import CancelledError
+
+import pytest
+
+from query_service import QueryService
+
+TIMEOUT = 5
+
+
+@pytest.fixture
+def service():
+    service = QueryService(max_workers=2)
+    yield service
+    service.shutdown()
+
+
+class BlockingQuery:
+    """fn(on_partial, cancel_event)：发出一个部分结果后等待 gate，被取消时返回 None"""
+
+    def __init__(self, result="result"):
+        self.result = result
+        self.gate = threading.Event()
+        self.started = threading.Event()
+        self.calls = 0
+        self.cancel_event = None
+
+    def __call__(self, on_partial, cancel_event):
+        self.calls += 1
+        self.cancel_event = cancel_event
+        on_partial("partial")
+        self.started.set()
+        self.gate.wait(TIMEOUT)
+        return None if cancel_event.is_set() else self.result
+
+
+def collect(handle):
+    results = []
+    done = threading.Event()
+
+    def on_done(result):
+        results.append(result)
+        done.set()
+
+    handle.add_done_callback(on_done)
+    return results, done
+
+
+def test_joined_query_runs_once_and_shares_partials(service):
+    query = BlockingQuery()
+    prefetch = service.request("Fe + HCl", query)
+    assert query.started.wait(TIMEOUT)
+
+    partials = []
+    foreground = service.request("Fe + HCl", BlockingQuery(), on_partial=partials.append)
+    # 后加入的调用方先收到最近一次的部分结果
+    assert partials == ["partial"]
+    assert service.inflight_count() == 1
+
+    results, done = collect(foreground)
+    query.gate.set()
+    assert done.wait(TIMEOUT)
+    assert results == ["result"]
+    assert query.calls == 1
+    assert prefetch.done() and foreground.done()
+
+
+def test_foreground_survives_prefetch_cancel(service):
+    query = BlockingQuery()
+    prefetch = service.request("Fe + HCl", query)
+    assert query.started.wait(TIMEOUT)
+    foreground = service.request("Fe + HCl", BlockingQuery())
+    prefetch_results, _ = collect(prefetch)
+    results, done = collect(foreground)
+
+    prefetch.release()
+    assert prefetch.released
+    assert not query.cancel_event.is_set()
+
+    query.gate.set()
+    assert done.wait(TIMEOUT)
+    assert results == ["result"]
+    # release 之后不再回调
+    assert prefetch_results == []
+
+
+def test_last_release_cancels_running_query(service):
+    query = BlockingQuery()
+    first = service.request("Fe + HCl", query)
+    assert query.started.wait(TIMEOUT)
+    second = service.request("Fe + HCl", BlockingQuery())
+
+    first.release()
+    assert not query.cancel_event.is_set()
+    second.release()
+    assert query.cancel_event.is_set()
+    assert service.inflight_count() == 0
+    assert first.wait(0) and second.wait(0)
+
+    # 同一查询再次发起时重新开始，不挂到已取消的查询上
+    retry = BlockingQuery("retried")
+    handle = service.request("Fe + HCl", retry)
+    results, done = collect(handle)
+    retry.gate.set()
+    assert done.wait(TIMEOUT)
+    assert results == ["retried"]
+    query.gate.set()
+
+
+def test_last_release_cancels_queued_future():
+    service = QueryService(max_workers=1)
+    try:
+        busy = BlockingQuery()
+        service.request("busy", busy)
+        assert busy.started.wait(TIMEOUT)
+
+        queued = BlockingQuery()
+        handle = service.request("queued", queued)
+        entry = handle._entry
+        handle.release()
+
+        busy.gate.set()
+        with pytest.raises(CancelledError):
+            entry.future.result(TIMEOUT)
+        assert entry.future.cancelled()
+        assert queued.calls == 0
+    finally:
+        service.shutdown()
+
+
+def test_failed_future_is_not_reused(service):
+    calls = []
+
+    def failing(on_partial, cancel_event):
+        calls.append("failing")
+        raise RuntimeError("网络错误")
+
+    handle = service.request("Fe + HCl", failing)
+    results, done = collect(handle)
+    assert done.wait(TIMEOUT)
+    assert results == [None]
+    assert handle.done()
+    assert service.inflight_count() == 0
+
+    def succeeding(on_partial, cancel_event):
+        calls.append("succeeding")
+        return "result"
+
+    retry = service.request("Fe + HCl", succeeding)
+    assert retry._entry is not handle._entry
+    results, done = collect(retry)
+    assert done.wait(TIMEOUT)
+    assert results == ["result"]
+    assert calls == ["failing", "succeeding"]
+
+
+def test_completed_query_is_not_reused(service):
+    first = service.request("Fe + HCl", lambda on_partial, cancel_event: "first")
+    assert first.wait(TIMEOUT)
+    second = service.request("Fe + HCl", lambda on_partial, cancel_event: "second")
+    results, done = collect(second)
+    assert done.wait(TIMEOUT)
+    assert results == ["second"]
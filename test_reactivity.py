@@ -0,0 +1,137 @@
+import random
+
+import pytest
+
+from reactivity import (NO_REACTION, PROFILES, REACTS, UNCERTAIN, ReactivityIndex, SubstanceSampler,
+                        judge_pair)
+
+SEED = 20240601
+# 小索引：HCl 有 5 个能反应的伙伴（Fe Zn NaOH CaCO3 Mg）和 4 个不反应的伙伴（Cu NaCl KNO3 Ag）
+SMALL = ["HCl", "Fe", "Zn", "NaOH", "CaCO3", "Cu", "NaCl", "KNO3", "Ag", "Mg"]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return ReactivityIndex(list(PROFILES))
+
+
+@pytest.fixture
+def small_index():
+    return ReactivityIndex(SMALL)
+
+
+def test_bitmaps_match_rules(index):
+    for i, a in enumerate(index.substances):
+        reactive = set(index.reactive_partners(a))
+        inert = set(index.inert_partners(a))
+        assert not reactive & inert
+        assert a not in reactive | inert
+        for b in index.substances[i + 1:]:
+            expected = {REACTS: True, NO_REACTION: False, UNCERTAIN: None}[judge_pair(PROFILES[a], PROFILES[b])]
+            assert index.can_react(a, b) is expected
+            assert index.can_react(b, a) is expected
+            assert (b in reactive) == (expected is True)
+            assert (b in inert) == (expected is False)
+
+
+@pytest.mark.parametrize("a, b, expected", [
+    ("Fe", "HCl", True),
+    ("Cu", "HCl", False),
+    ("H₂SO₄", "NaOH", True),
+    ("NaCl", "KNO3", False),
+    ("AgNO₃", "NaCl", True),
+    ("CaCO₃", "HCl", True),
+    ("Fe", "CuSO₄·5H₂O", True),
+    ("HCl", "HCl", None),
+    ("HCl", "不存在的物质", None),
+])
+def test_can_react(index, a, b, expected):
+    assert index.can_react(a, b) is expected
+
+
+def test_index_ignores_unknown_and_duplicate_substances():
+    index = ReactivityIndex(["H₂SO₄", "H2SO4", "Zn", "未知物质"])
+    assert index.substances == ("H2SO4", "Zn")
+    assert "H₂SO₄" in index
+    assert "未知物质" not in index
+    assert index.reactive_partners("未知物质") == []
+    assert index.activity("Zn") is not None
+    assert index.activity("H2SO4") is None
+
+
+def test_reactant_list_mix(index):
+    sampler = SubstanceSampler(index, rng=random.Random(SEED))
+    for center in sampler.center_candidates:
+        for _ in range(3):
+            reactants = sampler.reactant_list(center)
+            assert len(reactants) == 6
+            assert len(set(reactants)) == 6
+            assert center not in reactants
+            outcomes = [index.can_react(center, r) for r in reactants]
+            assert outcomes.count(True) == 4
+            assert outcomes.count(False) == 2
+
+
+def test_reactant_list_prefers_fresh_then_falls_back_to_recent(small_index):
+    sampler = SubstanceSampler(small_index, rng=random.Random(SEED))
+    reactive_pool = set(small_index.reactive_partners("HCl"))
+    inert_pool = set(small_index.inert_partners("HCl"))
+    assert (len(reactive_pool), len(inert_pool)) == (5, 4)
+
+    first = set(sampler.reactant_list("HCl"))
+    second = set(sampler.reactant_list("HCl"))
+    # 第二轮先选上一轮没出现过的：剩下的 1 个能反应的和 2 个不反应的，不足部分从最近出现过的里补齐
+    assert reactive_pool - first <= second
+    assert inert_pool - first <= second
+    assert second & inert_pool == inert_pool - first
+    assert len(second & reactive_pool) == 4
+    assert len(second) == 6
+
+
+def test_reactant_list_when_bucket_runs_short(small_index):
+    # 不反应的伙伴只有 4 个，凑不出 3 个能反应 + 5 个不反应
+    sampler = SubstanceSampler(small_index, reactive=3, inert=5, rng=random.Random(SEED))
+    assert sampler.reactant_list("HCl") is None
+    assert sampler.center_candidates == []
+    # 能反应的伙伴只有 1 个
+    assert SubstanceSampler(small_index, rng=random.Random(SEED)).reactant_list("Fe") is None
+    assert SubstanceSampler(small_index, rng=random.Random(SEED)).reactant_list("不存在的物质") is None
+
+
+def test_center_list_rotates_through_candidates(index):
+    sampler = SubstanceSampler(index, rng=random.Random(SEED))
+    assert len(sampler.center_candidates) >= 2 * sampler.count
+    first = sampler.center_list()
+    second = sampler.center_list()
+    assert len(first) == len(set(first)) == 6
+    assert len(second) == len(set(second)) == 6
+    assert not set(first) & set(second)
+    assert set(first) | set(second) <= set(sampler.center_candidates)
+
+
+def test_center_list_covers_several_categories(index):
+    sampler = SubstanceSampler(index, rng=random.Random(SEED))
+    categories = {index.category(s) for s in sampler.center_list()}
+    available = {index.category(s) for s in sampler.center_candidates}
+    assert len(categories) == min(6, len(available))
+
+
+def test_center_list_falls_back_to_recent_when_short(small_index):
+    sampler = SubstanceSampler(small_index, count=4, reactive=1, inert=2, rng=random.Random(SEED))
+    candidates = set(sampler.center_candidates)
+    assert len(candidates) == 6
+    first = sampler.center_list()
+    second = sampler.center_list()
+    assert set(first) <= candidates and set(second) <= candidates
+    assert len(second) == len(set(second)) == 4
+    # 先用上一轮没出现过的，再用出现过的补齐
+    assert candidates - set(first) <= set(second)
+
+
+def test_seeded_sampler_is_deterministic(index):
+    runs = []
+    for _ in range(2):
+        sampler = SubstanceSampler(index, rng=random.Random(SEED))
+        centers = sampler.center_list()
+        runs.append((centers, [sampler.reactant_list(c) for c in centers]))
+    assert runs[0] == runs[1]
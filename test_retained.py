@@ -0,0 +1,157 @@
+"""RetainedScreen：控件只在 key 变化时重画，present() 只提交变化过的矩形"""
+import os
+
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame  # noqa: E402
+
+from retained import RetainedScreen  # noqa: E402
+
+SIZE = (200, 100)
+BACKGROUND = (240, 248, 255)
+WIDGET = pygame.Rect(10, 10, 40, 20)
+
+
+class DisplayCalls:
+    def __init__(self):
+        self.flips = 0
+        self.updates = []
+
+    def flip(self):
+        self.flips += 1
+
+    def update(self, rects):
+        self.updates.append([pygame.Rect(rect) for rect in rects])
+
+
+@pytest.fixture
+def display(monkeypatch):
+    pygame.display.init()
+    calls = DisplayCalls()
+    monkeypatch.setattr(pygame.display, "flip", calls.flip)
+    monkeypatch.setattr(pygame.display, "update", calls.update)
+    return calls
+
+
+@pytest.fixture
+def view(display):
+    target = pygame.display.set_mode(SIZE)
+    view = RetainedScreen(target)
+    view.reset(lambda surface: surface.fill(BACKGROUND))
+    return view
+
+
+class Widget:
+    def __init__(self, color):
+        self.color = color
+        self.draws = 0
+
+    def draw(self, surface):
+        self.draws += 1
+        surface.fill(self.color, WIDGET)
+
+
+def test_first_present_flips_whole_screen(view, display):
+    view.present()
+    assert display.flips == 1 and display.updates == []
+    assert view.target.get_at((100, 50))[:3] == BACKGROUND
+
+    # 之后没有变化时什么都不提交
+    view.begin_frame()
+    view.present()
+    assert display.flips == 1 and display.updates == []
+
+
+def test_update_widget_redraws_only_when_key_changes(view, display):
+    view.present()
+    widget = Widget((255, 0, 0))
+
+    assert view.update_widget("button", WIDGET, ("开始", False), widget.draw)
+    assert not view.update_widget("button", WIDGET, ("开始", False), widget.draw)
+    assert widget.draws == 1
+    view.present()
+    assert display.updates == [[WIDGET]]
+    assert view.target.get_at(WIDGET.center)[:3] == (255, 0, 0)
+
+    # 悬停状态变化：重画一次，只提交该控件的矩形
+    widget.color = (0, 0, 255)
+    view.begin_frame()
+    assert view.update_widget("button", WIDGET, ("开始", True), widget.draw)
+    view.present()
+    assert widget.draws == 2
+    assert display.updates[-1] == [WIDGET]
+    assert view.target.get_at(WIDGET.center)[:3] == (0, 0, 255)
+
+    # 没有变化的帧不提交任何矩形
+    view.begin_frame()
+    view.update_widget("button", WIDGET, ("开始", True), widget.draw)
+    view.present()
+    assert len(display.updates) == 2
+
+
+def test_widget_is_erased_with_base_before_redraw(view, display):
+    view.update_widget("label", WIDGET, 1, lambda surface: surface.fill((0, 0, 0), WIDGET))
+    # 新的内容只画了控件的一部分，其余部分应恢复为背景
+    half = WIDGET.inflate(-20, 0)
+    view.update_widget("label", WIDGET, 2, lambda surface: surface.fill((0, 255, 0), half))
+    assert view.target.get_at(half.center)[:3] == (0, 255, 0)
+    assert view.target.get_at(WIDGET.topleft)[:3] == BACKGROUND
+
+
+def test_overlay_is_erased_next_frame(view, display):
+    view.present()
+    widget = Widget((255, 0, 0))
+    view.update_widget("button", WIDGET, 1, widget.draw)
+    view.present()
+
+    # 光标画在控件上方
+    cursor = pygame.Rect(20, 15, 10, 10)
+    view.begin_frame()
+    view.target.fill((0, 0, 0), cursor)
+    view.overlay(cursor)
+    view.present()
+    assert display.updates[-1] == [cursor]
+
+    # 下一帧光标移走：旧位置用 static 层（含控件）擦除，提交旧位置和新位置
+    moved = pygame.Rect(150, 60, 10, 10)
+    view.begin_frame()
+    assert view.target.get_at(cursor.center)[:3] == (255, 0, 0)
+    view.target.fill((0, 0, 0), moved)
+    view.overlay(moved)
+    view.present()
+    assert display.updates[-1] == [cursor, moved]
+
+    # 光标消失：只提交擦除的区域，之后不再提交
+    view.begin_frame()
+    view.present()
+    assert display.updates[-1] == [moved]
+    assert view.target.get_at(moved.center)[:3] == BACKGROUND
+    count = len(display.updates)
+    view.begin_frame()
+    view.present()
+    assert len(display.updates) == count
+    assert widget.draws == 1
+
+
+def test_overlay_is_clipped_to_screen(view, display):
+    view.present()
+    view.begin_frame()
+    view.overlay(None)
+    view.overlay((SIZE[0] + 10, 0, 20, 20))
+    view.overlay((SIZE[0] - 5, SIZE[1] - 5, 20, 20))
+    view.present()
+    assert display.updates == [[pygame.Rect(SIZE[0] - 5, SIZE[1] - 5, 5, 5)]]
+
+
+def test_reset_forgets_widgets_and_flips_again(view, display):
+    widget = Widget((255, 0, 0))
+    view.update_widget("button", WIDGET, 1, widget.draw)
+    view.present()
+    view.reset(lambda surface: surface.fill((0, 0, 0)))
+    assert view.update_widget("button", WIDGET, 1, widget.draw)
+    view.present()
+    assert display.flips == 2
+    assert display.updates == []
@@ -0,0 +1,151 @@
+import unicodedata
+
+import pytest
+
+from text_layout import NO_LINE_END, NO_LINE_START, layout_lines, wrap_text
+
+
+class FakeFont:
+    """等宽字体的替身：全角字符 20 像素，其余 10 像素"""
+
+    def size(self, text):
+        return sum(20 if unicodedata.east_asian_width(c) in ("W", "F") else 10 for c in text), 20
+
+
+def legacy_wrap_text(font, text, max_width):
+    """text_layout 之前 main.py 中的 wrap_text，作为对照"""
+    if not text:
+        return []
+
+    lines = []
+    current_line = ""
+    segments = text.split(' ') if ' ' in text else list(text)
+
+    for segment in segments:
+        if current_line:
+            test_line = current_line + (" " if ' ' in text else "") + segment
+        else:
+            test_line = segment
+
+        if font.size(test_line)[0] <= max_width:
+            current_line = test_line
+        elif not current_line:
+            temp_line = ""
+            for char in segment:
+                if font.size(temp_line + char)[0] <= max_width:
+                    temp_line += char
+                else:
+                    lines.append(temp_line)
+                    temp_line = char
+            if temp_line:
+                current_line = temp_line
+        else:
+            lines.append(current_line.strip())
+            current_line = segment
+
+    if current_line.strip():
+        lines.append(current_line.strip())
+
+    return lines
+
+
+FONT = FakeFont()
+
+# (文本, 最大宽度, 新的换行结果, 旧算法的换行结果)
+GOLDEN = {
+    "latin": (
+        "The quick brown fox jumps over the lazy dog near the river bank", 150,
+        ["The quick brown", "fox jumps over", "the lazy dog", "near the river", "bank"],
+        ["The quick brown", "fox jumps over", "the lazy dog", "near the river", "bank"],
+    ),
+    "cjk": (
+        "铁与稀盐酸反应生成氯化亚铁和氢气溶液由无色变为浅绿色", 200,
+        ["铁与稀盐酸反应生成氯", "化亚铁和氢气溶液由无", "色变为浅绿色"],
+        ["铁与稀盐酸反应生成氯", "化亚铁和氢气溶液由无", "色变为浅绿色"],
+    ),
+    "cjk_punctuation_fits": (
+        "铁片表面产生气泡，溶液逐渐变为浅绿色。反应放出热量，试管外壁发烫。", 200,
+        ["铁片表面产生气泡，溶", "液逐渐变为浅绿色。反", "应放出热量，试管外壁", "发烫。"],
+        ["铁片表面产生气泡，溶", "液逐渐变为浅绿色。反", "应放出热量，试管外壁", "发烫。"],
+    ),
+    # 避头尾：逗号、句号不出现在行首，开引号不出现在行尾
+    "cjk_line_start": (
+        "铁片表面产生气泡，溶液逐渐变为浅绿色。反应放出热量。", 160,
+        ["铁片表面产生气", "泡，溶液逐渐变为", "浅绿色。反应放出", "热量。"],
+        ["铁片表面产生气泡", "，溶液逐渐变为浅", "绿色。反应放出热", "量。"],
+    ),
+    "cjk_line_end": (
+        "生成的沉淀为“氢氧化铜”，呈蓝色絮状。", 140,
+        ["生成的沉淀为", "“氢氧化铜”，呈", "蓝色絮状。"],
+        ["生成的沉淀为“", "氢氧化铜”，呈", "蓝色絮状。"],
+    ),
+    # 中英混排：旧算法遇到空格就只按空格断行，英文单词会被拆开
+    "mixed": (
+        "铁（Fe）与稀盐酸（HCl）反应，生成 FeCl₂ 和 H₂ 气体，属于置换反应。", 200,
+        ["铁（Fe）与稀盐酸", "（HCl）反应，生成", "FeCl₂ 和 H₂ 气体，属", "于置换反应。"],
+        ["铁（Fe）与稀盐酸（HC", "l）反应，生成 FeCl₂", "和 H₂", "气体，属于置换反应。"],
+    ),
+    # URL 只在分隔符之后断行
+    "url": (
+        "参考链接：https://zh.wikipedia.org/wiki/%E6%B0%AF%E5%8C%96%E4%BA%9A%E9%93%81?action=view", 200,
+        ["参考链接：https://", "zh.wikipedia.org/", "wiki/%E6%B0%AF%E5%8C", "%96%E4%BA%9A%E9%93%8", "1?action=view"],
+        ["参考链接：https://zh", ".wikipedia.org/wiki/", "%E6%B0%AF%E5%8C%96%E", "4%BA%9A%E9%93%81?act", "ion=view"],
+    ),
+    # 旧算法在有空格的文本里不拆长 URL，整行超出宽度
+    "url_in_latin": (
+        "See https://example.com/chemistry/reactions/iron-and-hydrochloric-acid for details", 200,
+        ["See https://example.", "com/chemistry/", "reactions/iron-and-", "hydrochloric-acid", "for details"],
+        ["See", "https://example.com/chemistry/reactions/iron-and-hydrochloric-acid", "for details"],
+    ),
+    "newline": (
+        "第一行\n第二行比较长需要换行才能显示完整", 120,
+        ["第一行", "第二行比较长", "需要换行才能", "显示完整"],
+        ["第一行\n第二", "行比较长需要", "换行才能显示", "完整"],
+    ),
+}
+
+
+@pytest.mark.parametrize("name", list(GOLDEN))
+def test_golden_output(name):
+    text, width, expected, legacy = GOLDEN[name]
+    assert wrap_text(FONT, text, width) == expected
+    assert legacy_wrap_text(FONT, text, width) == legacy
+
+
+@pytest.mark.parametrize("name", ["latin", "cjk", "cjk_punctuation_fits"])
+def test_same_as_legacy_when_no_rule_applies(name):
+    text, width, _, _ = GOLDEN[name]
+    assert wrap_text(FONT, text, width) == legacy_wrap_text(FONT, text, width)
+
+
+@pytest.mark.parametrize("name", list(GOLDEN))
+def test_lines_fit_and_keep_all_characters(name):
+    text, width, _, _ = GOLDEN[name]
+    lines = wrap_text(FONT, text, width)
+    assert all(FONT.size(line)[0] <= width for line in lines)
+    # 只丢掉断行处的空白，不丢字符
+    assert "".join("".join(line.split()) for line in lines) == "".join(text.split())
+
+
+@pytest.mark.parametrize("name", ["cjk_punctuation_fits", "cjk_line_start", "cjk_line_end", "mixed"])
+def test_line_start_and_end_rules(name):
+    text, width, _, _ = GOLDEN[name]
+    for line in wrap_text(FONT, text, width):
+        assert line[0] not in NO_LINE_START
+        assert line[-1] not in NO_LINE_END
+
+
+def test_offsets_map_back_to_text():
+    text = GOLDEN["mixed"][0]
+    lines = layout_lines(FONT, text, 200)
+    assert [text[start:end] for start, end in lines] == wrap_text(FONT, text, 200)
+    assert all(a[1] <= b[0] for a, b in zip(lines, lines[1:]))
+
+
+def test_long_word_is_broken_between_characters():
+    assert wrap_text(FONT, "Supercalifragilistic", 80) == ["Supercal", "ifragili", "stic"]
+
+
+def test_empty_text():
+    assert wrap_text(FONT, "", 100) == []
+    assert wrap_text(FONT, "   ", 100) == []
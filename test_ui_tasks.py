@@ -0,0 +1,131 @@
+"""UiTaskRunner 通过 pygame 事件把后台结果交回界面线程；已被取代的界面代数的结果被丢弃"""
+import os
+import threading
+import time
+
+import pytest
+
+# 与 ui_driver.py 的无界面模式相同：SDL dummy 驱动，不需要显示器
+os.environ["CHEM_HEADLESS"] = "1"
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame  # noqa: E402
+
+from query_service import QueryService  # noqa: E402
+from ui_tasks import TASK_DONE_EVENT, TASK_PARTIAL_EVENT, UiTaskRunner  # noqa: E402
+
+TIMEOUT = 5
+
+
+@pytest.fixture(autouse=True)
+def event_queue():
+    pygame.display.init()
+    pygame.event.clear()
+    yield
+    pygame.event.clear()
+
+
+@pytest.fixture
+def runner():
+    runner = UiTaskRunner(max_workers=2)
+    yield runner
+    runner.shutdown()
+
+
+def wait_events(event_type, count=1):
+    events = []
+    deadline = time.monotonic() + TIMEOUT
+    while len(events) < count and time.monotonic() < deadline:
+        events.extend(pygame.event.get(event_type))
+        time.sleep(0.01)
+    return events
+
+
+def test_submit_posts_done_event(runner):
+    runner.submit("sum", 3, sum, [1, 2, 3])
+    event, = wait_events(TASK_DONE_EVENT)
+    assert (event.tag, event.generation, event.result) == ("sum", 3, 6)
+
+
+def test_failed_task_posts_none(runner):
+    def fail():
+        raise RuntimeError("打开链接失败")
+
+    runner.submit("open_link", 1, fail)
+    event, = wait_events(TASK_DONE_EVENT)
+    assert event.tag == "open_link" and event.result is None
+
+
+def test_runner_is_bounded(runner):
+    gate = threading.Event()
+    for i in range(5):
+        runner.submit("slow", i, gate.wait, TIMEOUT)
+    assert runner.pending_count() == 5
+    gate.set()
+    events = wait_events(TASK_DONE_EVENT, 5)
+    assert sorted(event.generation for event in events) == list(range(5))
+    assert len(runner._executor._threads) <= 2
+    deadline = time.monotonic() + TIMEOUT
+    while runner.pending_count() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert runner.pending_count() == 0
+
+
+def test_watch_and_partial_poster():
+    service = QueryService(max_workers=1)
+    gate = threading.Event()
+    try:
+        def query(on_partial, cancel_event):
+            on_partial("第一段")
+            gate.wait(TIMEOUT)
+            return "结果"
+
+        handle = service.request("Fe + HCl", query, on_partial=UiTaskRunner.partial_poster("reaction_info", 7))
+        UiTaskRunner.watch("reaction_info", 7, handle)
+        partial, = wait_events(TASK_PARTIAL_EVENT)
+        assert (partial.tag, partial.generation, partial.result) == ("reaction_info", 7, "第一段")
+        gate.set()
+        done, = wait_events(TASK_DONE_EVENT)
+        assert (done.tag, done.generation, done.result) == ("reaction_info", 7, "结果")
+    finally:
+        service.shutdown()
+
+
+def test_released_handle_posts_nothing():
+    service = QueryService(max_workers=1)
+    gate = threading.Event()
+    try:
+        handle = service.request("Fe + HCl", lambda on_partial, cancel_event: gate.wait(TIMEOUT) and "结果")
+        UiTaskRunner.watch("reaction_info", 1, handle)
+        handle.release()
+        gate.set()
+        time.sleep(0.1)
+        assert pygame.event.get(TASK_DONE_EVENT) == []
+    finally:
+        service.shutdown()
+
+
+def test_superseded_generation_is_dropped(runner):
+    pytest.importorskip("httpx")
+    pytest.importorskip("openai")
+    pytest.importorskip("dotenv")
+    from main import GameState
+
+    game_state = GameState(None)
+    old_generation = game_state.supersede()
+    gate = threading.Event()
+    runner.submit("reaction_info", old_generation, gate.wait, TIMEOUT)
+
+    # 用户离开了界面：旧任务的结果到达时已被取代
+    new_generation = game_state.supersede()
+    runner.submit("reaction_info", new_generation, lambda: "新结果")
+    gate.set()
+    events = wait_events(TASK_DONE_EVENT, 2)
+    assert len(events) == 2
+
+    current = [event for event in events if game_state.is_task_event(event, "reaction_info")]
+    assert [event.result for event in current] == ["新结果"]
+    # tag 或事件类型不符的事件也不属于当前界面
+    assert not any(game_state.is_task_event(event, "reactants") for event in events)
+    assert not any(game_state.is_task_event(event, "reaction_info", TASK_PARTIAL_EVENT) for event in events)
@@ -0,0 +1,128 @@
+"""
+文本排版：按最大宽度换行。
+
+每个字体的单字符宽度只测量一次并缓存，换行时用前缀和计算任意一段文本的宽度，
+整段排版是线性复杂度。支持中英文混排：中文字符之间可以断行，英文单词只在空格处断行，
+URL 可以在 "/" 等分隔符后断行，并遵守常见的中文避头尾规则（标点不出现在行首等）。
+排版结果以字符偏移返回，调用方可以精确地把链接等区间映射到各行。
+"""
+import re
+import unicodedata
+from itertools import accumulate
+
+# 不能出现在行首的字符（闭合标点等）
+NO_LINE_START = frozenset("，。、；：？！）》」』】〉〕”’…—%,.;:?!)]}>·")
+# 不能出现在行尾的字符（开括号等）
+NO_LINE_END = frozenset("（《「『【〈〔“‘([{<")
+
+_URL_PATTERN = re.compile(r"https?://[^\s|]+")
+_URL_BREAK_AFTER = frozenset("/?&#=-_.")
+
+_advance_cache = {}
+
+
+def glyph_advance(font, char):
+    """单个字符的步进宽度，按字体缓存"""
+    advances = _advance_cache.get(font)
+    if advances is None:
+        advances = _advance_cache[font] = {}
+    advance = advances.get(char)
+    if advance is None:
+        advance = advances[char] = font.size(char)[0]
+    return advance
+
+
+def _is_wide(char):
+    return unicodedata.east_asian_width(char) in ("W", "F")
+
+
+def _break_opportunities(text):
+    """
+    返回 allowed 列表：allowed[i] 为 True 表示可以在 text[i] 之前断行。
+    """
+    n = len(text)
+    allowed = [False] * (n + 1)
+    in_url = [False] * n
+    for match in _URL_PATTERN.finditer(text):
+        for i in range(match.start(), match.end()):
+            in_url[i] = True
+
+    for i in range(1, n):
+        prev_char, char = text[i - 1], text[i]
+        if prev_char.isspace() and not char.isspace():
+            allowed[i] = True
+            continue
+        if char.isspace():
+            continue
+
+        if in_url[i - 1] and in_url[i]:
+            allowed[i] = prev_char in _URL_BREAK_AFTER
+        elif _is_wide(prev_char) or _is_wide(char):
+            allowed[i] = True
+
+        # 避头尾规则
+        if allowed[i] and (char in NO_LINE_START or prev_char in NO_LINE_END):
+            allowed[i] = False
+
+    return allowed
+
+
+def layout_lines(font, text, max_width):
+    """
+    把 text 按 max_width 换行，返回每行的 (起始偏移, 结束偏移)，结束偏移不含行尾空白。
+    换行符 "\\n" 强制换行；单个词比一行还宽时在字符间强制断开。
+    """
+    if not text:
+        return []
+
+    n = len(text)
+    positions = [0] + list(accumulate(glyph_advance(font, c) for c in text))
+    allowed = _break_opportunities(text)
+    lines = []
+
+    def emit(start, end):
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if end > start:
+            lines.append((start, end))
+
+    line_start = 0
+    last_break = None
+    i = 0
+    while i < n:
+        char = text[i]
+
+        if char == "\n":
+            emit(line_start, i)
+            line_start, last_break = i + 1, None
+            i += 1
+            continue
+
+        # 行首的空白直接跳过
+        if i == line_start and char.isspace():
+            line_start += 1
+            i += 1
+            continue
+
+        if i > line_start and allowed[i]:
+            last_break = i
+
+        if not char.isspace() and positions[i + 1] - positions[line_start] > max_width and i > line_start:
+            if last_break is not None and last_break > line_start:
+                break_at = last_break
+            else:
+                break_at = i
+            emit(line_start, break_at)
+            line_start, last_break = break_at, None
+            i = break_at
+            continue
+
+        i += 1
+
+    emit(line_start, n)
+    return lines
+
+
+def wrap_text(font, text, max_width):
+    """将文本根据最大宽度进行换行，返回各行文本"""
+    return [text[start:end] for start, end in layout_lines(font, text, max_width)]
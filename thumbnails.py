@@ -0,0 +1,116 @@
+"""
+物质图片的缩略图缓存。
+
+images/ 中的原图有 1~2.7 MB，每次解码再缩放到 100x100 会让界面卡顿数百毫秒。
+这里把缩放后的小图保存到缓存目录，运行时只解码小图；
+原图的修改时间或内容哈希变化时自动重新生成。
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import pygame
+
+
+class ThumbnailCache:
+    def __init__(self, cache_dir, size=(100, 100)):
+        self.cache_dir = cache_dir
+        self.size = size
+        self._index_path = os.path.join(cache_dir, "index.json")
+        self._lock = threading.Lock()
+        self._index = {}
+
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                self._index = json.load(f)
+        except (OSError, ValueError):
+            self._index = {}
+
+    def _thumb_path(self, source_path):
+        stem = os.path.splitext(os.path.basename(source_path))[0]
+        return os.path.join(self.cache_dir, f"{stem}_{self.size[0]}x{self.size[1]}.png")
+
+    @staticmethod
+    def _file_hash(path):
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+
+    def _save_index(self):
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self._index_path)
+
+    def load(self, source_path):
+        """
+        返回 source_path 对应的缩略图 Surface（未做 convert_alpha，可在后台线程调用），
+        原图不存在或无法解码时返回 None。
+        """
+        try:
+            stat = os.stat(source_path)
+        except OSError:
+            return None
+
+        thumb_path = self._thumb_path(source_path)
+        key = os.path.basename(thumb_path)
+
+        # 锁只保护索引的读写，哈希、解码和缩放都在锁外进行，多个预加载线程可以并行
+        with self._lock:
+            entry = dict(self._index.get(key) or {})
+
+        digest = None
+        if entry and os.path.exists(thumb_path):
+            fresh = entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size
+            if not fresh:
+                # 修改时间变了但内容没变（例如重新拷贝），只更新记录
+                digest = self._file_hash(source_path)
+                fresh = entry["sha1"] == digest
+                if fresh:
+                    self._update_index(key, stat, digest)
+
+            if fresh:
+                thumb = self._load_thumb(thumb_path)
+                if thumb is not None:
+                    return thumb
+
+        if digest is None:
+            digest = self._file_hash(source_path)
+
+        try:
+            image = pygame.transform.scale(pygame.image.load(source_path), self.size)
+        except pygame.error as e:
+            logging.warning(f"无法解码图片 {source_path}: {e}")
+            return None
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # 先写临时文件再替换，同时生成同一张缩略图的线程不会读到写了一半的文件
+            tmp_path = f"{os.path.splitext(thumb_path)[0]}.{threading.get_ident()}.tmp.png"
+            pygame.image.save(image, tmp_path)
+            os.replace(tmp_path, thumb_path)
+        except (OSError, pygame.error) as e:
+            logging.warning(f"无法写入缩略图缓存 {thumb_path}: {e}")
+        else:
+            self._update_index(key, stat, digest)
+
+        return image
+
+    def _load_thumb(self, thumb_path):
+        try:
+            return pygame.image.load(thumb_path)
+        except pygame.error as e:
+            logging.warning(f"缩略图损坏，将重新生成 {thumb_path}: {e}")
+            return None
+
+    def _update_index(self, key, stat, digest):
+        with self._lock:
+            self._index[key] = {"mtime": stat.st_mtime_ns, "size": stat.st_size, "sha1": digest}
+            self._try_save_index()
+
+    def _try_save_index(self):
+        try:
+            self._save_index()
+        except OSError as e:
+            logging.warning(f"无法写入缩略图索引: {e}")
@@ -0,0 +1,291 @@
+"""
+无界面模式下用脚本驱动 ChemistryLearner，并统计每个界面的帧时间。
+
+SDL 使用 dummy 驱动，不需要显示器；手势输入由脚本注入（光标位置、握拳、张开手掌、双手），
+键盘和鼠标操作作为 pygame 事件投递。配合替身 AI 服务器（stub_ai_server.py）可以在没有网络的
+机器上反复走完 load_center_substances → ... → reaction_info 的整个流程做压测：
+
+    python ui_driver.py
+    python ui_driver.py --stub-ai --ai-lists --repeat 20
+    python ui_driver.py --script flow.json --source landmarks:sessions/demo.landmarks.jsonl
+
+脚本是 JSON 列表，每一步是下列之一：
+    {"wait_state": "playing", "timeout": 10}   等待进入某个界面
+    {"wait_idle": true, "timeout": 30}         等待 AI 查询结束
+    {"cursor": [x, y]} / {"cursor": null}      移动 / 移走手势光标
+    {"fist": 3} {"palm": 2} {"two_hands": 8}   保持该手势若干帧
+    {"frames": 5}                              空等若干帧
+    {"key": "escape"}                          按键（pygame 按键名）
+    {"text": "Fe + HCl"}                       逐字输入
+    {"click": [x, y]}                          鼠标左键点击
+    {"quit": true}                             退出
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+from gestures import HandFrame, percentile
+
+WIDTH, HEIGHT = 1400, 800
+
+# 默认脚本：选中心物质 → 选反应物 → 查看报告 → 清除/双手返回 → 手动查询 → 返回，结束时回到 select_center
+DEFAULT_SCRIPT = [
+    {"wait_state": "select_center", "timeout": 30},
+    {"frames": 5},
+    # 握拳选择第一个中心物质
+    {"cursor": [210, 290]},
+    {"frames": 3},
+    {"fist": 3},
+    {"cursor": None},
+    {"wait_state": "playing", "timeout": 30},
+    {"frames": 5},
+    # 鼠标点击第一个反应物
+    {"click": [600, 230]},
+    {"wait_state": "reaction_info", "timeout": 5},
+    {"wait_idle": True, "timeout": 60},
+    {"key": "down"},
+    {"frames": 5},
+    {"key": "up"},
+    {"key": "escape"},
+    {"wait_state": "playing", "timeout": 5},
+    {"cursor": [700, 400]},
+    {"palm": 2},
+    # 双手返回选择中心物质
+    {"two_hands": 8},
+    {"cursor": None},
+    {"wait_state": "select_center", "timeout": 30},
+    # 手动查询默认内容
+    {"click": [WIDTH - 150, HEIGHT - 85]},
+    {"wait_state": "manual_search", "timeout": 5},
+    {"click": [WIDTH // 2 - 100, HEIGHT // 2 - 25]},
+    {"key": "return"},
+    {"wait_state": "reaction_info", "timeout": 5},
+    {"wait_idle": True, "timeout": 60},
+    {"key": "escape"},
+    {"wait_state": "manual_search", "timeout": 5},
+    {"key": "escape"},
+    {"wait_state": "select_center", "timeout": 5},
+]
+
+
+class ScriptedHandDetector:
+    """
+    HandDetector 的替身：不打开摄像头也不推理，手势状态由脚本直接设置。
+    poll() 每次都返回一帧新的结果，cap.latest_frame() 返回一张空白画面。
+    """
+
+    def __init__(self, frame_size=(640, 480)):
+        self.cap = self
+        self.hand_pos = None
+        self.is_fist = False
+        self.is_palm_open = False
+        self.two_hands = False
+        self._frame = np.zeros((frame_size[1], frame_size[0], 3), dtype=np.uint8)
+        self._seq = 0
+
+    def latest_frame(self):
+        return self._seq, self._frame
+
+    def poll(self):
+        self._seq += 1
+        hand_frame = HandFrame(self._frame, self.hand_pos, self.is_fist, self.is_palm_open, self.two_hands,
+                               seq=self._seq)
+        hand_frame.timestamp = time.time()
+        return hand_frame
+
+    def release(self):
+        pass
+
+
+class FrameStats:
+    """按界面（game_state.state）统计帧时间"""
+
+    def __init__(self):
+        self.frame_times = {}
+        self._last = None
+        self._last_state = None
+
+    def frame(self, state):
+        now = time.perf_counter()
+        if self._last is not None:
+            # 上一帧的耗时记在上一帧所在的界面上
+            self.frame_times.setdefault(self._last_state, []).append((now - self._last) * 1000)
+        self._last = now
+        self._last_state = state
+
+    def report(self):
+        lines = [f"{'screen':<24} {'frames':>7} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}"]
+        for state, times in self.frame_times.items():
+            times = sorted(times)
+            lines.append(f"{state:<24} {len(times):>7} {sum(times) / len(times):>8.2f} {percentile(times, 50):>8.2f} "
+                         f"{percentile(times, 95):>8.2f} {times[-1]:>8.2f}")
+        return "\n".join(lines)
+
+
+class ScriptDriver:
+    """
+    作为 ChemistryLearner 的 frame_hook 在每帧开始时执行脚本：
+    立即完成的步骤（按键、点击、移动光标）在同一帧内连续执行，等待类步骤跨越多帧。
+    """
+
+    HOLD_GESTURES = ("fist", "palm", "two_hands")
+
+    def __init__(self, script, hand=None, repeat=1):
+        self.script = script
+        self.hand = hand
+        self.repeat = repeat
+        self.stats = FrameStats()
+        self.iterations = 0
+        self.failed = None
+        self._index = 0
+        self._hold = None  # (手势名, 剩余帧数)
+        self._deadline = None
+
+    def __call__(self, learner):
+        import pygame
+
+        self.stats.frame(learner.game_state.state)
+        while learner.running:
+            if self._index >= len(self.script):
+                self.iterations += 1
+                if self.iterations >= self.repeat:
+                    pygame.event.post(pygame.event.Event(pygame.QUIT))
+                    return
+                self._index = 0
+            if not self._run_step(learner, self.script[self._index]):
+                return
+            self._index += 1
+            self._deadline = None
+
+    def _run_step(self, learner, step):
+        """执行一步，返回该步是否已完成"""
+        import pygame
+
+        game_state = learner.game_state
+        if "wait_state" in step or "wait_idle" in step:
+            if self._deadline is None:
+                self._deadline = time.monotonic() + step.get("timeout", 30)
+            if "wait_state" in step:
+                done = game_state.state == step["wait_state"]
+            else:
+                done = game_state.state != "reaction_info" or not game_state.is_querying
+            if not done and time.monotonic() > self._deadline:
+                self.failed = f"第 {self._index} 步超时: {step}（当前界面 {game_state.state}）"
+                logging.error(self.failed)
+                pygame.event.post(pygame.event.Event(pygame.QUIT))
+                learner.running = False
+            return done
+
+        for gesture in self.HOLD_GESTURES + ("frames",):
+            if gesture in step:
+                return self._hold_gesture(gesture, step[gesture])
+
+        if "cursor" in step:
+            if self.hand is not None:
+                self.hand.hand_pos = tuple(step["cursor"]) if step["cursor"] else None
+        elif "key" in step:
+            key = pygame.key.key_code(step["key"])
+            pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=key, unicode="", mod=0, scancode=0))
+            pygame.event.post(pygame.event.Event(pygame.KEYUP, key=key, unicode="", mod=0, scancode=0))
+        elif "text" in step:
+            for char in step["text"]:
+                pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=0, unicode=char, mod=0, scancode=0))
+        elif "click" in step:
+            pos = tuple(step["click"])
+            pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=pos, button=1))
+            pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONUP, pos=pos, button=1))
+        elif step.get("quit"):
+            pygame.event.post(pygame.event.Event(pygame.QUIT))
+        else:
+            raise ValueError(f"无法识别的脚本步骤: {step}")
+        return True
+
+    def _hold_gesture(self, gesture, frames):
+        if self._hold is None:
+            self._hold = (gesture, frames)
+            self._set_gesture(gesture, True)
+        name, remaining = self._hold
+        if remaining <= 0:
+            self._set_gesture(name, False)
+            self._hold = None
+            return True
+        self._hold = (name, remaining - 1)
+        return False
+
+    def _set_gesture(self, gesture, value):
+        if self.hand is None or gesture == "frames":
+            return
+        if gesture == "fist":
+            self.hand.is_fist = value
+        elif gesture == "palm":
+            self.hand.is_palm_open = value
+        elif gesture == "two_hands":
+            self.hand.two_hands = value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="无界面模式下用脚本驱动 ChemistryLearner")
+    parser.add_argument("--script", default=None, help="脚本文件（JSON 列表），缺省时使用内置的完整流程")
+    parser.add_argument("--repeat", type=int, default=1, help="脚本重复次数")
+    parser.add_argument("--fps", type=int, default=0, help="帧率上限，0 表示不限制")
+    parser.add_argument("--source", default=None,
+                        help="改用真实的手势管线和给定的画面来源（见 frame_sources），脚本中的手势步骤被忽略")
+    parser.add_argument("--stub-ai", action="store_true", help="启动替身 AI 服务器，所有查询都发给它（不使用缓存）")
+    parser.add_argument("--ai-lists", action="store_true", help="物质列表也由 AI 生成（KIMI_SUBSTANCE_LISTS=1）")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="替身服务器每个数据块的延迟（秒）")
+    parser.add_argument("--show", action="store_true", help="显示窗口（默认无界面）")
+    args = parser.parse_args(argv)
+
+    if not args.show:
+        os.environ["CHEM_HEADLESS"] = "1"
+
+    server = None
+    if args.stub_ai:
+        from stub_ai_server import StubAIServer
+        server = StubAIServer(chunk_delay=args.chunk_delay)
+        os.environ["KIMI_BASE_URL"] = server.start()
+        os.environ.setdefault("KIMI_API_KEY", "stub")
+        os.environ["KIMI_CACHE_REFRESH"] = "1"
+    if args.ai_lists:
+        os.environ["KIMI_SUBSTANCE_LISTS"] = "1"
+
+    script = DEFAULT_SCRIPT
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as f:
+            script = json.load(f)
+
+    # 环境变量设置好之后才导入：main 在导入时初始化 pygame，kimi 在导入时读取配置
+    import main as app
+
+    hand = None
+    if args.source:
+        hand_detector = app.HandDetector(source=args.source)
+    else:
+        hand = hand_detector = ScriptedHandDetector()
+
+    driver = ScriptDriver(script, hand, repeat=args.repeat)
+    learner = app.ChemistryLearner(hand_detector=hand_detector, frame_hook=driver, fps=args.fps)
+    logging.getLogger().setLevel(logging.INFO)
+
+    started = time.perf_counter()
+    learner.run()
+    elapsed = time.perf_counter() - started
+
+    print(driver.stats.report())
+    print(f"完成 {driver.iterations}/{args.repeat} 轮，用时 {elapsed:.1f} 秒")
+    if server is not None:
+        print(f"替身 AI 服务器收到 {server.request_count} 个请求")
+        server.stop()
+    if driver.failed:
+        print(driver.failed)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+界面后台任务。
+
+后台工作（查询、打开链接等）的完成通知不再由工作线程直接写 GameState，
+而是作为自定义 pygame 事件投递回界面线程（pygame.event.post 可以在任意线程调用），
+各界面在自己的事件循环里处理这些事件，共享状态只在界面线程中修改。
+事件带有发起时的界面代数 generation，界面据此丢弃已被取代的结果。
+
+- TASK_DONE_EVENT：任务完成，属性 tag、generation、result（失败或被取消时为 None）
+- TASK_PARTIAL_EVENT：流式查询的部分结果，属性 tag、generation、result
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+TASK_DONE_EVENT = pygame.event.custom_type()
+TASK_PARTIAL_EVENT = pygame.event.custom_type()
+
+
+def post_event(event_type, tag, generation, result):
+    """在任意线程中向界面线程投递一个任务事件"""
+    try:
+        pygame.event.post(pygame.event.Event(event_type, tag=tag, generation=generation, result=result))
+    except pygame.error as e:
+        # 退出时事件系统可能已关闭
+        logging.debug(f"投递任务事件失败 ({tag}): {e}")
+
+
+class UiTaskRunner:
+    """
+    有界的界面后台任务执行器：线程数固定为 max_workers，反复切换界面也不会无限制地增加线程。
+    任务结果通过 TASK_DONE_EVENT 返回界面线程。
+    """
+
+    def __init__(self, max_workers=2, thread_name_prefix="ui-task"):
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers),
+                                            thread_name_prefix=thread_name_prefix)
+        self._lock = threading.Lock()
+        self._futures = set()
+
+    def submit(self, tag, generation, fn, *args, **kwargs):
+        """在工作线程中执行 fn(*args, **kwargs)，完成后投递 TASK_DONE_EVENT"""
+        def run():
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                logging.error(f"后台任务 {tag} 失败: {e}")
+                result = None
+            post_event(TASK_DONE_EVENT, tag, generation, result)
+
+        future = self._executor.submit(run)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._discard)
+        return future
+
+    def _discard(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    @staticmethod
+    def watch(tag, generation, handle):
+        """查询（QueryHandle）完成后投递 TASK_DONE_EVENT；handle 被 release 后不再投递"""
+        handle.add_done_callback(lambda result: post_event(TASK_DONE_EVENT, tag, generation, result))
+        return handle
+
+    @staticmethod
+    def partial_poster(tag, generation):
+        """
+        返回一个 on_partial 回调：部分结果变化时投递 TASK_PARTIAL_EVENT。
+        查询方在结果没有变化时也会以节流的心跳回调（result 为同一个对象），界面据此判断流式输出仍在进行。
+        """
+        def on_partial(partial):
+            post_event(TASK_PARTIAL_EVENT, tag, generation, partial)
+        return on_partial
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._futures)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)